@@ -29,7 +29,7 @@ if config.config_file_name is not None:
 # =========================================================================
 from app.database import Base
 
-# Import model yang dipakai: User dan DetectionHistory
+# Import model yang dipakai: User, DetectionHistory, DetectionCache
 print("\n" + "="*70)
 print("[IMPORT] Importing Models...")
 print("="*70)
@@ -46,6 +46,12 @@ try:
 except ImportError as e:
     print(f"[ERROR] Failed to import DetectionHistory: {e}")
 
+try:
+    from app.models.detection_cache import DetectionCache
+    print("[SUCCESS] DetectionCache model imported")
+except ImportError as e:
+    print(f"[ERROR] Failed to import DetectionCache: {e}")
+
 # Set target metadata untuk Alembic
 target_metadata = Base.metadata
 
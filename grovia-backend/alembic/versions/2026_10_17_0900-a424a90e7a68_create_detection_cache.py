@@ -0,0 +1,41 @@
+"""Create detection_cache table for content-addressed detection results
+
+Revision ID: a424a90e7a68
+Revises: 3862c0cba6c3
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a424a90e7a68'
+down_revision: Union[str, Sequence[str], None] = '3862c0cba6c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create detection_cache table."""
+    op.create_table(
+        'detection_cache',
+        sa.Column('cache_key', sa.String(64), nullable=False),
+        sa.Column('model_version', sa.String(100), nullable=False),
+        sa.Column('disease_id', sa.String(100), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=False),
+        sa.Column('result', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('cache_key')
+    )
+    op.create_index(op.f('ix_detection_cache_model_version'), 'detection_cache', ['model_version'], unique=False)
+    op.create_index(op.f('ix_detection_cache_expires_at'), 'detection_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop detection_cache table."""
+    op.drop_index(op.f('ix_detection_cache_expires_at'), table_name='detection_cache')
+    op.drop_index(op.f('ix_detection_cache_model_version'), table_name='detection_cache')
+    op.drop_table('detection_cache')
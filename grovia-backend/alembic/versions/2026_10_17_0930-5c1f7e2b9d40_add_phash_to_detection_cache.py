@@ -0,0 +1,29 @@
+"""Add perceptual hash column to detection_cache
+
+Revision ID: 5c1f7e2b9d40
+Revises: a424a90e7a68
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1f7e2b9d40'
+down_revision: Union[str, Sequence[str], None] = 'a424a90e7a68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add phash column and index."""
+    op.add_column('detection_cache', sa.Column('phash', sa.String(16), nullable=True))
+    op.create_index(op.f('ix_detection_cache_phash'), 'detection_cache', ['phash'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop phash column and index."""
+    op.drop_index(op.f('ix_detection_cache_phash'), table_name='detection_cache')
+    op.drop_column('detection_cache', 'phash')
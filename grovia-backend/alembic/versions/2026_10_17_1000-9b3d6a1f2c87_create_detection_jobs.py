@@ -0,0 +1,57 @@
+"""Create detection_jobs table for the asynchronous detection job queue
+
+Revision ID: 9b3d6a1f2c87
+Revises: 5c1f7e2b9d40
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3d6a1f2c87'
+down_revision: Union[str, Sequence[str], None] = '5c1f7e2b9d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create detection_jobs table."""
+    op.create_table(
+        'detection_jobs',
+        sa.Column('id', sa.String(32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('image_data', sa.LargeBinary().with_variant(mysql.MEDIUMBLOB(), 'mysql'), nullable=True),
+        sa.Column('original_filename', sa.String(255), nullable=True),
+        sa.Column('filename', sa.String(255), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('lease_owner', sa.String(64), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.String(500), nullable=True),
+        sa.Column('detection_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['detection_id'], ['detection_history.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_detection_jobs_user_id'), 'detection_jobs', ['user_id'], unique=False)
+    op.create_index(op.f('ix_detection_jobs_status'), 'detection_jobs', ['status'], unique=False)
+    op.create_index(op.f('ix_detection_jobs_available_at'), 'detection_jobs', ['available_at'], unique=False)
+    op.create_index(op.f('ix_detection_jobs_lease_expires_at'), 'detection_jobs', ['lease_expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop detection_jobs table."""
+    op.drop_index(op.f('ix_detection_jobs_lease_expires_at'), table_name='detection_jobs')
+    op.drop_index(op.f('ix_detection_jobs_available_at'), table_name='detection_jobs')
+    op.drop_index(op.f('ix_detection_jobs_status'), table_name='detection_jobs')
+    op.drop_index(op.f('ix_detection_jobs_user_id'), table_name='detection_jobs')
+    op.drop_table('detection_jobs')
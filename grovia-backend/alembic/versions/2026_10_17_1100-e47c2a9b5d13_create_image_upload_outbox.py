@@ -0,0 +1,56 @@
+"""Create image_upload_outbox table for Cloudinary uploads after the response
+
+Revision ID: e47c2a9b5d13
+Revises: 9b3d6a1f2c87
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e47c2a9b5d13'
+down_revision: Union[str, Sequence[str], None] = '9b3d6a1f2c87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create image_upload_outbox table."""
+    op.create_table(
+        'image_upload_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('detection_id', sa.Integer(), nullable=True),
+        sa.Column('filename', sa.String(255), nullable=False),
+        sa.Column('folder', sa.String(255), nullable=False),
+        sa.Column('public_id', sa.String(255), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('lease_owner', sa.String(64), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('cloud_url', sa.String(500), nullable=True),
+        sa.Column('error', sa.String(500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['detection_id'], ['detection_history.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_image_upload_outbox_id'), 'image_upload_outbox', ['id'], unique=False)
+    op.create_index(op.f('ix_image_upload_outbox_detection_id'), 'image_upload_outbox', ['detection_id'], unique=False)
+    op.create_index(op.f('ix_image_upload_outbox_status'), 'image_upload_outbox', ['status'], unique=False)
+    op.create_index(op.f('ix_image_upload_outbox_available_at'), 'image_upload_outbox', ['available_at'], unique=False)
+    op.create_index(op.f('ix_image_upload_outbox_lease_expires_at'), 'image_upload_outbox', ['lease_expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop image_upload_outbox table."""
+    op.drop_index(op.f('ix_image_upload_outbox_lease_expires_at'), table_name='image_upload_outbox')
+    op.drop_index(op.f('ix_image_upload_outbox_available_at'), table_name='image_upload_outbox')
+    op.drop_index(op.f('ix_image_upload_outbox_status'), table_name='image_upload_outbox')
+    op.drop_index(op.f('ix_image_upload_outbox_detection_id'), table_name='image_upload_outbox')
+    op.drop_index(op.f('ix_image_upload_outbox_id'), table_name='image_upload_outbox')
+    op.drop_table('image_upload_outbox')
@@ -0,0 +1,37 @@
+"""Create upload_blobs table for the content-addressed local upload store
+
+Revision ID: 6f1d8c3b2a47
+Revises: e47c2a9b5d13
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '6f1d8c3b2a47'
+down_revision: Union[str, Sequence[str], None] = 'e47c2a9b5d13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create upload_blobs table."""
+    op.create_table(
+        'upload_blobs',
+        sa.Column('content_hash', sa.String(64), nullable=False),
+        sa.Column('path', sa.String(255), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('released_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+    op.create_index(op.f('ix_upload_blobs_released_at'), 'upload_blobs', ['released_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop upload_blobs table."""
+    op.drop_index(op.f('ix_upload_blobs_released_at'), table_name='upload_blobs')
+    op.drop_table('upload_blobs')
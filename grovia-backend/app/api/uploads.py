@@ -0,0 +1,323 @@
+"""
+Image serving under /uploads
+============================
+Photos are shown again on every history view, so repeat views should cost
+no image bytes and next to no worker time:
+
+- content-addressed files (blobs ab/cd/<sha256>.<ext> and their
+  derivatives) never change behind their URL: `Cache-Control: immutable`
+  for a year and a strong ETag made from the hash. A revalidation with a
+  matching If-None-Match gets 304 straight from the path, without
+  touching the disk
+- other files (older flat uploads) are revalidated on every use
+  (`no-cache`) against the usual mtime/size ETag and Last-Modified
+- single byte ranges (Range / If-Range) get 206, unsatisfiable ones 416
+- bodies go out through the ASGI zero-copy (`http.response.zerocopysend`,
+  os.sendfile in the server) or pathsend extensions when the server
+  offers them, in large chunks otherwise
+
+Derivatives (app/utils/image_derivatives.py) have their own route,
+registered before the static mount, so a missing one is rendered on first
+request.
+"""
+import asyncio
+import logging
+import os
+import re
+import stat
+from email.utils import parsedate
+from typing import Dict, Mapping, Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, status
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from app.core.executors import run_cpu, run_io
+from app.core.metrics import metrics
+from app.models.upload_blob import BLOB_PATH
+from app.utils.blob_store import get_blob_store
+from app.utils.image_derivatives import (
+    BLOB_DERIVATIVE_PATH,
+    DERIVATIVE_EXTENSION,
+    DERIVATIVES_DIR,
+    derivative_widths,
+    ensure_derivative,
+    is_local_source,
+    source_of_derivative,
+)
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(ValueError):
+    """Range header outside the file"""
+
+
+def content_etag(path: str) -> Optional[str]:
+    """Strong ETag of a content-addressed path (relative to UPLOAD_DIR), None for other files"""
+    match = BLOB_PATH.match(path)
+    if match:
+        return f'"{match.group(1)}"'
+    match = BLOB_DERIVATIVE_PATH.match(path)
+    if match:
+        return f'"{match.group(2)}-w{match.group(1)}"'
+    return None
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 asks for GET/HEAD)"""
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def is_not_modified(response_headers: Mapping[str, str], request_headers: Headers) -> bool:
+    """True if a 304 can be sent instead (If-Modified-Since only counts without If-None-Match)"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = response_headers.get("etag")
+        return etag is not None and etag_matches(etag, if_none_match)
+
+    if_modified_since = parsedate(request_headers.get("if-modified-since", ""))
+    last_modified = parsedate(response_headers.get("last-modified", ""))
+    return if_modified_since is not None and last_modified is not None and if_modified_since >= last_modified
+
+
+def parse_byte_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (offset, count) of a single byte range
+
+    Returns:
+        None for headers not worth honouring (multiple ranges, other units,
+        malformed) - the whole file is sent instead
+
+    Raises:
+        RangeNotSatisfiable: range starts past the end of the file
+    """
+    match = BYTE_RANGE.match(value.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        count = min(int(last), size)
+        if count == 0:
+            raise RangeNotSatisfiable(value)
+        return size - count, count
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(value)
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end - start + 1
+
+
+class ImageFileResponse(FileResponse):
+    """
+    FileResponse with cache headers, byte ranges and zero-copy sending
+
+    Args:
+        path: File to send
+        stat_result: os.stat of the file
+        request_headers: Headers of the request (Range / If-Range)
+        etag: Strong ETag (default: Starlette's mtime/size ETag)
+        cache_control: Cache-Control header
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        stat_result: os.stat_result,
+        request_headers: Headers,
+        etag: Optional[str] = None,
+        cache_control: str = REVALIDATE_CACHE_CONTROL,
+        media_type: Optional[str] = None
+    ):
+        headers = {"cache-control": cache_control, "accept-ranges": "bytes"}
+        if etag is not None:
+            headers["etag"] = etag
+        super().__init__(path, stat_result=stat_result, headers=headers, media_type=media_type)
+
+        size = stat_result.st_size
+        self.byte_range: Optional[Tuple[int, int]] = None
+        range_header = request_headers.get("range")
+        if range_header is None or not self._if_range_matches(request_headers):
+            return
+        try:
+            self.byte_range = parse_byte_range(range_header, size)
+        except RangeNotSatisfiable:
+            self.status_code = status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            return
+        if self.byte_range is not None:
+            offset, count = self.byte_range
+            self.status_code = status.HTTP_206_PARTIAL_CONTENT
+            self.headers["content-range"] = f"bytes {offset}-{offset + count - 1}/{size}"
+            self.headers["content-length"] = str(count)
+
+    def _if_range_matches(self, request_headers: Headers) -> bool:
+        """No If-Range, or If-Range still names this exact file"""
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == self.headers.get("etag")
+        return if_range == self.headers.get("last-modified")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers
+        })
+        if scope["method"].upper() == "HEAD" or self.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        offset, count = self.byte_range or (0, self.stat_result.st_size)
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            # The server copies file -> socket in the kernel (os.sendfile)
+            file = await anyio.to_thread.run_sync(open, self.path, "rb")
+            try:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": offset,
+                    "count": count,
+                    "more_body": False
+                })
+            finally:
+                file.close()
+        elif "http.response.pathsend" in extensions and self.byte_range is None:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                if offset:
+                    await file.seek(offset)
+                remaining = count
+                while True:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    remaining -= len(chunk)
+                    more_body = remaining > 0 and len(chunk) > 0
+                    await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                    if not more_body:
+                        break
+        metrics.increment("uploads.bytes_served", count)
+
+
+def image_file_response(
+    full_path: str,
+    path: str,
+    stat_result: os.stat_result,
+    request_headers: Headers,
+    media_type: Optional[str] = None
+) -> Response:
+    """304 or ImageFileResponse for a file under UPLOAD_DIR (`path` relative to it)"""
+    etag = content_etag(path)
+    response = ImageFileResponse(
+        full_path,
+        stat_result,
+        request_headers,
+        etag=etag,
+        cache_control=IMMUTABLE_CACHE_CONTROL if etag else REVALIDATE_CACHE_CONTROL,
+        media_type=media_type
+    )
+    if is_not_modified(response.headers, request_headers):
+        metrics.increment("uploads.not_modified")
+        return NotModifiedResponse(response.headers)
+    return response
+
+
+def immutable_not_modified(path: str, request_headers: Headers) -> Optional[Response]:
+    """
+    304 for a content-addressed path the client already has, decided from
+    the path alone (no stat, no thread hop), or None
+    """
+    etag = content_etag(path)
+    if_none_match = request_headers.get("if-none-match")
+    if etag is None or if_none_match is None or not etag_matches(etag, if_none_match):
+        return None
+    metrics.increment("uploads.not_modified")
+    return NotModifiedResponse({"etag": etag, "cache-control": IMMUTABLE_CACHE_CONTROL})
+
+
+class UploadStaticFiles(StaticFiles):
+    """StaticFiles for UPLOAD_DIR with the caching rules in the module docstring"""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            not_modified = immutable_not_modified(path, Headers(scope=scope))
+            if not_modified is not None:
+                return not_modified
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200
+    ) -> Response:
+        return image_file_response(str(full_path), self.get_path(scope), stat_result, Headers(scope=scope))
+
+
+router = APIRouter()
+
+# One render per derivative at a time - concurrent requests wait for it
+_rendering: Dict[str, asyncio.Future] = {}
+
+
+def _stat_file(full_path: str) -> Optional[os.stat_result]:
+    try:
+        stat_result = os.stat(full_path)
+    except FileNotFoundError:
+        return None
+    return stat_result if stat.S_ISREG(stat_result.st_mode) else None
+
+
+@router.get("/uploads/derivatives/{width}/{path:path}", include_in_schema=False)
+async def get_derivative(width: int, path: str, request: Request):
+    """
+    Serve a local derivative, rendering and caching it on first request
+    """
+    derivative = f"{DERIVATIVES_DIR}/{width}/{path}"
+    not_modified = immutable_not_modified(derivative, request.headers)
+    if not_modified is not None:
+        return not_modified
+
+    stem = path[:-len(DERIVATIVE_EXTENSION)]
+    if width not in derivative_widths() or not path.endswith(DERIVATIVE_EXTENSION) or not is_local_source(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    # Cached: one stat, no source lookup, nothing rendered
+    file_path = get_blob_store().full_path(derivative)
+    stat_result = await run_io(_stat_file, file_path)
+    if stat_result is None:
+        source_path = await run_io(source_of_derivative, stem)
+        if source_path is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+        key = f"{width}/{source_path}"
+        future = _rendering.get(key)
+        if future is None:
+            future = asyncio.ensure_future(run_cpu(ensure_derivative, source_path, width))
+            _rendering[key] = future
+            future.add_done_callback(lambda _: _rendering.pop(key, None))
+        file_path = await asyncio.shield(future)
+        stat_result = await run_io(_stat_file, file_path) if file_path else None
+        if stat_result is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    return image_file_response(file_path, derivative, stat_result, request.headers, media_type="image/webp")
@@ -11,6 +11,7 @@ from app.schemas.user import UserCreate, UserResponse, PasswordChange
 from app.schemas.token import LoginRequest, LoginResponse, Token
 from app.crud import user as user_crud
 from app.core.security import create_access_token
+from app.core.executors import run_cpu, run_io
 from app.dependencies import get_current_active_user
 from app.models.user import User
 from pydantic import BaseModel, EmailStr
@@ -51,12 +52,18 @@ class GoogleSignInRequest(BaseModel):
     token: str  # Google ID Token from frontend
 
 
+def _save_user(db: Session, user: User) -> None:
+    """Commit pending changes to a user and reload it (blocking, run on the I/O executor)"""
+    db.commit()
+    db.refresh(user)
+
+
 @router.get("/verify-email")
 async def verify_email(token: str, email: str, db: Session = Depends(get_db)):
     """
     Verify user email using token (demo: token not checked, just email)
     """
-    user = user_crud.get_user_by_email(db, email=email)
+    user = await run_io(user_crud.get_user_by_email, db, email=email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user.is_verified:
@@ -64,8 +71,7 @@ async def verify_email(token: str, email: str, db: Session = Depends(get_db)):
         return RedirectResponse(url="https://grovia-five.vercel.app/login?verified=true")
     # For demo, skip token check. In production, save and check token!
     user.is_verified = True
-    db.commit()
-    db.refresh(user)
+    await run_io(_save_user, db, user)
     # Redirect ke login dengan pesan sukses
     return RedirectResponse(url="https://grovia-five.vercel.app/login?verified=true")
 
@@ -79,7 +85,7 @@ async def resend_verification(email_data: ForgotPasswordRequest, db: Session = D
         logger.info(f"Attempting to resend verification email to: {email_data.email}")
 
         # Check if user exists
-        user = user_crud.get_user_by_email(db, email=email_data.email)
+        user = await run_io(user_crud.get_user_by_email, db, email=email_data.email)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -150,7 +156,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         logger.info(f"Attempting to register user with email: {user_data.email}")
 
         # Check if user already exists
-        existing_user = user_crud.get_user_by_email(db, email=user_data.email)
+        existing_user = await run_io(user_crud.get_user_by_email, db, email=user_data.email)
         if existing_user:
             logger.warning(f"Registration attempt with existing email: {user_data.email}")
             raise HTTPException(
@@ -160,7 +166,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
         # Create user
         logger.info("Creating new user record")
-        user = user_crud.create_user(db, user=user_data)
+        user = await run_io(user_crud.create_user, db, user=user_data)
 
         # Generate verification token (simple random string)
         verify_token = secrets.token_urlsafe(32)
@@ -224,7 +230,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
         logger.info(f"Login attempt for email: {login_data.email}")
 
         # Check if user exists
-        user = user_crud.get_user_by_email(db, email=login_data.email)
+        user = await run_io(user_crud.get_user_by_email, db, email=login_data.email)
         if not user:
             logger.warning(f"User not found: {login_data.email}")
             raise HTTPException(
@@ -242,7 +248,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
 
         # Check password
         from app.core.security import verify_password
-        if not verify_password(login_data.password, user.hashed_password):
+        if not await run_cpu(verify_password, login_data.password, user.hashed_password):
             logger.warning(f"Password verification failed for: {login_data.email}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -303,7 +309,7 @@ async def forgot_password(
         logger.info(f"[INFO] Request headers: {request.headers if hasattr(request, 'headers') else 'N/A'}")
         
         # Check if user exists
-        user = user_crud.get_user_by_email(db, email=request.email)
+        user = await run_io(user_crud.get_user_by_email, db, email=request.email)
         
         # Always return success to prevent email enumeration
         if not user:
@@ -321,7 +327,7 @@ async def forgot_password(
         # Store token and expiry in user record
         user.reset_token = reset_token
         user.reset_token_expires = datetime.utcnow() + timedelta(hours=1)
-        db.commit()
+        await run_io(db.commit)
         
         logger.info(f"[SUCCESS] Token generated and saved for user: {user.email}")
         
@@ -386,7 +392,7 @@ async def reset_password(
         logger.info(f"Password reset attempt for email: {request.email}")
         
         # Find user and verify token
-        user = user_crud.get_user_by_email(db, email=request.email)
+        user = await run_io(user_crud.get_user_by_email, db, email=request.email)
         
         if not user:
             raise HTTPException(
@@ -411,10 +417,10 @@ async def reset_password(
         
         # Update password
         from app.core.security import get_password_hash
-        user.hashed_password = get_password_hash(request.new_password)
+        user.hashed_password = await run_cpu(get_password_hash, request.new_password)
         user.reset_token = None
         user.reset_token_expires = None
-        db.commit()
+        await run_io(db.commit)
         
         logger.info(f"Password reset successful for: {request.email}")
         
@@ -457,7 +463,8 @@ async def google_signin(
         
         # Verify the Google token
         try:
-            idinfo = id_token.verify_oauth2_token(
+            idinfo = await run_io(
+                id_token.verify_oauth2_token,
                 request.token,
                 requests.Request(),
                 settings.GOOGLE_CLIENT_ID
@@ -483,7 +490,7 @@ async def google_signin(
             )
         
         # Check if user exists
-        user = user_crud.get_user_by_email(db, email=email)
+        user = await run_io(user_crud.get_user_by_email, db, email=email)
         
         if user:
             # User exists, log them in
@@ -492,8 +499,7 @@ async def google_signin(
             # Update verification status if Google account is verified
             if email_verified and not user.is_verified:
                 user.is_verified = True
-                db.commit()
-                db.refresh(user)
+                await run_io(_save_user, db, user)
                 logger.info(f"User {email} verified via Google")
         else:
             # New user, create account
@@ -513,13 +519,12 @@ async def google_signin(
                 password_confirmation=random_password # Konfirmasi Password (SAMA)
             )
             
-            user = user_crud.create_user(db, user=user_data)
+            user = await run_io(user_crud.create_user, db, user=user_data)
             
             # Mark as verified since Google verified the email
             if email_verified:
                 user.is_verified = True
-                db.commit()
-                db.refresh(user)
+                await run_io(_save_user, db, user)
         
         # Create access token
         access_token = create_access_token(str(user.id))
@@ -583,7 +588,7 @@ async def update_profile(
     """
     Update user profile
     """
-    updated_user = user_crud.update_user(db, current_user.id, user_update)
+    updated_user = await run_io(user_crud.update_user, db, current_user.id, user_update)
 
     if not updated_user:
         raise HTTPException(
@@ -610,7 +615,8 @@ async def change_password(
     """
     Change user password (for logged in users)
     """
-    success = user_crud.change_password(
+    success = await run_io(
+        user_crud.change_password,
         db,
         current_user.id,
         password_data.current_password,
@@ -2,32 +2,61 @@
 Detection endpoint untuk deteksi penyakit tanaman
 """
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-import os
-import shutil
+import json
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 from app.utils.timezone_utils import resolve_user_timezone
-from typing import Optional
+from typing import AsyncIterator, List, Optional
 import logging
 
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.dependencies import get_current_active_user, validate_image_file
 from app.models.user import User
-from app.schemas.detection import DetectionResult, TreatmentRecommendation
+from app.schemas.detection import DetectionResult, DirectUploadDetectionRequest, TreatmentRecommendation
 from app.crud import detection as detection_crud
+from app.crud import detection_job as job_crud
 from app.core.config import settings
 from app.core.exceptions import DetectionError, NotFoundError
+from app.core.deadline import Deadline, DeadlineExceededError
+from app.core.executors import run_io
 from app.utils.cloudinary_service import get_cloudinary_service
+from app.utils.upload_ingest import read_upload
+from app.utils.detection_pipeline import (
+    CLOUDINARY_DETECTIONS_FOLDER,
+    LEAF_REJECTED_DETAIL,
+    LeafRejectedError,
+    build_detection_data,
+    detect_upload,
+    detection_stages,
+    fetch_direct_upload,
+    format_prediction,
+    make_direct_upload_id,
+    make_upload_filename,
+    owns_direct_upload,
+    save_histories,
+    save_history,
+    store_image,
+)
 
 # Import Gemini AI Model for better accuracy
-from app.ml.gemini_model import get_gemini_model as get_model
-from app.ml.leaf_validator import get_leaf_validator
+from app.ml.batch import STATUS_OK, run_batch
+from app.ml.cascade import get_detection_model as get_model
+from app.ml.image_input import ImageInput
+from app.ml.result_cache import get_result_cache
+from app.models.detection_job import JOB_QUEUED
+from app.workers.detection_worker import notify_new_job
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
 @router.post("/detect", response_model=dict)
 async def detect_disease(
     image: UploadFile = File(...),
@@ -43,206 +72,492 @@ async def detect_disease(
 
     logger.info(f"Detection request from user {current_user.id}")
 
+    # NF06 budget for every stage of this request
+    deadline = Deadline(settings.DETECTION_DEADLINE_SECONDS)
+
     # Validate image file
     validate_image_file(image)
 
-    # Create upload directory if not exists
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-
     # Generate unique filename
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_extension = os.path.splitext(image.filename)[1]
-    filename = f"user_{current_user.id}_{timestamp}{file_extension}"
-    file_path = os.path.join(settings.UPLOAD_DIR, filename)
+    filename = make_upload_filename(current_user.id, image.filename, timestamp)
 
     try:
-        # Save uploaded file
-        logger.info(f"Saving file to {file_path}")
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-
-        # Step 1: Validate if image is a leaf/plant before detection
-        logger.info("Validating if image is a leaf (OpenCV)...")
-        leaf_validator = get_leaf_validator()
+        # Read the upload into memory once (hashed in the same pass for the result cache).
+        # It is decoded once and shared by the validator, hashing and the model;
+        # nothing touches UPLOAD_DIR unless local storage is the final destination.
+        upload = await deadline.run(run_io(read_upload, image), "upload")
 
-        validation_result = leaf_validator.validate(file_path)
-
-        if not validation_result.get("is_valid", False):
+        # STEPS 0-2: cached diagnosis, or leaf validation + disease detection
+        # (before any cloud upload)
+        try:
+            prediction = await detect_upload(upload, db, deadline)
+        except LeafRejectedError:
             # Image is NOT a leaf - reject immediately (NO API USED!)
-            logger.warning(f"Invalid image rejected: {validation_result.get('detected_content')}")
-
-            # Clean up uploaded file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-
             # Return simple user-friendly error message
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Pastikan Anda mengupload foto daun tanaman"
+                detail=LEAF_REJECTED_DETAIL
             )
 
-        logger.info(f"[SUCCESS] Image validated as leaf (confidence: {validation_result.get('confidence')}%)")
+        logger.info(f"[SUCCESS] Prediction received: {prediction.get('disease_name', 'Unknown')}")
 
-        # STEP 2: Perform disease detection FIRST (before cloud upload)
-        # Get ML model instance
-        ml_model = get_model()
+        # STEP 3: Upload to cloud storage (if enabled) AFTER detection success.
+        # Stages with side effects are not cancelled half way - only started in time
+        deadline.check("storage")
+        image_url, _ = await store_image(upload, filename, timeout=deadline.remaining())
 
-        # Perform detection (ML model inference)
-        logger.debug("Running disease detection...")
-        prediction = ml_model.predict(file_path)
+        # STEP 4: Format prediction results
+        format_prediction(prediction)
 
-        if not prediction:
-            logger.error("ML model returned None/empty prediction")
-            # Clean up local file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            raise DetectionError("Failed to detect disease - model returned no prediction")
+        # Determine detected_at in user's timezone for display (header -> profile -> default)
+        local_tz = resolve_user_timezone(request, current_user)
+        response_data = {
+            "success": True,
+            "data": build_detection_data(prediction, image_url, datetime.now(local_tz))
+        }
 
-        logger.info(f"[SUCCESS] Prediction received: {prediction.get('disease_name', 'Unknown')}")
+        # Create detection history (failure does not fail the request)
+        deadline.check("database")
+        await save_history(db, current_user.id, prediction, image_url, filename, local_tz, response_data["data"])
 
-        # STEP 3: Upload to cloud storage (if enabled) AFTER detection success
-        image_url = f"/uploads/{filename}"  # Default: local storage
-        cloudinary_public_id = None
-
-        if settings.USE_CLOUDINARY:
-            try:
-                logger.debug("Uploading image to Cloudinary...")
-                cloudinary = get_cloudinary_service()
-                upload_result = cloudinary.upload_image(
-                    file_path=file_path,
-                    folder="grovia/detections",
-                    public_id=f"user_{current_user.id}_{timestamp}"
-                )
-                image_url = upload_result["url"]
-                cloudinary_public_id = upload_result["public_id"]
-                logger.info(f"[SUCCESS] Image uploaded to Cloudinary: {image_url}")
-
-                # Delete local file after successful upload
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    logger.debug("Local file deleted after cloud upload")
-            except Exception as e:
-                logger.warning(f"Cloudinary upload failed, using local storage: {e}")
-                # Fallback to local storage if cloud upload fails
+        logger.info("Detection completed successfully")
+        return response_data
 
-        # STEP 4: Format prediction results
+    except HTTPException as http_exc:
+        # Re-raise HTTPException as-is (proper HTTP errors)
+        logger.warning(f"HTTP Exception: {http_exc.detail}")
+        # A photo stored before the failure has no history row referencing
+        # its blob - the blob GC deletes it after UPLOAD_BLOB_GC_GRACE_SECONDS
+        raise http_exc
 
-        # Ensure confidence is properly formatted (0-1 range)
-        if "confidence" in prediction:
-            prediction["confidence"] = round(float(prediction["confidence"]), 4)
+    except DeadlineExceededError as e:
+        logger.error(f"Detection deadline exceeded during {e.stage}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Detection timed out during {e.stage}"
+        )
 
-        # Add confidence_percent with max 2 decimal places (clean display)
-        if "confidence_percent" not in prediction and "confidence" in prediction:
-            prediction["confidence_percent"] = round(prediction["confidence"] * 100, 2)
-        else:
-            # If confidence_percent already exists, ensure it's rounded to 2 decimals
-            prediction["confidence_percent"] = round(float(prediction["confidence_percent"]), 2)
+    except DetectionError as e:
+        logger.error(f"Detection error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Detection failed: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Detection failed: {str(e)}"
+        )
 
-        logger.info(f"Prediction: {prediction['disease_name']} ({prediction['confidence_percent']}%)")
 
-        # Database operations can be done asynchronously/optionally
-        # Don't let DB slow down the response
-        disease = None
-        history = None
+@router.post("/detect/stream")
+async def detect_disease_stream(
+    image: UploadFile = File(...),
+    request: Request = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Upload image and detect plant disease, streaming progress as Server-Sent Events
+
+    Same pipeline as /detect. Events, in order:
+    - accepted:      upload read ({filename, size})
+    - validation:    leaf validation result ({is_valid, confidence, cached})
+    - cache_hit:     diagnosis reused ({source: exact | near_duplicate}), or
+    - model_started: Gemini call started ({model_version}), followed by
+    - partial:       one per diagnosis field as Gemini streams it ({field, value});
+                     held back until Gemini's result while a local fallback
+                     could still replace it (app/ml/cascade.py)
+    - result:        final response, same body as /detect (with detection_id)
+    - error:         {status_code, detail} - the stream ends after it
+    """
 
-        # Quick response preparation (do this first before slow DB operations)
-        # Determine detected_at in user's timezone for display (header -> profile -> default)
-        local_tz = resolve_user_timezone(request, current_user)
+    logger.info(f"Streaming detection request from user {current_user.id}")
+    deadline = Deadline(settings.DETECTION_DEADLINE_SECONDS)
 
-        # Get current time in local timezone (WITA)
-        current_time = datetime.now(local_tz)
-        
-        response_data = {
-            "success": True,
-            "data": {
-                "detection_id": None,  # Will be updated if history saved
-                "disease_id": prediction["disease_id"],
-                "disease_name": prediction["disease_name"],
-                "scientific_name": prediction.get("scientific_name", ""),
-                "confidence": prediction["confidence"],
-                "confidence_percent": prediction["confidence_percent"],
-                "is_healthy": prediction.get("is_healthy", False),
-                "image_url": image_url,
-                "description": prediction.get("analysis_notes", ""),
-                "symptoms": prediction.get("symptoms", []),
-                "recommendations": prediction.get("recommendations", []),
-                "all_predictions": prediction.get("all_predictions", []),
-                "detected_at": current_time.isoformat()
-            }
+    # Validate image file
+    validate_image_file(image)
+
+    # Read everything request-bound before the response starts streaming
+    try:
+        upload = await deadline.run(run_io(read_upload, image), "upload")
+    except DeadlineExceededError as e:
+        logger.error(f"Streaming detection deadline exceeded during {e.stage}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Detection timed out during {e.stage}"
+        )
+    local_tz = resolve_user_timezone(request, current_user)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = make_upload_filename(current_user.id, image.filename, timestamp)
+
+    return StreamingResponse(
+        _detection_events(upload, current_user.id, filename, local_tz, deadline),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _detection_events(
+    upload: ImageInput,
+    user_id: int,
+    filename: str,
+    local_tz,
+    deadline: Deadline
+) -> AsyncIterator[str]:
+    """Run the detection pipeline, yielding SSE events between the stages"""
+    # Own session: request-scoped dependencies are closed before a
+    # streaming response body is sent
+    db = SessionLocal()
+
+    try:
+        yield _sse_event("accepted", {"filename": upload.filename, "size": len(upload.data)})
+
+        prediction = None
+        async for event, payload in detection_stages(upload, db, deadline, stream=True):
+            if event == "prediction":
+                prediction = payload
+            else:
+                yield _sse_event(event, payload)
+
+        deadline.check("storage")
+        image_url, _ = await store_image(upload, filename, timeout=deadline.remaining())
+        format_prediction(prediction)
+
+        data = build_detection_data(prediction, image_url, datetime.now(local_tz))
+        deadline.check("database")
+        await save_history(db, user_id, prediction, image_url, filename, local_tz, data)
+
+        logger.info("Streaming detection completed successfully")
+        yield _sse_event("result", {"success": True, "data": data})
+
+    except LeafRejectedError:
+        yield _sse_event("error", {
+            "status_code": status.HTTP_400_BAD_REQUEST,
+            "detail": LEAF_REJECTED_DETAIL
+        })
+
+    except DeadlineExceededError as e:
+        logger.error(f"Streaming detection deadline exceeded during {e.stage}")
+        yield _sse_event("error", {
+            "status_code": status.HTTP_504_GATEWAY_TIMEOUT,
+            "detail": f"Detection timed out during {e.stage}"
+        })
+
+    except Exception as e:
+        logger.error(f"Streaming detection error: {str(e)}")
+        yield _sse_event("error", {
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "detail": f"Detection failed: {str(e)}"
+        })
+
+    finally:
+        await run_io(db.close)
+
+
+@router.post("/detect-batch", response_model=dict)
+async def detect_disease_batch(
+    images: List[UploadFile] = File(...),
+    request: Request = None,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload several images and detect plant disease for each (one request per farm visit)
+
+    Every image runs the /detect pipeline, up to BATCH_CONCURRENCY at once.
+    Per-image outcome, in upload order:
+    - ok:      result is the same `data` object as /detect
+    - failed:  not a leaf, model error or timeout (error is set)
+    - skipped: rejected by file validation, or the batch deadline ran out
+               before its turn
+    All history rows are written in a single transaction at the end.
+    """
+
+    logger.info(f"Batch detection request from user {current_user.id} ({len(images)} images)")
+
+    if len(images) > settings.MAX_BATCH_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maksimal {settings.MAX_BATCH_IMAGES} foto per permintaan"
+        )
+
+    deadline = Deadline(settings.DETECTION_BATCH_DEADLINE_SECONDS)
+    local_tz = resolve_user_timezone(request, current_user)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ml_model = get_model()
+    # Images that reach the model together share Gemini calls
+    packer = ml_model.create_packer(deadline) if settings.GEMINI_PACKING_ENABLED else None
+
+    # Same file checks as /detect; rejected files are reported, not fatal
+    rejected = {}
+    for index, image in enumerate(images):
+        try:
+            validate_image_file(image)
+        except HTTPException as e:
+            rejected[index] = e.detail
+
+    # index -> (prediction, image_url, filename, data) of every successful image, for one history commit
+    history_entries = {}
+
+    async def _detect_one(index: int) -> Optional[dict]:
+        image = images[index]
+        filename = make_upload_filename(current_user.id, image.filename, f"{timestamp}_{index:02d}")
+        # Sessions are not thread-safe - each concurrent image uses its own for the cache
+        item_db = SessionLocal()
+        try:
+            upload = await deadline.run(run_io(read_upload, image), "upload")
+            prediction = await detect_upload(upload, item_db, deadline, predict=packer.submit if packer else None)
+        finally:
+            await run_io(item_db.close)
+
+        deadline.check("storage")
+        image_url, _ = await store_image(upload, filename, timeout=deadline.remaining())
+        format_prediction(prediction)
+
+        data = build_detection_data(prediction, image_url, datetime.now(local_tz))
+        history_entries[index] = (prediction, image_url, filename, data)
+        return data
+
+    report = await run_batch(
+        list(range(len(images))),
+        _detect_one,
+        concurrency=settings.BATCH_CONCURRENCY,
+        describe=lambda index: images[index].filename,
+        skip=rejected.get,
+        deadline=deadline
+    )
+
+    # One transaction for the whole batch (failure does not fail the request)
+    await save_histories(db, current_user.id, [history_entries[i] for i in sorted(history_entries)], local_tz)
+
+    logger.info(
+        f"Batch detection completed: {report.count(STATUS_OK)}/{report.total} ok "
+        f"in {report.duration_ms / 1000:.1f}s"
+    )
+    return {"success": True, "data": report.to_dict()}
+
+
+def _require_direct_upload() -> None:
+    if not settings.USE_CLOUDINARY:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Direct upload is not available (Cloudinary disabled)"
+        )
+
+
+@router.post("/upload-signature", response_model=dict)
+async def create_upload_signature(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Signed parameters for uploading a photo straight to Cloudinary
+
+    The client posts `params` plus the file (form field `file`) to
+    `upload_url`, then calls /detect-cloud with `public_id`. The photo never
+    passes through this server. The signature is valid for
+    CLOUDINARY_SIGNATURE_TTL_SECONDS and only for this public_id.
+    """
+    _require_direct_upload()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    upload_id = make_direct_upload_id(current_user.id, timestamp)
+    signed = get_cloudinary_service().sign_upload(
+        folder=CLOUDINARY_DETECTIONS_FOLDER,
+        public_id=upload_id,
+        ttl_seconds=settings.CLOUDINARY_SIGNATURE_TTL_SECONDS
+    )
+
+    return {
+        "success": True,
+        "data": {
+            "upload_url": signed["upload_url"],
+            "params": signed["params"],
+            "public_id": f"{CLOUDINARY_DETECTIONS_FOLDER}/{upload_id}",
+            "expires_at": datetime.fromtimestamp(signed["expires_at"], timezone.utc).isoformat(),
+            "detect_url": f"{settings.API_V1_PREFIX}/detection/detect-cloud"
         }
+    }
+
+
+@router.post("/detect-cloud", response_model=dict)
+async def detect_disease_cloud(
+    body: DirectUploadDetectionRequest,
+    request: Request = None,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Detect plant disease on a photo uploaded directly to Cloudinary
+
+    Same result as /detect. Validation and inference run on a derivative
+    resized by Cloudinary (longest side GEMINI_IMAGE_MAX_SIDE), so only
+    that much is downloaded; history keeps the CDN URL of the upload.
+    """
+    _require_direct_upload()
+
+    public_id = body.public_id
+    if not owns_direct_upload(current_user.id, public_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Upload does not belong to this user"
+        )
+
+    logger.info(f"Direct upload detection request from user {current_user.id}: {public_id}")
+    deadline = Deadline(settings.DETECTION_DEADLINE_SECONDS)
+
+    try:
+        upload = await deadline.run(fetch_direct_upload(public_id, timeout=deadline.remaining()), "upload")
+        if upload is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload not found"
+            )
 
-        # Optional: Create detection history (don't block response)
         try:
-            # Store the appropriate path based on storage type
-            stored_image_path = image_url if settings.USE_CLOUDINARY else f"uploads/{filename}"
-
-            history = detection_crud.create_detection_history(
-                db=db,
-                user_id=current_user.id,
-                disease_id=prediction["disease_id"],
-                disease_name=prediction["disease_name"],
-                scientific_name=prediction.get("scientific_name", ""),
-                confidence=prediction["confidence"],
-                image_url=stored_image_path,
-                description=disease.description if disease else prediction.get("analysis_notes", ""),
-                symptoms=None
+            prediction = await detect_upload(upload, db, deadline)
+        except LeafRejectedError:
+            # Not kept for history - remove the photo from Cloudinary as well
+            await run_io(get_cloudinary_service().delete_image, public_id)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=LEAF_REJECTED_DETAIL
             )
-            
-            # Commit to database
-            db.commit()
-            db.refresh(history)
-            
-            # Convert stored history detected_at (UTC) to user's timezone for response
-            response_data["data"]["detection_id"] = history.id
-            if hasattr(history, "detected_at") and history.detected_at is not None:
-                try:
-                    # Convert UTC to local timezone
-                    utc_time = history.detected_at.replace(tzinfo=timezone.utc)
-                    local_time = utc_time.astimezone(local_tz)
-                    response_data["data"]["detected_at"] = local_time.isoformat()
-                except Exception as e:
-                    logger.warning(f"Timezone conversion error: {e}")
-                    # fallback to UTC string
-                    response_data["data"]["detected_at"] = history.detected_at.replace(tzinfo=timezone.utc).isoformat()
-            logger.info(f"[SUCCESS] History saved: ID {history.id}")
-        except Exception as e:
-            logger.error(f"Failed to save history: {e}")
-            db.rollback()
-            # Don't fail the whole request if history saving fails
+
+        logger.info(f"[SUCCESS] Prediction received: {prediction.get('disease_name', 'Unknown')}")
+        format_prediction(prediction)
+
+        image_url = get_cloudinary_service().get_optimized_url(public_id)
+        local_tz = resolve_user_timezone(request, current_user)
+        response_data = {
+            "success": True,
+            "data": build_detection_data(prediction, image_url, datetime.now(local_tz))
+        }
+
+        # Create detection history (failure does not fail the request)
+        deadline.check("database")
+        filename = f"{public_id.rsplit('/', 1)[-1]}.jpg"
+        await save_history(db, current_user.id, prediction, image_url, filename, local_tz, response_data["data"])
 
         logger.info("Detection completed successfully")
         return response_data
 
     except HTTPException as http_exc:
-        # Re-raise HTTPException as-is (proper HTTP errors)
         logger.warning(f"HTTP Exception: {http_exc.detail}")
-        # Clean up uploaded file on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise http_exc
 
+    except DeadlineExceededError as e:
+        logger.error(f"Detection deadline exceeded during {e.stage}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Detection timed out during {e.stage}"
+        )
+
     except DetectionError as e:
         logger.error(f"Detection error: {str(e)}")
-        # Clean up uploaded file on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Detection failed: {str(e)}"
         )
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        # Clean up uploaded file on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Detection failed: {str(e)}"
         )
 
 
+@router.post("/jobs", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def create_detection_job(
+    image: UploadFile = File(...),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a detection and return right away (for deployments whose request
+    time limit is shorter than a Gemini call)
+
+    The image is stored with the job; a detection worker runs the /detect
+    pipeline on it. Poll GET /jobs/{job_id} for the result.
+    """
+
+    logger.info(f"Detection job request from user {current_user.id}")
+
+    # Validate image file
+    validate_image_file(image)
+
+    upload = await run_io(read_upload, image)
+    job_id = job_crud.new_job_id()
+    # Deterministic per job: a retried job overwrites the same file / public_id
+    filename = make_upload_filename(current_user.id, image.filename, f"job_{job_id}")
+
+    await run_io(
+        job_crud.create_job,
+        db,
+        job_id=job_id,
+        user_id=current_user.id,
+        image_data=upload.data,
+        original_filename=image.filename,
+        filename=filename,
+        max_attempts=settings.DETECTION_JOB_MAX_ATTEMPTS
+    )
+    notify_new_job()
+
+    return {
+        "success": True,
+        "data": {
+            "job_id": job_id,
+            "status": JOB_QUEUED,
+            "status_url": f"{settings.API_V1_PREFIX}/detection/jobs/{job_id}"
+        }
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_detection_job(
+    job_id: str,
+    request: Request = None,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Status of a detection job: queued | running | succeeded | failed
+
+    `result` (succeeded) is the same `data` object as /detect; `error`
+    holds the reason of the last failed attempt.
+    """
+    job = await run_io(job_crud.get_job, db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    local_tz = resolve_user_timezone(request, current_user)
+
+    def _local(dt):
+        return dt.replace(tzinfo=timezone.utc).astimezone(local_tz).isoformat() if dt else None
+
+    result = json.loads(job.result) if job.result else None
+    if result and result.get("detected_at"):
+        # Stored in UTC by the worker - shown in the user's timezone like /detect
+        result["detected_at"] = datetime.fromisoformat(result["detected_at"]).astimezone(local_tz).isoformat()
+
+    return {
+        "success": True,
+        "data": {
+            "job_id": job.id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "created_at": _local(job.created_at),
+            "completed_at": _local(job.completed_at),
+            "error": job.error,
+            "result": result
+        }
+    }
+
+
 @router.get("/treatment/{disease_id}", response_model=dict)
 async def get_treatment_recommendation(
     disease_id: str,
@@ -312,7 +627,8 @@ async def save_detection_history(
     """
 
     try:
-        history = detection_crud.create_detection_history(
+        history = await run_io(
+            detection_crud.create_detection_history,
             db=db,
             user_id=current_user.id,
             disease_id=detection_data["disease_id"],
@@ -362,6 +678,19 @@ async def get_model_info(
         )
 
 
+@router.get("/cache-stats")
+async def get_cache_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get detection result cache statistics (hits, misses, evictions)
+    """
+    return {
+        "success": True,
+        "data": get_result_cache().stats()
+    }
+
+
 @router.get("/supported-diseases")
 async def get_supported_diseases():
     """
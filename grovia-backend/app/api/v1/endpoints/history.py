@@ -9,6 +9,8 @@ from app.dependencies import get_current_active_user
 from app.models.user import User
 from app.crud import detection as detection_crud
 from app.core.exceptions import NotFoundError
+from app.core.executors import run_io
+from app.utils.image_derivatives import image_variants
 from app.utils.timezone_utils import resolve_user_timezone
 
 router = APIRouter()
@@ -27,6 +29,29 @@ def convert_to_local_time(dt, local_tz):
     return dt.astimezone(local_tz)
 
 
+def to_full_url(image_url):
+    """Full URL of a stored image path (accessible from frontend)"""
+    # Support both local storage and Cloudinary URLs
+    if image_url.startswith("http://") or image_url.startswith("https://"):
+        # Already a full URL (Cloudinary)
+        return image_url
+    # Local storage - generate full URL
+    image_filename = image_url.replace("uploads\\", "").replace("uploads/", "").lstrip("/")
+    return f"http://localhost:8000/uploads/{image_filename}"
+
+
+def image_fields(image_url):
+    """image_url, thumbnail_url and srcset ("<url> <width>w, ...") of a history item"""
+    variants = image_variants(image_url)
+    urls = [(variant["width"], to_full_url(variant["url"])) for variant in variants["variants"]]
+    return {
+        "image_url": to_full_url(image_url),  # Full URL with base URL
+        "thumbnail_url": to_full_url(variants["thumbnail_url"]),  # Smallest variant, for lists
+        "srcset": ", ".join(f"{url} {width}w" for width, url in urls),
+        "image_path": image_url  # Original path (for reference)
+    }
+
+
 @router.get("", response_model=dict)
 async def get_history(
     request: Request,
@@ -45,7 +70,8 @@ async def get_history(
     local_tz = resolve_user_timezone(request, current_user)
 
     # Get paginated history
-    items, total = detection_crud.get_detection_history(
+    items, total = await run_io(
+        detection_crud.get_detection_history,
         db=db,
         user_id=current_user.id,
         page=page,
@@ -62,16 +88,6 @@ async def get_history(
         # Convert UTC to local timezone
         local_detected_at = convert_to_local_time(item.detected_at, local_tz)
         
-        # Generate full image URL (accessible from frontend)
-        # Support both local storage and Cloudinary URLs
-        if item.image_url.startswith("http://") or item.image_url.startswith("https://"):
-            # Already a full URL (Cloudinary)
-            full_image_url = item.image_url
-        else:
-            # Local storage - generate full URL
-            image_filename = item.image_url.replace("uploads\\", "").replace("uploads/", "")
-            full_image_url = f"http://localhost:8000/uploads/{image_filename}"
-
         history_items.append({
             "id": item.id,  # Add 'id' for easier frontend access
             "history_id": item.id,
@@ -80,8 +96,7 @@ async def get_history(
             "scientific_name": item.scientific_name or "",
             "confidence": round(item.confidence, 4),
             "confidence_percent": round(item.confidence * 100, 2),  # Add percentage format
-            "image_url": full_image_url,  # Full URL with base URL
-            "image_path": item.image_url,  # Original path (for reference)
+            **image_fields(item.image_url),  # image_url, thumbnail_url, srcset, image_path
             "detected_at": local_detected_at.isoformat(),  # Local timezone
             "date": local_detected_at.strftime("%Y-%m-%d"),  # Formatted date in local time
             "time": local_detected_at.strftime("%H:%M:%S")   # Formatted time in local time
@@ -119,7 +134,8 @@ async def get_history_detail(
     local_tz = resolve_user_timezone(request, current_user)
 
     # Get history item
-    history = detection_crud.get_detection_by_id(
+    history = await run_io(
+        detection_crud.get_detection_by_id,
         db=db,
         history_id=history_id,
         user_id=current_user.id
@@ -139,15 +155,6 @@ async def get_history_detail(
         except:
             symptoms = []
 
-    # Generate full image URL (support both local and Cloudinary)
-    if history.image_url.startswith("http://") or history.image_url.startswith("https://"):
-        # Already a full URL (Cloudinary)
-        full_image_url = history.image_url
-    else:
-        # Local storage - generate full URL
-        image_filename = history.image_url.replace("uploads\\", "").replace("uploads/", "")
-        full_image_url = f"http://localhost:8000/uploads/{image_filename}"
-
     return {
         "success": True,
         "data": {
@@ -157,8 +164,7 @@ async def get_history_detail(
             "scientific_name": history.scientific_name,
             "confidence": round(history.confidence, 4),
             "confidence_percent": round(history.confidence * 100, 2),
-            "image_url": full_image_url,
-            "image_path": history.image_url,
+            **image_fields(history.image_url),
             "description": history.description,
             "symptoms": symptoms,
             "detected_at": local_detected_at.isoformat()  # Local timezone
@@ -177,7 +183,8 @@ async def delete_history(
     """
 
     # Delete history
-    success = detection_crud.delete_detection_history(
+    success = await run_io(
+        detection_crud.delete_detection_history,
         db=db,
         history_id=history_id,
         user_id=current_user.id
@@ -201,7 +208,8 @@ async def get_user_stats(
     Get user detection statistics
     """
 
-    total_detections = detection_crud.get_user_detection_count(
+    total_detections = await run_io(
+        detection_crud.get_user_detection_count,
         db=db,
         user_id=current_user.id
     )
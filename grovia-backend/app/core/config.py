@@ -1,6 +1,7 @@
 """
 Core configuration settings for the application
 """
+import os
 from pathlib import Path
 from typing import List, Tuple
 from pydantic_settings import BaseSettings
@@ -34,6 +35,9 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
     ENCRYPTION_KEY: str
+    # /metrics (internal counters) only with "Authorization: Bearer <token>";
+    # unset = /metrics is not served
+    METRICS_TOKEN: str = ""
 
     MYSQL_SERVER: str = "localhost"
     MYSQL_USER: str
@@ -52,13 +56,134 @@ class Settings(BaseSettings):
     ALLOWED_EXTENSIONS: List[str] = [".jpg", ".jpeg", ".png", ".webp"]
     MAX_IMAGE_SIZE: int = 10 * 1024 * 1024
     MAX_UPLOAD_SIZE: int = 5 * 1024 * 1024
-
-    MODEL_PATH: str = str(ML_MODELS_DIR / "cnn_model.h5")
+    # Local photos: content-addressed blob store in UPLOAD_DIR (app/utils/blob_store.py).
+    # Unused blobs are deleted after the grace period; interval 0 = no
+    # in-process GC (run app.workers.upload_blob_gc from cron instead)
+    UPLOAD_BLOB_GC_GRACE_SECONDS: int = 3600
+    UPLOAD_BLOB_GC_INTERVAL_SECONDS: int = 900
+    # Smaller WebP variants of every photo for history lists (app/utils/image_derivatives.py):
+    # Cloudinary renders them, local ones are written at ingest or on first request
+    IMAGE_DERIVATIVE_WIDTHS: List[int] = [160, 480]
+    IMAGE_DERIVATIVE_QUALITY: int = 75
+    IMAGE_DERIVATIVES_AT_INGEST: bool = True
+
+    # Local classifier (.onnx via onnxruntime, or .npz NumPy model) - see app/ml/cascade.py
+    MODEL_PATH: str = str(ML_MODELS_DIR / "leaf_classifier.onnx")
     LABELS_PATH: str = str(ML_MODELS_DIR / "labels.json")
     IMAGE_SIZE: Tuple[int, int] = (224, 224)
+    LOCAL_CLASSIFIER_ENABLED: bool = False
+    LOCAL_CLASSIFIER_THREADS: int = 1
+    # Calibrate with app.scripts.evaluate_cascade (local precision vs Gemini calls saved)
+    LOCAL_CLASSIFIER_THRESHOLD: float = 0.9
+    CASCADE_MODE: str = "cascade"  # cascade | local | gemini
+    # Gemini gets at most this long when a local answer is ready as fallback
+    CASCADE_GEMINI_BUDGET_SECONDS: float = 20.0
+    CASCADE_BREAKER_FAILURES: int = 3
+    CASCADE_BREAKER_COOLDOWN_SECONDS: float = 60.0
 
     GEMINI_API_KEY: str
 
+    # Decode JPEGs at 1/2, 1/4 or 1/8 scale (DCT scaling) when the largest
+    # level needed still fits - a fraction of the decode time and memory of
+    # a full 12-48MP decode (see app/scripts/bench_preprocessing.py)
+    JPEG_REDUCED_DECODE: bool = True
+
+    # Image payload sent to Gemini (see app/scripts/bench_gemini_payload.py)
+    GEMINI_IMAGE_MAX_SIDE: int = 1024
+    GEMINI_IMAGE_FORMAT: str = "jpeg"
+    GEMINI_IMAGE_QUALITY: int = 85
+    GEMINI_IMAGE_SUBSAMPLING: str = "4:2:0"
+    # JSON response mode with a declared response schema (app/ml/response_schema.py)
+    GEMINI_JSON_MODE: bool = True
+
+    # Keep the static detection prompt in a server-side cached context
+    # (falls back to a plain system instruction if the API refuses)
+    GEMINI_PROMPT_CACHE_ENABLED: bool = False
+    GEMINI_PROMPT_CACHE_TTL_SECONDS: int = 3600
+
+    # NF06: whole detection request (validation, inference, upload, DB)
+    DETECTION_DEADLINE_SECONDS: float = 25.0
+
+    # Gemini call resilience within the request deadline
+    GEMINI_ATTEMPT_TIMEOUT_SECONDS: float = 15.0
+    GEMINI_MAX_ATTEMPTS: int = 3
+    GEMINI_RETRY_BACKOFF_SECONDS: float = 0.5
+    GEMINI_RETRY_BACKOFF_MAX_SECONDS: float = 4.0
+    # Send a duplicate request once an attempt passes the observed p95 latency
+    GEMINI_HEDGE_ENABLED: bool = False
+    GEMINI_HEDGE_MIN_DELAY_SECONDS: float = 2.0
+
+    CLOUDINARY_UPLOAD_TIMEOUT_SECONDS: float = 10.0
+    # Upload to Cloudinary after the response (image_upload_outbox +
+    # app.workers.upload_outbox_worker); the response carries the local URL
+    # and history switches to the CDN URL once uploaded. Opt-in: needs a
+    # persistent UPLOAD_DIR and a long-running process, so never on serverless
+    # (Vercel) - off uploads inside the request.
+    CLOUDINARY_OUTBOX_ENABLED: bool = False
+    CLOUDINARY_OUTBOX_CONCURRENCY: int = 2
+    CLOUDINARY_OUTBOX_MAX_ATTEMPTS: int = 8
+    CLOUDINARY_OUTBOX_RETRY_BACKOFF_SECONDS: float = 5.0
+    CLOUDINARY_OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0
+    CLOUDINARY_OUTBOX_LEASE_SECONDS: int = 120
+    # Direct uploads (/detection/upload-signature + /detection/detect-cloud):
+    # the photo goes from the client to Cloudinary, the API only fetches a
+    # resized derivative. Signatures expire after the TTL (max 3600).
+    CLOUDINARY_SIGNATURE_TTL_SECONDS: int = 600
+    CLOUDINARY_FETCH_TIMEOUT_SECONDS: float = 10.0
+    # Local stand-in for the Cloudinary API and CDN (app.scripts.cloudinary_standin),
+    # e.g. http://127.0.0.1:9100 - development and tests only
+    CLOUDINARY_STANDIN_URL: str = ""
+
+    # Several images per Gemini call in batch paths (see predict_packed_async);
+    # the pack size adapts between 1 and GEMINI_PACK_MAX_SIZE to keep a call
+    # under GEMINI_PACK_TARGET_LATENCY_SECONDS
+    GEMINI_PACKING_ENABLED: bool = False
+    GEMINI_PACK_MAX_SIZE: int = 8
+    GEMINI_PACK_TARGET_LATENCY_SECONDS: float = 10.0
+    GEMINI_PACK_LINGER_MS: int = 50
+
+    # Concurrent batch analysis (analyze_batch, /detect-batch)
+    BATCH_CONCURRENCY: int = 8
+    # /detect-batch: images per request and budget for the whole request
+    MAX_BATCH_IMAGES: int = 30
+    DETECTION_BATCH_DEADLINE_SECONDS: float = 25.0
+
+    # Asynchronous detection jobs (/detection/jobs + app.workers.detection_worker).
+    # The lease must outlive DETECTION_DEADLINE_SECONDS, or a slow job is
+    # picked up a second time while it is still running.
+    DETECTION_JOB_LEASE_SECONDS: int = 120
+    DETECTION_JOB_MAX_ATTEMPTS: int = 3
+    DETECTION_JOB_RETRY_BACKOFF_SECONDS: float = 10.0
+    DETECTION_JOB_WORKER_CONCURRENCY: int = 4
+    DETECTION_JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    # Run a worker inside the API process (not on serverless deployments)
+    DETECTION_JOB_WORKER_IN_PROCESS: bool = False
+
+    # Leaf validator: "exact" (800px, HSV) or "fast" (thumbnail + lookup
+    # table, re-checked at 800px near a threshold) - compare both with
+    # app.scripts.bench_leaf_validator on your own photos first
+    LEAF_VALIDATOR_MODE: str = "exact"
+    # LeafImageValidator.validate_many: threads (OpenCV releases the GIL),
+    # or worker processes fed through shared memory when PROCESSES > 0
+    LEAF_VALIDATION_WORKERS: int = os.cpu_count() or 2
+    LEAF_VALIDATION_PROCESSES: int = 0
+
+    # Executors for blocking work called from async endpoints
+    CPU_EXECUTOR_WORKERS: int = os.cpu_count() or 2
+    IO_EXECUTOR_WORKERS: int = 16
+
+    # Detection result cache (memory LRU + detection_cache table)
+    DETECTION_CACHE_ENABLED: bool = True
+    DETECTION_CACHE_PERSISTENT: bool = True
+    DETECTION_CACHE_MAX_ENTRIES: int = 1024
+    DETECTION_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Near-duplicate reuse via perceptual hash (dHash) lookup
+    PHASH_REUSE_ENABLED: bool = True
+    PHASH_MAX_DISTANCE: int = 6
+    PHASH_MIN_CONFIDENCE: float = 0.85
+    PHASH_INDEX_CHUNKS: int = 3
+
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
     GOOGLE_REDIRECT_URI: str = "http://localhost:5173/auth/google/callback"
@@ -0,0 +1,242 @@
+"""
+Request deadlines, per-attempt timeouts, retries and hedging
+============================================================
+NF06 promises a detection within 25 s. A Deadline is created when the
+request starts and every stage (validation, inference, upload, database)
+runs inside what is left of it:
+
+- Deadline.run(aw, stage): await with the remaining time, raise
+  DeadlineExceededError(stage) when it runs out
+- Deadline.check(stage): fail fast before starting a stage with side
+  effects (file write, cloud upload, DB commit) - those are not cancelled
+  half way, so cleanup never races a write still running in a thread
+- call_with_retries(): per-attempt timeout, retry with full-jitter
+  backoff on retryable errors and, optionally, one hedged duplicate
+  request once the attempt runs longer than the observed p95 latency
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from app.core.exceptions import GroviaException
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DeadlineExceededError(GroviaException):
+    """Request deadline ran out"""
+
+    def __init__(self, stage: str, details=None):
+        self.stage = stage
+        super().__init__(
+            message=f"Processing time limit exceeded during {stage}",
+            status_code=504,
+            error_code="DEADLINE_EXCEEDED",
+            details=details
+        )
+
+
+class Deadline:
+    """Absolute time budget for one request"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self._expires_at
+
+    def check(self, stage: str) -> None:
+        """Raise DeadlineExceededError if no time is left for `stage`"""
+        if self.expired:
+            metrics.increment(f"deadline.exceeded.{stage}")
+            raise DeadlineExceededError(stage)
+
+    async def run(self, aw: Awaitable[T], stage: str) -> T:
+        """
+        Await `aw` within the remaining time
+
+        Work dispatched to an executor keeps running in its thread after a
+        timeout; only use this for stages without side effects.
+        """
+        try:
+            self.check(stage)
+        except DeadlineExceededError:
+            # Never started: close it instead of leaving it un-awaited
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            raise
+        try:
+            return await asyncio.wait_for(aw, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            metrics.increment(f"deadline.exceeded.{stage}")
+            raise DeadlineExceededError(stage)
+
+
+class LatencyTracker:
+    """Rolling window of call latencies (seconds) for hedging decisions"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q-th percentile (0-1) of the window, None until min_samples are seen"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (1-based)"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+async def _cancel(tasks) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _attempt(
+    call: Callable[[], Awaitable[T]],
+    timeout: float,
+    hedge_after: Optional[float],
+    tracker: Optional[LatencyTracker],
+    name: str
+) -> T:
+    """One attempt: primary call plus an optional hedged duplicate, first success wins"""
+    started = time.monotonic()
+    tasks = {asyncio.ensure_future(call())}
+    hedged = False
+    error: Optional[BaseException] = None
+
+    try:
+        while tasks:
+            elapsed = time.monotonic() - started
+            if elapsed >= timeout:
+                raise asyncio.TimeoutError()
+
+            wait_for = timeout - elapsed
+            if not hedged and hedge_after is not None and hedge_after > elapsed:
+                wait_for = min(wait_for, hedge_after - elapsed)
+
+            done, tasks = await asyncio.wait(tasks, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.exception() is None:
+                    if tracker is not None:
+                        tracker.observe(time.monotonic() - started)
+                    if hedged:
+                        metrics.increment(f"{name}.hedge_finished")
+                    return task.result()
+                error = task.exception()
+
+            if (
+                not hedged
+                and hedge_after is not None
+                and time.monotonic() - started >= hedge_after
+                and tasks
+            ):
+                # Still waiting past the usual latency - race a duplicate request
+                hedged = True
+                metrics.increment(f"{name}.hedges")
+                logger.info(f"{name}: no response after {hedge_after:.1f}s, sending hedged request")
+                tasks = tasks | {asyncio.ensure_future(call())}
+
+        raise error
+    finally:
+        # Losers (and everything on timeout/cancellation) are cancelled
+        await _cancel([task for task in tasks if not task.done()])
+
+
+async def call_with_retries(
+    call: Callable[[], Awaitable[T]],
+    *,
+    deadline: Optional[Deadline],
+    attempt_timeout: float,
+    max_attempts: int,
+    is_retryable: Callable[[BaseException], bool],
+    backoff_base: float = 0.5,
+    backoff_max: float = 4.0,
+    hedge_tracker: Optional[LatencyTracker] = None,
+    hedge_percentile: float = 0.95,
+    hedge_min_delay: float = 1.0,
+    stage: str = "inference",
+    name: str = "call"
+) -> T:
+    """
+    Run `call` with per-attempt timeouts, jittered retries and optional hedging
+
+    Args:
+        call: Factory returning a fresh awaitable per attempt
+        deadline: Request deadline (attempts never outlive it)
+        attempt_timeout: Max seconds for one attempt
+        max_attempts: Attempts including the first one
+        is_retryable: Whether an exception may be retried (timeouts always are)
+        hedge_tracker: Latency history; when given, a duplicate request is
+            sent once an attempt passes its `hedge_percentile` latency
+        stage: Stage name reported in DeadlineExceededError
+        name: Metrics prefix
+
+    Returns:
+        Result of the first successful attempt
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        timeout = attempt_timeout
+        if deadline is not None:
+            deadline.check(stage)
+            timeout = min(timeout, deadline.remaining())
+
+        hedge_after = None
+        if hedge_tracker is not None:
+            observed = hedge_tracker.percentile(hedge_percentile)
+            if observed is not None:
+                hedge_after = max(hedge_min_delay, observed)
+
+        metrics.increment(f"{name}.attempts")
+        try:
+            return await _attempt(call, timeout, hedge_after, hedge_tracker, name)
+        except asyncio.TimeoutError as e:
+            metrics.increment(f"{name}.timeouts")
+            error: BaseException = e
+            retryable = True
+        except Exception as e:
+            error = e
+            retryable = is_retryable(e)
+
+        if deadline is not None and deadline.expired:
+            metrics.increment(f"deadline.exceeded.{stage}")
+            raise DeadlineExceededError(stage) from error
+        if not retryable or attempt >= max_attempts:
+            raise error
+
+        delay = backoff_delay(attempt, backoff_base, backoff_max)
+        if deadline is not None and delay >= deadline.remaining():
+            metrics.increment(f"deadline.exceeded.{stage}")
+            raise DeadlineExceededError(stage) from error
+
+        metrics.increment(f"{name}.retries")
+        logger.warning(f"{name}: attempt {attempt} failed ({type(error).__name__}: {error}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
@@ -0,0 +1,75 @@
+"""
+Bounded executors for blocking work called from async endpoints
+
+CPU-bound stages (OpenCV validation, image preprocessing) and blocking
+I/O stages (file writes, Gemini SDK calls, Cloudinary uploads, SQLAlchemy
+sessions) run on separate thread pools so a slow stage never stalls the
+event loop - and a burst of slow I/O never starves the CPU stages.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_cpu_executor: Optional[ThreadPoolExecutor] = None
+_io_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Get or create the executor for CPU-bound stages"""
+    global _cpu_executor
+    if _cpu_executor is None:
+        with _lock:
+            if _cpu_executor is None:
+                _cpu_executor = ThreadPoolExecutor(
+                    max_workers=settings.CPU_EXECUTOR_WORKERS,
+                    thread_name_prefix="grovia-cpu"
+                )
+                logger.info(f"CPU executor started ({settings.CPU_EXECUTOR_WORKERS} workers)")
+    return _cpu_executor
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Get or create the executor for blocking I/O stages"""
+    global _io_executor
+    if _io_executor is None:
+        with _lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(
+                    max_workers=settings.IO_EXECUTOR_WORKERS,
+                    thread_name_prefix="grovia-io"
+                )
+                logger.info(f"I/O executor started ({settings.IO_EXECUTOR_WORKERS} workers)")
+    return _io_executor
+
+
+async def run_cpu(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a CPU-bound callable on the CPU executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking I/O callable on the I/O executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """Shut down both executors (called from the application lifespan)"""
+    global _cpu_executor, _io_executor
+    with _lock:
+        for executor in (_cpu_executor, _io_executor):
+            if executor is not None:
+                executor.shutdown(wait=wait, cancel_futures=True)
+        _cpu_executor = None
+        _io_executor = None
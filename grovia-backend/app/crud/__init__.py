@@ -1,3 +1,3 @@
 # app/crud/__init__.py
 # Empty or:
-from . import user, detection
\ No newline at end of file
+from . import user, detection, detection_cache
\ No newline at end of file
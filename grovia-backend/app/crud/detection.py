@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import desc, asc, func
 from typing import List, Optional, Tuple
 import json
+from app.crud.upload_blob import release_image_url
 from app.models.detection_history import DetectionHistory
 from app.schemas.detection import DetectionHistoryCreate
 
@@ -81,6 +82,8 @@ def delete_detection_history(db: Session, history_id: int, user_id: int) -> bool
     if not history:
         return False
     
+    # Local photo: one reference less (the blob GC deletes unused files)
+    release_image_url(db, history.image_url)
     db.delete(history)
     db.commit()
     
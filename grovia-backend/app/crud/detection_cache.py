@@ -0,0 +1,90 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Iterator, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import json
+from app.models.detection_cache import DetectionCache
+
+
+def _utcnow() -> datetime:
+    # Stored as naive UTC, same as detection_history.detected_at
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def get_cached_result(db: Session, cache_key: str) -> Optional[Dict]:
+    """Get a non-expired cached detection result"""
+    entry = db.query(DetectionCache).filter(
+        DetectionCache.cache_key == cache_key,
+        DetectionCache.expires_at > _utcnow()
+    ).first()
+
+    if not entry:
+        return None
+
+    return json.loads(entry.result)
+
+
+def save_cached_result(
+    db: Session,
+    cache_key: str,
+    model_version: str,
+    result: Dict,
+    ttl_seconds: int,
+    phash: Optional[str] = None
+) -> DetectionCache:
+    """Insert or refresh a cached detection result"""
+    now = _utcnow()
+
+    entry = db.get(DetectionCache, cache_key)
+    if entry is None:
+        entry = DetectionCache(cache_key=cache_key)
+        db.add(entry)
+
+    entry.model_version = model_version
+    entry.disease_id = str(result.get("disease_id", "unknown"))[:100]
+    entry.confidence = float(result.get("confidence", 0.0))
+    if phash is not None:
+        entry.phash = phash
+    entry.result = json.dumps(result, ensure_ascii=False)
+    entry.created_at = now
+    entry.expires_at = now + timedelta(seconds=ttl_seconds)
+
+    db.commit()
+
+    return entry
+
+
+def iter_phash_entries(
+    db: Session,
+    model_version: str,
+    min_confidence: float
+) -> Iterator[Tuple[str, str, float, datetime]]:
+    """Stream (cache_key, phash, confidence, expires_at) of non-expired, confident entries"""
+    query = db.query(
+        DetectionCache.cache_key,
+        DetectionCache.phash,
+        DetectionCache.confidence,
+        DetectionCache.expires_at
+    ).filter(
+        DetectionCache.phash.isnot(None),
+        DetectionCache.model_version == model_version,
+        DetectionCache.confidence >= min_confidence,
+        DetectionCache.expires_at > _utcnow()
+    ).yield_per(10000)
+
+    for cache_key, phash, confidence, expires_at in query:
+        yield cache_key, phash, confidence, expires_at
+
+
+def delete_expired(db: Session, keep_model_version: Optional[str] = None) -> int:
+    """Delete expired entries (and entries from other model versions if given)"""
+    query = db.query(DetectionCache).filter(DetectionCache.expires_at <= _utcnow())
+    deleted = query.delete(synchronize_session=False)
+
+    if keep_model_version is not None:
+        deleted += db.query(DetectionCache).filter(
+            DetectionCache.model_version != keep_model_version
+        ).delete(synchronize_session=False)
+
+    db.commit()
+
+    return deleted
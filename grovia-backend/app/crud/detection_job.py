@@ -0,0 +1,125 @@
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from datetime import datetime, timezone
+import json
+import uuid
+from app.crud.lease_queue import LeaseQueue
+from app.models.detection_history import DetectionHistory
+from app.models.detection_job import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    DetectionJob,
+)
+
+# The image is not needed any more once a job fails for good
+_queue = LeaseQueue(DetectionJob, JOB_QUEUED, JOB_RUNNING, JOB_FAILED, on_give_up={"image_data": None})
+
+
+def _utcnow() -> datetime:
+    # Stored as naive UTC, same as detection_history.detected_at
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def create_job(
+    db: Session,
+    job_id: str,
+    user_id: int,
+    image_data: bytes,
+    original_filename: Optional[str],
+    filename: str,
+    max_attempts: int
+) -> DetectionJob:
+    """Queue a detection job"""
+    now = _utcnow()
+    job = DetectionJob(
+        id=job_id,
+        user_id=user_id,
+        status=JOB_QUEUED,
+        image_data=image_data,
+        original_filename=original_filename,
+        filename=filename,
+        attempts=0,
+        max_attempts=max_attempts,
+        available_at=now,
+        created_at=now
+    )
+    db.add(job)
+    db.commit()
+
+    return job
+
+
+def get_job(db: Session, job_id: str, user_id: int) -> Optional[DetectionJob]:
+    """Get a job owned by the user"""
+    return db.query(DetectionJob).filter(
+        DetectionJob.id == job_id,
+        DetectionJob.user_id == user_id
+    ).first()
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int, lease_seconds: int) -> List[str]:
+    """
+    Lease up to `limit` runnable jobs for a worker (see LeaseQueue.claim)
+
+    Returns:
+        Ids of the jobs claimed by this worker
+    """
+    return _queue.claim(db, worker_id, limit, lease_seconds)
+
+
+def complete_job(
+    db: Session,
+    job_id: str,
+    worker_id: str,
+    history: DetectionHistory,
+    data: Dict
+) -> bool:
+    """
+    Mark a job succeeded and write its detection_history row, atomically
+
+    `history` is a pending (added, uncommitted) row. It is only committed
+    if this worker still holds the job's lease - a job processed twice
+    (lease expired while the first worker was still busy) ends up with
+    exactly one history row. detection_id is filled into `data`.
+
+    Returns:
+        True if this call completed the job
+    """
+    db.flush()
+    data["detection_id"] = history.id
+
+    return _queue.finish(
+        db,
+        job_id,
+        worker_id,
+        JOB_SUCCEEDED,
+        result=json.dumps(data, ensure_ascii=False, default=str),
+        detection_id=history.id,
+        image_data=None
+    )
+
+
+def fail_job(
+    db: Session,
+    job_id: str,
+    worker_id: str,
+    error: str,
+    retry_after: Optional[float] = None
+) -> Optional[str]:
+    """
+    Record a failed attempt
+
+    Args:
+        retry_after: Seconds until the job may run again; None (or no
+            attempts left) fails the job for good
+
+    Returns:
+        New status (queued / failed), or None if the lease was lost
+    """
+    return _queue.fail(db, job_id, worker_id, error, retry_after)
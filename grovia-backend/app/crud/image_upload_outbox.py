@@ -0,0 +1,140 @@
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timezone
+from app.crud.lease_queue import LeaseQueue
+from app.crud.upload_blob import release_image_url
+from app.models.detection_history import DetectionHistory
+from app.models.image_upload_outbox import (
+    UPLOAD_DONE,
+    UPLOAD_FAILED,
+    UPLOAD_PENDING,
+    UPLOAD_RUNNING,
+    ImageUploadOutbox,
+)
+
+_queue = LeaseQueue(ImageUploadOutbox, UPLOAD_PENDING, UPLOAD_RUNNING, UPLOAD_FAILED)
+
+
+def _utcnow() -> datetime:
+    # Stored as naive UTC, same as detection_history.detected_at
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_upload(
+    db: Session,
+    history: DetectionHistory,
+    filename: str,
+    folder: str,
+    public_id: str,
+    max_attempts: int
+) -> ImageUploadOutbox:
+    """
+    Add a pending upload for a pending (uncommitted) history row
+
+    Nothing is committed here: the caller commits the history row and its
+    outbox entry together, so there is never one without the other.
+    """
+    # history.id is needed for the outbox row
+    db.flush()
+
+    now = _utcnow()
+    entry = ImageUploadOutbox(
+        detection_id=history.id,
+        filename=filename,
+        folder=folder,
+        public_id=public_id,
+        status=UPLOAD_PENDING,
+        attempts=0,
+        max_attempts=max_attempts,
+        available_at=now,
+        created_at=now
+    )
+    db.add(entry)
+
+    return entry
+
+
+def count_backlog(db: Session) -> int:
+    """Uploads not finished yet (pending or running)"""
+    return db.query(func.count(ImageUploadOutbox.id)).filter(
+        ImageUploadOutbox.status.in_((UPLOAD_PENDING, UPLOAD_RUNNING))
+    ).scalar() or 0
+
+
+def claim_uploads(db: Session, worker_id: str, limit: int, lease_seconds: int) -> List[int]:
+    """
+    Lease up to `limit` runnable uploads for a worker (see LeaseQueue.claim)
+
+    Uploads interrupted by a restart are drained this way: their lease
+    expires and they become runnable again. An upload given up on keeps
+    its local file.
+
+    Returns:
+        Ids of the uploads claimed by this worker
+    """
+    return _queue.claim(db, worker_id, limit, lease_seconds)
+
+
+def complete_upload(
+    db: Session,
+    upload_id: int,
+    worker_id: str,
+    local_image_url: str,
+    cloud_url: Optional[str]
+) -> Optional[bool]:
+    """
+    Mark an upload done and point its history row at the CDN URL, atomically
+
+    The history row is only changed while it still holds the local URL;
+    it then no longer references the local blob (released in the same
+    transaction).
+
+    Args:
+        cloud_url: Uploaded URL, or None when the upload was skipped
+            (history row deleted in the meantime)
+
+    Returns:
+        True if the history row now holds cloud_url, False if there was
+        no (local) history row left to update, None if the lease was lost
+    """
+    entry = db.get(ImageUploadOutbox, upload_id)
+    if entry is None:
+        return None
+
+    swapped = False
+    if cloud_url is not None and entry.detection_id is not None:
+        result = db.execute(
+            update(DetectionHistory)
+            .where(DetectionHistory.id == entry.detection_id, DetectionHistory.image_url == local_image_url)
+            .values(image_url=cloud_url)
+            .execution_options(synchronize_session=False)
+        )
+        swapped = result.rowcount == 1
+        if swapped:
+            release_image_url(db, local_image_url)
+
+    if not _queue.finish(db, upload_id, worker_id, UPLOAD_DONE, cloud_url=cloud_url):
+        return None
+
+    return swapped
+
+
+def fail_upload(
+    db: Session,
+    upload_id: int,
+    worker_id: str,
+    error: str,
+    retry_after: Optional[float] = None
+) -> Optional[str]:
+    """
+    Record a failed upload attempt
+
+    Args:
+        retry_after: Seconds until the upload may run again; None (or no
+            attempts left) fails it for good - the local file stays in use
+
+    Returns:
+        New status (pending / failed), or None if the lease was lost
+    """
+    return _queue.fail(db, upload_id, worker_id, error, retry_after)
@@ -0,0 +1,177 @@
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+
+
+def _utcnow() -> datetime:
+    # Stored as naive UTC, same as detection_history.detected_at
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class LeaseQueue:
+    """
+    Work queue in a table, shared by several workers through leases
+
+    The table needs id, status, attempts, max_attempts, available_at,
+    lease_owner, lease_expires_at, error and completed_at columns
+    (detection_jobs, image_upload_outbox).
+
+    Args:
+        model: Table model
+        pending: Status of rows waiting to run
+        running: Status of leased rows
+        failed: Status of rows given up on
+        on_give_up: Extra column values when a row fails for good
+            (e.g. drop a payload nobody will read again)
+    """
+
+    def __init__(self, model, pending: str, running: str, failed: str, on_give_up: Optional[Dict[str, Any]] = None):
+        self.model = model
+        self.pending = pending
+        self.running = running
+        self.failed = failed
+        self.on_give_up = on_give_up or {}
+
+    def claim(self, db: Session, worker_id: str, limit: int, lease_seconds: int) -> List:
+        """
+        Lease up to `limit` runnable rows for a worker (commits)
+
+        Runnable: pending and past available_at, or running with an expired
+        lease (the worker holding it died). Each row is claimed with a
+        conditional UPDATE, so two workers racing for the same row cannot
+        both win - no row locks needed (works on MySQL and SQLite alike).
+
+        Returns:
+            Ids of the rows claimed by this worker
+        """
+        model = self.model
+        now = _utcnow()
+
+        # Lease expired on the last allowed attempt - give up on the row
+        db.execute(
+            update(model)
+            .where(
+                model.status == self.running,
+                model.lease_expires_at <= now,
+                model.attempts >= model.max_attempts
+            )
+            .values(
+                status=self.failed,
+                error="Worker lease expired",
+                lease_owner=None,
+                lease_expires_at=None,
+                completed_at=now,
+                **self.on_give_up
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        runnable = or_(
+            and_(model.status == self.pending, model.available_at <= now),
+            and_(model.status == self.running, model.lease_expires_at <= now)
+        )
+        candidates = [
+            row_id for (row_id,) in db.query(model.id)
+            .filter(runnable)
+            .order_by(model.available_at)
+            .limit(limit)
+        ]
+
+        claimed = []
+        for row_id in candidates:
+            result = db.execute(
+                update(model)
+                .where(model.id == row_id, runnable)
+                .values(
+                    status=self.running,
+                    lease_owner=worker_id,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    attempts=model.attempts + 1
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.append(row_id)
+
+        db.commit()
+
+        return claimed
+
+    def owned_by(self, row_id, worker_id: str):
+        """Row is still running under this worker's lease"""
+        return and_(
+            self.model.id == row_id,
+            self.model.status == self.running,
+            self.model.lease_owner == worker_id
+        )
+
+    def finish(self, db: Session, row_id, worker_id: str, status: str, **values) -> bool:
+        """
+        Set a final status while still holding the lease, committing the
+        caller's pending changes with it (rolled back if the lease was lost)
+
+        Returns:
+            True if this worker finished the row
+        """
+        result = db.execute(
+            update(self.model)
+            .where(self.owned_by(row_id, worker_id))
+            .values(
+                status=status,
+                error=None,
+                lease_owner=None,
+                lease_expires_at=None,
+                completed_at=_utcnow(),
+                **values
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        if result.rowcount != 1:
+            db.rollback()
+            return False
+
+        db.commit()
+
+        return True
+
+    def fail(self, db: Session, row_id, worker_id: str, error: str, retry_after: Optional[float] = None) -> Optional[str]:
+        """
+        Record a failed attempt (commits)
+
+        Args:
+            retry_after: Seconds until the row may run again; None (or no
+                attempts left) fails it for good
+
+        Returns:
+            New status (pending / failed), or None if the lease was lost
+        """
+        entry = db.get(self.model, row_id)
+        if entry is None or entry.status != self.running or entry.lease_owner != worker_id:
+            return None
+
+        now = _utcnow()
+        retry = retry_after is not None and entry.attempts < entry.max_attempts
+        values = {
+            "error": error[:500],
+            "lease_owner": None,
+            "lease_expires_at": None
+        }
+        if retry:
+            values.update(status=self.pending, available_at=now + timedelta(seconds=retry_after))
+        else:
+            values.update(status=self.failed, completed_at=now, **self.on_give_up)
+
+        result = db.execute(
+            update(self.model)
+            .where(self.owned_by(row_id, worker_id))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        if result.rowcount != 1:
+            return None
+
+        return values["status"]
@@ -0,0 +1,141 @@
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import List, Tuple
+from datetime import datetime, timedelta, timezone
+from app.models.detection_history import DetectionHistory
+from app.models.upload_blob import UploadBlob, blob_hash, blob_path_of
+
+
+def _utcnow() -> datetime:
+    # Stored as naive UTC, same as detection_history.detected_at
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def register_blob(db: Session, content_hash: str, path: str) -> str:
+    """
+    Make sure a blob row exists before its file is written (commits)
+
+    An unreferenced row gets its grace period restarted, so the GC leaves
+    the file alone until the history row referencing it is committed.
+
+    Returns:
+        Path of the blob (the existing one if the content is already stored)
+    """
+    now = _utcnow()
+    entry = db.get(UploadBlob, content_hash)
+    if entry is None:
+        db.add(UploadBlob(content_hash=content_hash, path=path, ref_count=0, created_at=now, released_at=now))
+        try:
+            db.commit()
+            return path
+        except IntegrityError:
+            # Same content registered concurrently
+            db.rollback()
+            entry = db.get(UploadBlob, content_hash)
+
+    if entry.ref_count <= 0:
+        entry.released_at = now
+    db.commit()
+
+    return entry.path
+
+
+def acquire_blob(db: Session, content_hash: str, path: str) -> None:
+    """
+    One more detection_history row uses the blob
+
+    Nothing is committed here: the caller commits together with the
+    history row, so ref_count never drifts from detection_history.
+    """
+    result = db.execute(
+        update(UploadBlob)
+        .where(UploadBlob.content_hash == content_hash)
+        .values(ref_count=UploadBlob.ref_count + 1, released_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        # Not registered (e.g. stored before upload_blobs existed)
+        db.add(UploadBlob(content_hash=content_hash, path=path, ref_count=1, created_at=_utcnow()))
+
+
+def release_blob(db: Session, content_hash: str) -> None:
+    """One detection_history row less uses the blob (not committed, see acquire_blob)"""
+    db.execute(
+        update(UploadBlob)
+        .where(UploadBlob.content_hash == content_hash, UploadBlob.ref_count > 0)
+        .values(ref_count=UploadBlob.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(UploadBlob)
+        .where(UploadBlob.content_hash == content_hash, UploadBlob.ref_count <= 0)
+        .values(released_at=_utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_image_url(db: Session, image_url: str) -> None:
+    """release_blob for a detection_history.image_url (no-op for CDN URLs and flat files)"""
+    path = blob_path_of(image_url)
+    if path is not None:
+        release_blob(db, blob_hash(path))
+
+
+def find_unreferenced(db: Session, grace_seconds: float, limit: int) -> List[Tuple[str, str]]:
+    """(content_hash, path) of blobs unreferenced for longer than grace_seconds"""
+    cutoff = _utcnow() - timedelta(seconds=grace_seconds)
+    return [
+        (content_hash, path) for content_hash, path in db.query(UploadBlob.content_hash, UploadBlob.path)
+        .filter(UploadBlob.ref_count <= 0, UploadBlob.released_at <= cutoff)
+        .order_by(UploadBlob.released_at)
+        .limit(limit)
+    ]
+
+
+def delete_unreferenced(db: Session, content_hash: str, grace_seconds: float) -> bool:
+    """
+    Delete a blob row if it is still unreferenced past the grace period (commits)
+
+    Returns:
+        True if the row was deleted - the caller removes the file
+    """
+    cutoff = _utcnow() - timedelta(seconds=grace_seconds)
+    result = db.execute(
+        delete(UploadBlob)
+        .where(
+            UploadBlob.content_hash == content_hash,
+            UploadBlob.ref_count <= 0,
+            UploadBlob.released_at <= cutoff
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    return result.rowcount == 1
+
+
+def recount_refs(db: Session) -> int:
+    """
+    Recompute every ref_count from detection_history (repairs drift, commits)
+
+    Returns:
+        Number of blobs whose ref_count changed
+    """
+    counts = dict(
+        db.query(DetectionHistory.image_url, func.count(DetectionHistory.id))
+        .filter(DetectionHistory.image_url.like("uploads/%/%/%"))
+        .group_by(DetectionHistory.image_url)
+    )
+
+    now = _utcnow()
+    changed = 0
+    for entry in db.query(UploadBlob):
+        ref_count = counts.get(f"uploads/{entry.path}", 0)
+        if entry.ref_count != ref_count:
+            changed += 1
+            entry.ref_count = ref_count
+            entry.released_at = now if ref_count == 0 else None
+    db.commit()
+
+    return changed
@@ -2,16 +2,20 @@ from fastapi import Depends, HTTPException, status, UploadFile
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import Optional
-import os
+import secrets
 
 from app.database import get_db
+from app.core.config import settings
 from app.core.security import verify_token
 from app.crud import user as user_crud
 from app.models.user import User
-from app.core.config import settings
+from app.core.executors import run_io
+from app.utils.upload_ingest import check_upload
 
 # Security
 security = HTTPBearer()
+# Same scheme, but a missing header is handled by the dependency
+optional_security = HTTPBearer(auto_error=False)
 
 
 async def get_current_user(
@@ -42,7 +46,7 @@ async def get_current_user(
             )
 
         # Get user from database
-        user = user_crud.get_user_by_id(db, user_id=user_id)
+        user = await run_io(user_crud.get_user_by_id, db, user_id=user_id)
 
         if user is None:
             raise HTTPException(
@@ -82,35 +86,25 @@ async def get_current_active_user(
     return current_user
 
 
-def validate_image_file(file: UploadFile) -> UploadFile:
-    """Validate uploaded image file"""
-
-    # Check file extension
-    file_ext = os.path.splitext(file.filename)[1].lower()
+async def require_metrics_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> None:
+    """Allow /metrics only with METRICS_TOKEN as bearer token (404 while unset)"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
 
-    if file_ext not in settings.ALLOWED_EXTENSIONS:
+    if credentials is None or not secrets.compare_digest(credentials.credentials, settings.METRICS_TOKEN):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Pastikan Anda mengupload foto daun tanaman"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Check file size (read in chunks to avoid memory issues)
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Seek back to start
-
-    if file_size > settings.MAX_UPLOAD_SIZE:
-        max_size_mb = settings.MAX_UPLOAD_SIZE / (1024 * 1024)
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ukuran file terlalu besar. Maksimal {max_size_mb}MB"
-        )
-
-    # Validate it's actually an image
-    if not file.content_type or not file.content_type.startswith('image/'):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Pastikan Anda mengupload foto daun tanaman"
-        )
 
+def validate_image_file(file: UploadFile) -> UploadFile:
+    """
+    Validate uploaded image file: size and real format (sniffed from the
+    first bytes, not the extension or content_type) - see app.utils.upload_ingest
+    """
+    check_upload(file)
     return file
@@ -1,16 +1,30 @@
 """
 Main FastAPI application
 """
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import logging
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.api.v1.router import api_router
+from app.api.uploads import UploadStaticFiles, router as uploads_router
+from app.core.executors import get_cpu_executor, get_io_executor, run_io, shutdown_executors
+from app.core.metrics import metrics
+from app.dependencies import require_metrics_token
 # Switch to Gemini AI Model for better accuracy
 from app.ml.gemini_model import load_gemini_model as load_ml_model
+from app.ml.cascade import get_detection_model
+from app.ml.leaf_validator import get_green_lut, shutdown_validation_pools
+from app.ml.perceptual_hash import load_phash_index
+from app.utils.upload_ingest import UploadSizeLimitMiddleware
+from app.workers.detection_worker import start_in_process_worker, stop_in_process_worker
+from app.workers.upload_blob_gc import start_in_process_blob_gc, stop_in_process_blob_gc
+from app.workers.upload_outbox_worker import (
+    outbox_enabled,
+    start_in_process_outbox_worker,
+    stop_in_process_outbox_worker,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -33,11 +47,35 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Grovia Backend API...")
     logger.info("Loading ML model...")
     load_ml_model()
+    # Cascade router (loads the local classifier) when enabled, else Gemini
+    ml_model = get_detection_model()
+    get_cpu_executor()
+    get_io_executor()
+    if settings.LEAF_VALIDATOR_MODE == "fast":
+        # Build the validator lookup table now, not on the first upload
+        await run_io(get_green_lut)
+    if settings.DETECTION_CACHE_ENABLED and settings.PHASH_REUSE_ENABLED:
+        try:
+            await run_io(load_phash_index, ml_model.model_version)
+        except Exception as e:
+            logger.warning(f"Perceptual hash index not loaded: {e}")
+    if settings.DETECTION_JOB_WORKER_IN_PROCESS:
+        start_in_process_worker()
+    if outbox_enabled():
+        # Also drains uploads left over from before the restart
+        start_in_process_outbox_worker()
+    if settings.UPLOAD_BLOB_GC_INTERVAL_SECONDS > 0:
+        start_in_process_blob_gc()
     logger.info("Application startup complete")
     yield
 
     # Shutdown
     logger.info("Shutting down application...")
+    await stop_in_process_worker()
+    await stop_in_process_outbox_worker()
+    await stop_in_process_blob_gc()
+    shutdown_validation_pools()
+    shutdown_executors()
 
 
 # Create FastAPI application
@@ -48,6 +86,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Cap multipart upload bodies while they stream in (added first: runs inside CORS)
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Add CORS middleware - Allow all origins in development
 app.add_middleware(
     CORSMiddleware,
@@ -58,8 +99,12 @@ app.add_middleware(
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=str(settings.UPLOAD_DIR)), name="uploads")
+# Local image derivatives, rendered on first request (before the static mount below)
+app.include_router(uploads_router)
+
+# Mount static files for uploads (blob store: /uploads/ab/cd/<sha256><ext>, plus older flat files);
+# immutable caching, ETag/304 and byte ranges - see app/api/uploads.py
+app.mount("/uploads", UploadStaticFiles(directory=str(settings.UPLOAD_DIR)), name="uploads")
 
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
@@ -76,6 +121,14 @@ async def health_check():
         "message": "Grovia API is running"
     }
 
+# Metrics endpoint (internal counters - only with METRICS_TOKEN)
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)], include_in_schema=False)
+async def get_metrics():
+    """
+    In-process counters and gauges (detection cache, etc.)
+    """
+    return metrics.snapshot()
+
 # Root redirect to docs
 @app.get("/")
 async def root():
@@ -0,0 +1,150 @@
+"""
+Concurrent batch engine
+=======================
+Runs one async worker per item with bounded parallelism and returns a
+report with one entry per input, in input order:
+
+- status "ok":      worker returned a result
+- status "failed":  worker raised or returned nothing (error is set)
+- status "skipped": item was not attempted (skip check said so, or the
+                    deadline ran out before its turn)
+
+An optional progress callback (sync or async) is called after every
+item completes, so HTTP and CLI front ends can report progress.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, TypeVar, Union
+
+from app.core.deadline import Deadline, DeadlineExceededError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class BatchItemResult(NamedTuple):
+    """Outcome of one batch item"""
+    index: int
+    source: str
+    status: str
+    result: Optional[Dict]
+    error: Optional[str]
+    duration_ms: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+class BatchReport(NamedTuple):
+    """Outcome of a whole batch (items in input order)"""
+    items: List[BatchItemResult]
+    duration_ms: float
+
+    @property
+    def total(self) -> int:
+        return len(self.items)
+
+    def count(self, status: str) -> int:
+        return sum(item.status == status for item in self.items)
+
+    @property
+    def results(self) -> List[Dict]:
+        """Successful results only, in input order"""
+        return [item.result for item in self.items if item.status == STATUS_OK]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "ok": self.count(STATUS_OK),
+            "failed": self.count(STATUS_FAILED),
+            "skipped": self.count(STATUS_SKIPPED),
+            "duration_ms": self.duration_ms,
+            "items": [item.to_dict() for item in self.items]
+        }
+
+
+ProgressCallback = Callable[[int, int, BatchItemResult], Union[None, Awaitable[None]]]
+
+
+async def run_batch(
+    items: Sequence[T],
+    worker: Callable[[T], Awaitable[Optional[Dict]]],
+    *,
+    concurrency: int,
+    describe: Callable[[T], str] = str,
+    skip: Optional[Callable[[T], Optional[str]]] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    deadline: Optional[Deadline] = None
+) -> BatchReport:
+    """
+    Run `worker` over `items` with at most `concurrency` in flight
+
+    Args:
+        items: Batch inputs
+        worker: Async function returning a result dict (None = failed)
+        concurrency: Maximum number of workers running at once
+        describe: Label for an item in the report (e.g. file name)
+        skip: Returns a reason to skip an item without running the worker
+        on_progress: Called as (completed, total, item_result) after each item
+        deadline: Items not started before it runs out are skipped
+
+    Returns:
+        BatchReport with one BatchItemResult per input, in input order
+    """
+    total = len(items)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    outcomes: List[Optional[BatchItemResult]] = [None] * total
+    completed = 0
+    batch_started = time.perf_counter()
+
+    async def _report(outcome: BatchItemResult) -> None:
+        nonlocal completed
+        outcomes[outcome.index] = outcome
+        completed += 1
+        if on_progress is not None:
+            try:
+                ret = on_progress(completed, total, outcome)
+                if inspect.isawaitable(ret):
+                    await ret
+            except Exception as e:
+                logger.warning(f"Batch progress callback failed: {e}")
+
+    async def _run(index: int, item: T) -> None:
+        source = describe(item)
+        reason = skip(item) if skip is not None else None
+        if reason is not None:
+            await _report(BatchItemResult(index, source, STATUS_SKIPPED, None, reason, 0.0))
+            return
+
+        async with semaphore:
+            if deadline is not None and deadline.expired:
+                await _report(BatchItemResult(index, source, STATUS_SKIPPED, None, "Deadline exceeded", 0.0))
+                return
+
+            started = time.perf_counter()
+            try:
+                result = await worker(item)
+                error = None if result else "No prediction"
+            except DeadlineExceededError as e:
+                result, error = None, e.message
+            except Exception as e:
+                logger.warning(f"[WARNING] Failed to process {source}: {e}")
+                result, error = None, str(e)
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        status = STATUS_OK if result else STATUS_FAILED
+        await _report(BatchItemResult(index, source, status, result or None, error, duration_ms))
+
+    await asyncio.gather(*(_run(index, item) for index, item in enumerate(items)))
+
+    return BatchReport(
+        items=list(outcomes),
+        duration_ms=round((time.perf_counter() - batch_started) * 1000, 1)
+    )
@@ -0,0 +1,298 @@
+"""
+Detection Cascade: local classifier first, Gemini when unsure
+=============================================================
+CASCADE_MODE:
+- cascade: local answer if its top class reaches LOCAL_CLASSIFIER_THRESHOLD,
+           otherwise Gemini
+- local:   always the local answer (no Gemini calls)
+- gemini:  always Gemini (local classifier not consulted)
+
+If Gemini is slow (over CASCADE_GEMINI_BUDGET_SECONDS or the request
+deadline), fails, or has failed CASCADE_BREAKER_FAILURES times in a row
+(then skipped for CASCADE_BREAKER_COOLDOWN_SECONDS), the local answer is
+returned even below the threshold, marked "local_fallback".
+
+Every result carries "engine" (local / gemini / local_fallback); fallback
+answers are not cached. The router has the same interface as the Gemini
+model (predict_async, predict_stream, create_packer, model_version).
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceededError
+from app.core.executors import run_cpu
+from app.core.metrics import metrics
+from app.ml.gemini_model import GeminiPlantDiseaseModel, get_gemini_model
+from app.ml.image_input import ImageInput, ImageSource
+from app.ml.local_classifier import LocalClassifier, LocalPrediction, get_local_classifier
+from app.ml.packing import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+ENGINE_LOCAL = "local"
+ENGINE_GEMINI = "gemini"
+ENGINE_LOCAL_FALLBACK = "local_fallback"
+
+CASCADE_MODES = ("cascade", "local", "gemini")
+
+# Time kept back from the request deadline for storage + database after a
+# Gemini fallback
+FALLBACK_RESERVE_SECONDS = 2.0
+
+
+class CascadeRouter:
+    """Routes each image to the local classifier or Gemini"""
+
+    def __init__(
+        self,
+        gemini: GeminiPlantDiseaseModel,
+        local: LocalClassifier,
+        mode: str = "cascade",
+        threshold: float = 0.9
+    ):
+        if mode not in CASCADE_MODES:
+            raise ValueError(f"CASCADE_MODE must be one of {CASCADE_MODES}, got {mode!r}")
+        self.gemini = gemini
+        self.local = local
+        self.mode = mode
+        self.threshold = threshold
+        # Local answers depend on the local model and threshold - part of the cache key
+        self.model_version = f"{gemini.model_version}+{local.model_version}@{threshold:g}:{mode}"
+
+        self._failures = 0
+        self._skip_gemini_until = 0.0
+        self._breaker_lock = threading.Lock()
+
+    # --- routing -----------------------------------------------------------
+
+    async def _classify(self, image_path: ImageSource) -> Optional[LocalPrediction]:
+        if self.mode == "gemini":
+            return None
+        try:
+            prediction = await run_cpu(self.local.classify, image_path)
+        except Exception as e:
+            logger.error(f"Local classifier error: {e}")
+            return None
+        if prediction is not None:
+            metrics.increment("cascade.local_ms_total", prediction.duration_ms)
+        return prediction
+
+    def _answers_locally(self, prediction: Optional[LocalPrediction]) -> bool:
+        if prediction is None:
+            return False
+        return self.mode == "local" or prediction.confidence >= self.threshold
+
+    def _local_result(self, prediction: LocalPrediction, engine: str) -> Dict:
+        metrics.increment(f"cascade.{engine}")
+        result = self.local.to_result(prediction)
+        result["engine"] = engine
+        if engine == ENGINE_LOCAL_FALLBACK:
+            result["analysis_notes"] += " - Gemini tidak tersedia, hasil dari model lokal (perlu dikonfirmasi)"
+        logger.info(f"[CASCADE] {engine}: {prediction.label} ({prediction.confidence:.1%})")
+        return result
+
+    def _gemini_available(self) -> bool:
+        with self._breaker_lock:
+            return time.monotonic() >= self._skip_gemini_until
+
+    def _record_gemini(self, ok: bool) -> None:
+        with self._breaker_lock:
+            if ok:
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._failures >= settings.CASCADE_BREAKER_FAILURES:
+                self._skip_gemini_until = time.monotonic() + settings.CASCADE_BREAKER_COOLDOWN_SECONDS
+                self._failures = 0
+                metrics.increment("cascade.breaker_opened")
+                logger.warning(
+                    f"[CASCADE] Gemini failing, using local answers for {settings.CASCADE_BREAKER_COOLDOWN_SECONDS:.0f}s"
+                )
+
+    def _gemini_deadline(self, deadline: Optional[Deadline], fallback: bool) -> Optional[Deadline]:
+        """Gemini's share of the request deadline (capped when a local fallback exists)"""
+        if not fallback:
+            return deadline
+        budget = settings.CASCADE_GEMINI_BUDGET_SECONDS
+        if deadline is not None:
+            budget = min(budget, deadline.remaining() - FALLBACK_RESERVE_SECONDS)
+        return Deadline(max(0.0, budget))
+
+    # --- model interface ---------------------------------------------------
+
+    async def predict_async(self, image_path: ImageSource, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """Same contract as GeminiPlantDiseaseModel.predict_async, plus "engine" in the result"""
+        if not isinstance(image_path, ImageInput):
+            # Decode once for both engines
+            image_path = await run_cpu(ImageInput.from_path, image_path)
+
+        local = await self._classify(image_path)
+        if self._answers_locally(local):
+            return self._local_result(local, ENGINE_LOCAL)
+
+        if local is not None and not self._gemini_available():
+            return self._local_result(local, ENGINE_LOCAL_FALLBACK)
+
+        try:
+            result = await self.gemini.predict_async(
+                image_path, deadline=self._gemini_deadline(deadline, fallback=local is not None)
+            )
+        except DeadlineExceededError:
+            self._record_gemini(False)
+            if local is None:
+                raise
+            return self._local_result(local, ENGINE_LOCAL_FALLBACK)
+
+        self._record_gemini(result is not None)
+        if result is None:
+            return self._local_result(local, ENGINE_LOCAL_FALLBACK) if local is not None else None
+
+        metrics.increment(f"cascade.{ENGINE_GEMINI}")
+        result["engine"] = ENGINE_GEMINI
+        return result
+
+    async def predict_stream(
+        self,
+        image_path: ImageSource,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Same events as GeminiPlantDiseaseModel.predict_stream
+
+        With a local fallback at hand, Gemini's fields are held back until
+        its result is in: if Gemini then fails, the client only ever sees
+        the fallback's fields, never two contradicting sets.
+        """
+        if not isinstance(image_path, ImageInput):
+            image_path = await run_cpu(ImageInput.from_path, image_path)
+
+        local = await self._classify(image_path)
+        use_local = self._answers_locally(local) or (local is not None and not self._gemini_available())
+
+        if not use_local:
+            result = None
+            held_back: List[Tuple[str, Any]] = []
+            try:
+                async for kind, payload in self.gemini.predict_stream(
+                    image_path, deadline=self._gemini_deadline(deadline, fallback=local is not None)
+                ):
+                    if kind != "field":
+                        result = payload
+                    elif local is not None:
+                        held_back.append(payload)
+                    else:
+                        yield kind, payload
+            except DeadlineExceededError:
+                if local is None:
+                    self._record_gemini(False)
+                    raise
+
+            self._record_gemini(result is not None)
+            if result is not None or local is None:
+                if result is not None:
+                    metrics.increment(f"cascade.{ENGINE_GEMINI}")
+                    result["engine"] = ENGINE_GEMINI
+                for payload in held_back:
+                    yield "field", payload
+                yield "result", result
+                return
+
+        engine = ENGINE_LOCAL if self._answers_locally(local) else ENGINE_LOCAL_FALLBACK
+        result = self._local_result(local, engine)
+        for field in ("disease_id", "disease_name", "scientific_name", "confidence", "symptoms", "recommendations"):
+            yield "field", (field, result[field])
+        yield "result", result
+
+    async def _predict_many(self, image_paths: List[ImageSource], deadline: Optional[Deadline]) -> List[Optional[Dict]]:
+        """Local answers where confident; the rest share packed Gemini calls"""
+        locals_ = await asyncio.gather(*(self._classify(path) for path in image_paths))
+        results: List[Optional[Dict]] = [None] * len(image_paths)
+        escalate = []
+        for index, local in enumerate(locals_):
+            if self._answers_locally(local):
+                results[index] = self._local_result(local, ENGINE_LOCAL)
+            elif local is not None and not self._gemini_available():
+                results[index] = self._local_result(local, ENGINE_LOCAL_FALLBACK)
+            else:
+                escalate.append(index)
+
+        if escalate:
+            any_local = any(locals_[i] is not None for i in escalate)
+            try:
+                remote = await self.gemini.predict_packed_async(
+                    [image_paths[i] for i in escalate],
+                    deadline=self._gemini_deadline(deadline, fallback=any_local)
+                )
+            except DeadlineExceededError:
+                if not any_local:
+                    raise
+                remote = [None] * len(escalate)
+
+            self._record_gemini(any(result is not None for result in remote))
+            for index, result in zip(escalate, remote):
+                if result is not None:
+                    metrics.increment(f"cascade.{ENGINE_GEMINI}")
+                    result["engine"] = ENGINE_GEMINI
+                    results[index] = result
+                elif locals_[index] is not None:
+                    results[index] = self._local_result(locals_[index], ENGINE_LOCAL_FALLBACK)
+        return results
+
+    def create_packer(self, deadline: Optional[Deadline] = None) -> MicroBatcher:
+        """Micro-batcher like GeminiPlantDiseaseModel.create_packer, local stage first"""
+        return MicroBatcher(
+            lambda image_paths: self._predict_many(image_paths, deadline),
+            max_size=lambda: self.gemini.pack_size.size,
+            linger=settings.GEMINI_PACK_LINGER_MS / 1000
+        )
+
+    def get_info(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "model_version": self.model_version,
+            "local_engine": self.local.engine.name,
+            "diseases": [
+                {"name": label, **{k: v for k, v in self.local.class_details(label).items()
+                                   if k in ("disease_id", "disease_name", "scientific_name")}}
+                for label in self.local.labels
+            ]
+        }
+
+
+# Global router instance (singleton pattern)
+_router: Optional[CascadeRouter] = None
+_router_failed = False
+_lock = threading.Lock()
+
+
+def get_detection_model():
+    """
+    Model used by the detection endpoints: the cascade router when
+    LOCAL_CLASSIFIER_ENABLED (and the local model loads), else Gemini
+    """
+    global _router, _router_failed
+    if not settings.LOCAL_CLASSIFIER_ENABLED or _router_failed:
+        return get_gemini_model()
+
+    if _router is None:
+        with _lock:
+            if _router is None and not _router_failed:
+                try:
+                    _router = CascadeRouter(
+                        get_gemini_model(),
+                        get_local_classifier(),
+                        mode=settings.CASCADE_MODE,
+                        threshold=settings.LOCAL_CLASSIFIER_THRESHOLD
+                    )
+                    logger.info(f"Detection cascade ready ({_router.model_version})")
+                except Exception as e:
+                    # Misconfigured local model must not take detection down
+                    logger.error(f"Local classifier unavailable, using Gemini only: {e}")
+                    _router_failed = True
+                    return get_gemini_model()
+    return _router
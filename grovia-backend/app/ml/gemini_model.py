@@ -2,18 +2,120 @@
 Gemini AI Model for Plant Disease Detection
 """
 import google.generativeai as genai
-from PIL import Image
+from google.api_core import exceptions as google_exceptions
+from google.api_core.exceptions import InvalidArgument
+import asyncio
+import datetime
+import hashlib
 import os
 import logging
-from typing import Dict, Optional, List
-import json
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional, List, Tuple
 from pathlib import Path
 
+from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceededError, LatencyTracker, call_with_retries
+from app.core.executors import run_cpu, run_io
+from app.ml.batch import STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, BatchReport, ProgressCallback, run_batch
+from app.core.metrics import metrics
+from app.ml.image_input import ImageInput, ImageSource
+from app.ml.incremental_json import IncrementalJSONParser
+from app.ml.packing import MicroBatcher, PackSizeController
+from app.ml.preprocessing import ImageEncoding
+from app.ml.response_schema import (
+    DETECTION_SCHEMA,
+    PACKED_DETECTION_SCHEMA,
+    ResponseParseError,
+    loads,
+    parse_response,
+    schema_errors,
+)
+
 from dotenv import load_dotenv
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Model dan versi prompt - ubah PROMPT_VERSION setiap kali prompt diubah
+# supaya cache hasil deteksi lama tidak dipakai lagi. Fingerprint teks
+# instruksi ikut masuk ke model_version, jadi lupa bump pun cache tetap invalid.
+GEMINI_MODEL_NAME = 'gemini-2.5-flash'
+PROMPT_VERSION = '2025.11.2'
+
+# Bagian prompt yang dikirim per request (instruksi statis ada di system instruction)
+DETECTION_REQUEST = "Analisis foto daun tanaman ini sesuai instruksi. Kembalikan HANYA JSON dengan format yang diminta."
+
+# Versi untuk beberapa foto dalam satu request (lihat predict_packed_async)
+PACKED_DETECTION_REQUEST = (
+    "Ada {count} foto daun tanaman, masing-masing diawali label \"Foto #i\" (i = 0 sampai {last}). "
+    "Analisis SETIAP foto secara terpisah sesuai instruksi. Kembalikan HANYA JSON array berisi tepat "
+    "{count} objek, satu per foto, masing-masing dengan format JSON yang diminta ditambah field "
+    "\"image_index\" berisi nomor foto tersebut."
+)
+
+# Refresh cached context this long before it expires on the server
+PROMPT_CACHE_REFRESH_MARGIN_SECONDS = 60
+PROMPT_CACHE_RETRY_SECONDS = 300
+
+# Errors worth another attempt (rate limit, overload, transient server/network errors)
+RETRYABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.GatewayTimeout,
+    ConnectionError,
+)
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether a failed Gemini call may be retried"""
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def strip_code_fence(response_text: str) -> str:
+    """Remove a markdown code block around a JSON response"""
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text[7:]
+    elif response_text.startswith('```'):
+        response_text = response_text[3:]
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+
+def json_generation_config(schema: Dict) -> Optional[genai.GenerationConfig]:
+    """JSON response mode constrained to `schema` (None = free text, GEMINI_JSON_MODE off)"""
+    if not settings.GEMINI_JSON_MODE:
+        return None
+    return genai.GenerationConfig(response_mime_type="application/json", response_schema=schema)
+
+
+def record_parse_outcome(outcome: str) -> None:
+    """
+    Count one parsed response: "ok", "schema_violation" (JSON, repaired
+    with defaults) or "failure" (not usable JSON, fallback result)
+    """
+    metrics.increment("gemini.responses_parsed")
+    if outcome != "ok":
+        metrics.increment(f"gemini.parse_{outcome}s")
+    parsed = metrics.get("gemini.responses_parsed")
+    metrics.set_gauge("gemini.parse_failure_rate", round(metrics.get("gemini.parse_failures") / parsed, 4))
+
+
+def image_encoding_from_settings() -> ImageEncoding:
+    """Gemini image payload encoding configured for this deployment"""
+    return ImageEncoding(
+        max_side=settings.GEMINI_IMAGE_MAX_SIDE,
+        format=settings.GEMINI_IMAGE_FORMAT.lower(),
+        quality=settings.GEMINI_IMAGE_QUALITY,
+        subsampling=settings.GEMINI_IMAGE_SUBSAMPLING
+    ).validate()
+
+
 class GeminiPlantDiseaseModel:
     """Gemini AI for plant disease detection using Google Gemini Vision API"""
     
@@ -28,13 +130,49 @@ class GeminiPlantDiseaseModel:
         # Configure Gemini
         genai.configure(api_key=api_key)
         
+        # Static instructions are sent as system instruction, built once
+        self.system_instruction = self.create_system_instruction()
+        self.prompt_fingerprint = hashlib.sha256(self.system_instruction.encode("utf-8")).hexdigest()[:12]
+
         # Use Gemini 2.5 Flash - latest and fastest multimodal model!
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.model = genai.GenerativeModel(GEMINI_MODEL_NAME, system_instruction=self.system_instruction)
+        self.model_version = f"{GEMINI_MODEL_NAME}:{PROMPT_VERSION}:{self.prompt_fingerprint}"
+        self.image_encoding = image_encoding_from_settings()
+        # JSON response mode: output constrained to the response schema
+        self.generation_config = json_generation_config(DETECTION_SCHEMA)
+        self.packed_generation_config = json_generation_config(PACKED_DETECTION_SCHEMA)
+
+        # Optional server-side cached context holding the system instruction
+        self._prompt_cache_enabled = settings.GEMINI_PROMPT_CACHE_ENABLED
+        self._prompt_cache_model = None
+        self._prompt_cache_expires_at = 0.0
+        self._prompt_cache_lock = threading.Lock()
+
+        # Observed call latencies, used to decide when to hedge
+        self.latency = LatencyTracker()
+
+        # Images per packed request, adapted to measured latency
+        self.pack_size = PackSizeController(
+            max_size=settings.GEMINI_PACK_MAX_SIZE,
+            target_latency=settings.GEMINI_PACK_TARGET_LATENCY_SECONDS,
+            initial_size=max(2, settings.GEMINI_PACK_MAX_SIZE // 2)
+        )
         
         logger.info("Gemini AI Plant Disease Model initialized (No RAG)")
         print("Gemini AI Plant Disease Detection ready!")
     
     def create_detection_prompt(self) -> str:
+        """
+        Bagian prompt per request (pendek) - instruksi lengkap ada di
+        create_system_instruction dan hanya di-set sekali
+        """
+        return DETECTION_REQUEST
+
+    def create_packed_prompt(self, count: int) -> str:
+        """Bagian prompt per request untuk `count` foto dalam satu request"""
+        return PACKED_DETECTION_REQUEST.format(count=count, last=count - 1)
+
+    def create_system_instruction(self) -> str:
         """
         Create optimized prompt untuk plant disease detection
         dengan kemampuan membedakan penyakit vs defisiensi nutrisi
@@ -439,77 +577,166 @@ class GeminiPlantDiseaseModel:
         return prompt
         
     
-    def predict(self, image_path: str) -> Optional[Dict]:
+    def _prepare_image(self, image_path: ImageSource) -> Optional[Dict]:
+        """
+        Load, downsize and encode the image that is sent to Gemini
+
+        Returns:
+            Blob dict {"mime_type", "data"} or None if the file does not
+            exist or cannot be decoded
+        """
+        if not isinstance(image_path, ImageInput):
+            # Verify file exists
+            if not os.path.exists(image_path):
+                logger.error(f"Image not found: {image_path}")
+                return None
+
+            logger.debug(f"[IMAGE] Loading image: {image_path}")
+            image_path = ImageInput.from_path(image_path)
+
+        # Encoded once per ImageInput + encoding, retries reuse the same bytes
+        payload = image_path.payload(self.image_encoding)
+        if payload is None:
+            logger.error("Image could not be decoded")
+        return payload
+
+    def _record_request(self, image: Dict) -> None:
+        metrics.increment("gemini.requests")
+        metrics.increment("gemini.request_image_bytes", len(image["data"]))
+
+    def _record_usage(self, response) -> Dict[str, int]:
+        """Input/output token counts reported for one call (also added to metrics)"""
+        usage = getattr(response, "usage_metadata", None)
+        token_usage = {
+            "input_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "cached_input_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0
+        }
+        for name, value in token_usage.items():
+            metrics.increment(f"gemini.{name}", value)
+        return token_usage
+
+    def _generation_model(self):
+        """
+        Model used for generate calls (blocking when the cached context is refreshed)
+
+        With GEMINI_PROMPT_CACHE_ENABLED the system instruction lives in a
+        server-side cached context, so its tokens are billed at the cached
+        rate. If the API refuses (e.g. prompt below the minimum cacheable
+        size) we fall back to the plain system instruction for good; other
+        errors fall back until the next retry.
+        """
+        if not self._prompt_cache_enabled:
+            return self.model
+
+        with self._prompt_cache_lock:
+            if self._prompt_cache_model is not None and time.monotonic() < self._prompt_cache_expires_at:
+                return self._prompt_cache_model
+
+            ttl = settings.GEMINI_PROMPT_CACHE_TTL_SECONDS
+            try:
+                cached_content = genai.caching.CachedContent.create(
+                    model=f"models/{GEMINI_MODEL_NAME}",
+                    display_name=f"grovia-detection-{PROMPT_VERSION}-{self.prompt_fingerprint}",
+                    system_instruction=self.system_instruction,
+                    ttl=datetime.timedelta(seconds=ttl)
+                )
+            except InvalidArgument as e:
+                # Not cacheable (too small / unsupported model) - stop trying
+                logger.warning(f"Prompt context cache refused, using system instruction: {e}")
+                self._prompt_cache_enabled = False
+                self._prompt_cache_model = None
+                return self.model
+            except Exception as e:
+                # Transient error - use the system instruction and retry later
+                logger.warning(f"Prompt context cache unavailable, retrying in {PROMPT_CACHE_RETRY_SECONDS}s: {e}")
+                self._prompt_cache_model = self.model
+                self._prompt_cache_expires_at = time.monotonic() + PROMPT_CACHE_RETRY_SECONDS
+                return self.model
+
+            self._prompt_cache_model = genai.GenerativeModel.from_cached_content(cached_content)
+            self._prompt_cache_expires_at = time.monotonic() + max(0, ttl - PROMPT_CACHE_REFRESH_MARGIN_SECONDS)
+            logger.info(f"Prompt context cached: {cached_content.name} (ttl {ttl}s)")
+            return self._prompt_cache_model
+
+    def _parse_response(self, response) -> Optional[Dict]:
+        """
+        Parse Gemini response text into a validated detection result
+
+        Returns:
+            Detection result dict or None if the response is empty
+        """
+        if not response or not response.text:
+            logger.error("Empty response from Gemini")
+            return None
+
+        return self._parse_text(response.text)
+
+    def _parse_text(self, response_text: str) -> Optional[Dict]:
+        """Parse the (complete) response text into a validated detection result"""
+        if not response_text or not response_text.strip():
+            logger.error("Empty response from Gemini")
+            return None
+
+        # Extract JSON from response (remove markdown code blocks if present -
+        # never the case in JSON response mode)
+        response_text = strip_code_fence(response_text)
+
+        # Parse JSON + schema check in one pass
+        try:
+            result = parse_response(response_text, DETECTION_SCHEMA)
+            record_parse_outcome("ok")
+        except ResponseParseError as e:
+            if isinstance(e.data, dict):
+                # Usable JSON, just off-schema - missing fields get defaults below
+                logger.warning(f"Response does not match the schema: {e}")
+                record_parse_outcome("schema_violation")
+                result = e.data
+            else:
+                logger.error(f"Failed to parse JSON: {e}")
+                logger.error(f"Raw response: {response_text[:200]}")
+                record_parse_outcome("failure")
+                result = self._create_fallback_response(response_text)
+
+        # Validate and enhance result
+        result = self._validate_and_enhance_result(result)
+
+        logger.info(f"Detection: {result['disease_name']} (Confidence: {result['confidence']:.1%})")
+
+        return result
+
+    def predict(self, image_path: ImageSource) -> Optional[Dict]:
         """
         Predict plant disease menggunakan Gemini AI
         Pure AI vision analysis - No RAG dependency!
         
         Args:
-            image_path: Path ke gambar tanaman
+            image_path: Path ke gambar tanaman (atau ImageInput di memori)
             
         Returns:
             Dictionary dengan hasil deteksi atau None jika error
         """
         try:
-            # Verify file exists
-            if not os.path.exists(image_path):
-                logger.error(f"Image not found: {image_path}")
+            image = self._prepare_image(image_path)
+            if image is None:
                 return None
             
-            # Load image
-            logger.debug(f"[IMAGE] Loading image: {image_path}")
-            image = Image.open(image_path)
-            
-            # Resize jika terlalu besar (untuk efisiensi)
-            max_size = 1024
-            if max(image.size) > max_size:
-                ratio = max_size / max(image.size)
-                new_size = (int(image.width * ratio), int(image.height * ratio))
-                image = image.resize(new_size, Image.Resampling.LANCZOS)
-                logger.debug(f"Resized to: {new_size}")
-            
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
             # Create prompt
             prompt = self.create_detection_prompt()
             
             # Generate response from Gemini
-            logger.debug(f"Analyzing with Gemini AI...")
-            response = self.model.generate_content([prompt, image])
-            
-            # Parse response
-            if not response or not response.text:
-                logger.error("Empty response from Gemini")
-                return None
-            
-            # Extract JSON from response
-            response_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            elif response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            
-            response_text = response_text.strip()
-            
-            # Parse JSON
-            try:
-                result = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON: {e}")
-                logger.error(f"Raw response: {response_text[:200]}")
-                result = self._create_fallback_response(response_text)
-            
-            # Validate and enhance result
-            result = self._validate_and_enhance_result(result)
-            
-            logger.info(f"Detection: {result['disease_name']} (Confidence: {result['confidence']:.1%})")
+            logger.debug("Analyzing with Gemini AI...")
+            model = self._generation_model()
+            self._record_request(image)
+            response = model.generate_content(
+                [prompt, image],
+                generation_config=self.generation_config,
+                request_options={"timeout": settings.GEMINI_ATTEMPT_TIMEOUT_SECONDS}
+            )
             
+            result = self._parse_response(response)
+            if result:
+                result["token_usage"] = self._record_usage(response)
             return result
             
         except Exception as e:
@@ -517,7 +744,298 @@ class GeminiPlantDiseaseModel:
             import traceback
             traceback.print_exc()
             return None
+
+    async def predict_async(self, image_path: ImageSource, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """
+        Async variant of predict using the SDK's native async generation API
+
+        Image loading runs on the CPU executor; the Gemini call itself is
+        awaited on the event loop, so many calls can be in flight at once
+        without holding a thread each. Same result contract as predict.
+        Each attempt has its own timeout and retryable errors are retried
+        with jittered backoff (see app.core.deadline).
+
+        Args:
+            image_path: Path ke gambar tanaman (atau ImageInput di memori)
+            deadline: Request deadline; DeadlineExceededError is raised
+                (not swallowed) when it runs out
+
+        Returns:
+            Dictionary dengan hasil deteksi atau None jika error
+        """
+        try:
+            image = await self._prepare_image_async(image_path, deadline)
+            if image is None:
+                return None
+
+            prompt = self.create_detection_prompt()
+
+            logger.debug("Analyzing with Gemini AI (async)...")
+            model = await run_io(self._generation_model) if self._prompt_cache_enabled else self.model
+
+            def _call():
+                self._record_request(image)
+                return model.generate_content_async([prompt, image], generation_config=self.generation_config)
+
+            response = await self._call_with_retries(_call, deadline, hedge=settings.GEMINI_HEDGE_ENABLED)
+
+            result = self._parse_response(response)
+            if result:
+                result["token_usage"] = self._record_usage(response)
+            return result
+
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"Gemini prediction error: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
     
+    async def predict_stream(
+        self,
+        image_path: ImageSource,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming variant of predict_async
+
+        Only opening the stream is retried (nothing has been emitted yet);
+        waiting for every chunk is bounded by the deadline.
+
+        Args:
+            image_path: Path ke gambar tanaman (atau ImageInput di memori)
+            deadline: Request deadline; DeadlineExceededError is raised
+                when it runs out
+
+        Yields:
+            ("field", (name, value)) for each top-level field of the
+            diagnosis as soon as Gemini has streamed it completely, then
+            exactly one ("result", dict or None) with the same contract
+            as predict_async
+        """
+        try:
+            image = await self._prepare_image_async(image_path, deadline)
+            if image is None:
+                yield "result", None
+                return
+
+            prompt = self.create_detection_prompt()
+
+            logger.debug("Analyzing with Gemini AI (stream)...")
+            model = await run_io(self._generation_model) if self._prompt_cache_enabled else self.model
+
+            def _call():
+                self._record_request(image)
+                return model.generate_content_async(
+                    [prompt, image], generation_config=self.generation_config, stream=True
+                )
+
+            response = await self._call_with_retries(_call, deadline, hedge=False)
+
+            parser = IncrementalJSONParser()
+            chunks = []
+            iterator = response.__aiter__()
+            while True:
+                try:
+                    if deadline is not None:
+                        chunk = await deadline.run(iterator.__anext__(), "inference")
+                    else:
+                        chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. only finish reason / usage)
+                    continue
+                chunks.append(text)
+                for field in parser.feed(text):
+                    yield "field", field
+
+            result = self._parse_text("".join(chunks))
+            if result:
+                result["token_usage"] = self._record_usage(response)
+            yield "result", result
+
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"Gemini prediction error: {e}")
+            import traceback
+            traceback.print_exc()
+            yield "result", None
+
+    async def predict_packed_async(
+        self,
+        image_paths: List[ImageSource],
+        deadline: Optional[Deadline] = None
+    ) -> List[Optional[Dict]]:
+        """
+        Analyze several images in one Gemini call (prompt and round trip shared)
+
+        The response must be a JSON array with one diagnosis per image,
+        identified by "image_index". Every item is checked on its own;
+        images whose item is missing or malformed - or all of them if the
+        response is not an array or the call fails - are analyzed again
+        with predict_async. Call latency and malformed responses feed the
+        adaptive pack size (self.pack_size).
+
+        Args:
+            image_paths: Images (paths or ImageInput)
+            deadline: Request deadline; DeadlineExceededError is raised
+                when it runs out
+
+        Returns:
+            One result (same contract as predict_async) per image, in order
+        """
+        if len(image_paths) == 1:
+            # Pack size went down to one - still measured, so it can grow again
+            started = time.monotonic()
+            result = await self.predict_async(image_paths[0], deadline=deadline)
+            self.pack_size.observe(1, time.monotonic() - started, ok=result is not None)
+            return [result]
+
+        results: List[Optional[Dict]] = [None] * len(image_paths)
+        images = await asyncio.gather(*(self._prepare_image_async(p, deadline) for p in image_paths))
+        # Undecodable images stay None, as in predict_async
+        packed = [index for index, image in enumerate(images) if image is not None]
+        retry = list(packed)
+
+        if len(packed) > 1:
+            contents: List[Any] = [self.create_packed_prompt(len(packed))]
+            for position, index in enumerate(packed):
+                contents += [f"Foto #{position}", images[index]]
+
+            logger.debug(f"Analyzing {len(packed)} images with one Gemini call...")
+            model = await run_io(self._generation_model) if self._prompt_cache_enabled else self.model
+
+            def _call():
+                metrics.increment("gemini.requests")
+                metrics.increment("gemini.request_image_bytes", sum(len(images[i]["data"]) for i in packed))
+                return model.generate_content_async(contents, generation_config=self.packed_generation_config)
+
+            started = time.monotonic()
+            try:
+                response = await self._call_with_retries(_call, deadline, hedge=False)
+                items = self._parse_packed_text(response.text if response else "", len(packed))
+            except DeadlineExceededError:
+                raise
+            except Exception as e:
+                logger.warning(f"Packed Gemini call failed, falling back to single calls: {e}")
+                response, items = None, None
+            elapsed = time.monotonic() - started
+
+            metrics.increment("gemini.packed_calls")
+            metrics.increment("gemini.packed_images", len(packed))
+            self.pack_size.observe(
+                len(packed), elapsed, ok=items is not None and all(item is not None for item in items)
+            )
+
+            if items is not None:
+                # Each image carries its share of the call's tokens
+                token_usage = self._record_usage(response)
+                share = {name: value // len(packed) for name, value in token_usage.items()}
+                for position, index in enumerate(packed):
+                    if items[position] is not None:
+                        results[index] = items[position]
+                        results[index]["token_usage"] = dict(share, packed_images=len(packed))
+                retry = [index for index in packed if results[index] is None]
+
+        if retry and len(packed) > 1:
+            metrics.increment("gemini.pack_fallback_images", len(retry))
+            logger.warning(f"Packed response incomplete, analyzing {len(retry)} image(s) one by one")
+        fallback = await asyncio.gather(*(self.predict_async(image_paths[i], deadline=deadline) for i in retry))
+        for index, result in zip(retry, fallback):
+            results[index] = result
+        return results
+
+    def create_packer(self, deadline: Optional[Deadline] = None) -> MicroBatcher:
+        """
+        Micro-batcher for this event loop: concurrent `await packer.submit(image)`
+        calls are sent together through predict_packed_async, up to the
+        current adaptive pack size
+        """
+        return MicroBatcher(
+            lambda image_paths: self.predict_packed_async(image_paths, deadline=deadline),
+            max_size=lambda: self.pack_size.size,
+            linger=settings.GEMINI_PACK_LINGER_MS / 1000
+        )
+
+    def _parse_packed_text(self, response_text: str, count: int) -> Optional[List[Optional[Dict]]]:
+        """
+        Parse a packed response into one validated result per image
+
+        Returns:
+            None if the response is not a JSON array at all, otherwise a
+            list of `count` entries - None where the item for that image is
+            missing, duplicated or malformed
+        """
+        try:
+            data = loads(strip_code_fence(response_text or ""))
+        except ResponseParseError as e:
+            logger.error(f"Failed to parse packed JSON: {e}")
+            record_parse_outcome("failure")
+            return None
+        if not isinstance(data, list):
+            logger.error(f"Packed response is not a JSON array: {type(data).__name__}")
+            record_parse_outcome("failure")
+            return None
+        # Items are checked one by one: a bad item only costs its own photo
+
+        items: List[Optional[Dict]] = [None] * count
+        seen = set()
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            index = item.pop("image_index", None)
+            if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < count:
+                continue
+            if index in seen:
+                # Two answers for one photo - trust neither
+                items[index] = None
+                continue
+            seen.add(index)
+            if not self._is_complete_item(item):
+                record_parse_outcome("failure")
+                continue
+            record_parse_outcome("schema_violation" if schema_errors(item, DETECTION_SCHEMA) else "ok")
+            items[index] = self._validate_and_enhance_result(item)
+        return items
+
+    @staticmethod
+    def _is_complete_item(item: Dict) -> bool:
+        """Strict check of one packed item before _validate_and_enhance_result fills defaults"""
+        for field in ("disease_id", "disease_name"):
+            if not isinstance(item.get(field), str) or not item[field].strip():
+                return False
+        try:
+            confidence = float(item.get("confidence"))
+        except (TypeError, ValueError):
+            return False
+        return 0.0 <= confidence <= 1.0
+
+    async def _prepare_image_async(self, image_path: ImageSource, deadline: Optional[Deadline]) -> Optional[Dict]:
+        if deadline is None:
+            return await run_cpu(self._prepare_image, image_path)
+        return await deadline.run(run_cpu(self._prepare_image, image_path), "preprocessing")
+
+    async def _call_with_retries(self, call, deadline: Optional[Deadline], hedge: bool):
+        """Gemini call with per-attempt timeout, jittered retries and optional hedging"""
+        return await call_with_retries(
+            call,
+            deadline=deadline,
+            attempt_timeout=settings.GEMINI_ATTEMPT_TIMEOUT_SECONDS,
+            max_attempts=settings.GEMINI_MAX_ATTEMPTS,
+            is_retryable=is_retryable_error,
+            backoff_base=settings.GEMINI_RETRY_BACKOFF_SECONDS,
+            backoff_max=settings.GEMINI_RETRY_BACKOFF_MAX_SECONDS,
+            hedge_tracker=self.latency if hedge else None,
+            hedge_min_delay=settings.GEMINI_HEDGE_MIN_DELAY_SECONDS,
+            name="gemini"
+        )
+
     def _create_fallback_response(self, response_text: str) -> Dict:
         """Create fallback response jika JSON parsing failed"""
         logger.warning("Creating fallback response from text")
@@ -593,31 +1111,92 @@ class GeminiPlantDiseaseModel:
         
         return result
     
-    def analyze_batch(self, image_paths: List[str]) -> List[Dict]:
+    def analyze_batch(
+        self,
+        image_paths: List[ImageSource],
+        concurrency: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        packed: Optional[bool] = None
+    ) -> BatchReport:
         """
-        Analyze multiple images in batch
-        
+        Analyze multiple images in batch (blocking wrapper around
+        analyze_batch_async - do not call from inside an event loop)
+
         Args:
-            image_paths: List of image file paths
-            
+            image_paths: List of image file paths (or ImageInput)
+            concurrency: Maximum number of Gemini calls in flight
+            on_progress: Called as (completed, total, item) after each image
+            packed: Send several images per Gemini call (default GEMINI_PACKING_ENABLED)
+
         Returns:
-            List of detection results
+            BatchReport with one entry per image, in input order
         """
-        results = []
-        
-        logger.info(f"Batch analysis: {len(image_paths)} images")
-        
-        for i, image_path in enumerate(image_paths, 1):
-            logger.info(f"[{i}/{len(image_paths)}] Processing: {image_path}")
-            result = self.predict(image_path)
-            if result:
-                results.append(result)
-            else:
-                logger.warning(f"[WARNING] Failed to process: {image_path}")
-        
-        logger.info(f"Batch complete: {len(results)}/{len(image_paths)} successful")
-        
-        return results
+        return asyncio.run(self.analyze_batch_async(image_paths, concurrency, on_progress, packed=packed))
+
+    async def analyze_batch_async(
+        self,
+        image_paths: List[ImageSource],
+        concurrency: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        deadline: Optional[Deadline] = None,
+        packed: Optional[bool] = None
+    ) -> BatchReport:
+        """
+        Analyze multiple images concurrently with predict_async (or packed
+        into shared calls with predict_packed_async)
+
+        Args:
+            image_paths: List of image file paths (or ImageInput)
+            concurrency: Maximum number of Gemini calls in flight
+                (default BATCH_CONCURRENCY)
+            on_progress: Called as (completed, total, item) after each image
+            deadline: Images not started before it runs out are skipped
+            packed: Send several images per Gemini call (default
+                GEMINI_PACKING_ENABLED); packs never exceed `concurrency`
+
+        Returns:
+            BatchReport with one entry per image, in input order, each with
+            status ok / failed / skipped, error and duration
+        """
+        concurrency = concurrency or settings.BATCH_CONCURRENCY
+        if packed is None:
+            packed = settings.GEMINI_PACKING_ENABLED
+
+        if packed:
+            worker = self.create_packer(deadline).submit
+        else:
+            def worker(image_path: ImageSource):
+                return self.predict_async(image_path, deadline=deadline)
+
+        def _describe(image_path: ImageSource) -> str:
+            if isinstance(image_path, ImageInput):
+                return image_path.filename or image_path.content_hash[:12]
+            return str(image_path)
+
+        def _skip(image_path: ImageSource) -> Optional[str]:
+            if not isinstance(image_path, ImageInput) and not os.path.exists(image_path):
+                return "File not found"
+            return None
+
+        logger.info(f"Batch analysis (concurrency={concurrency}, packed={packed}): {len(image_paths)} images")
+
+        report = await run_batch(
+            image_paths,
+            worker,
+            concurrency=concurrency,
+            describe=_describe,
+            skip=_skip,
+            on_progress=on_progress,
+            deadline=deadline
+        )
+
+        logger.info(
+            f"Batch complete: {report.count(STATUS_OK)}/{report.total} successful "
+            f"({report.count(STATUS_FAILED)} failed, {report.count(STATUS_SKIPPED)} skipped) "
+            f"in {report.duration_ms / 1000:.1f}s"
+        )
+
+        return report
 
 
 # Global model instance (singleton pattern)
@@ -0,0 +1,218 @@
+"""
+In-memory image input shared across pipeline stages
+===================================================
+The upload is read into memory once and decoded once. The validator,
+perceptual hashing and the Gemini model all take views from the same
+object instead of writing to UPLOAD_DIR and decoding the file again.
+
+Views are computed lazily and cached (see app.ml.preprocessing):
+- bgr:          full-resolution, upright BGR ndarray
+- level(n):     BGR pyramid level, longest side <= n; built from a reduced
+                JPEG decode just large enough for `min_side`
+- full_level(n): same level built from a full decode
+- rgb_pil(n):   RGB PIL image of level(n)
+- payload(enc): encoded Gemini blob {"mime_type", "data"}, so a retried
+                call sends the exact same bytes
+"""
+import hashlib
+import os
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.ml.preprocessing import (
+    PYRAMID_LEVELS,
+    ImageEncoding,
+    build_pyramid,
+    decode_bgr,
+    decode_bgr_reduced,
+    encode_image,
+    resize_max_side,
+    to_rgb_pil,
+)
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class ImageTooLargeError(ValueError):
+    """Image source is larger than the max_bytes allowed for it"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Image larger than {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class ImageInput:
+    """Image bytes + lazily decoded, cached pixel views"""
+
+    def __init__(self, data: bytes, filename: Optional[str] = None, min_side: Optional[int] = None):
+        """
+        Args:
+            min_side: Largest level the caller needs; the JPEG may be
+                decoded at reduced scale down to this size (default: the
+                largest pyramid level or the Gemini image size)
+        """
+        self.data = data
+        self.filename = filename
+        self.min_side = min_side or max(max(PYRAMID_LEVELS), settings.GEMINI_IMAGE_MAX_SIDE)
+        # Scale-down of the decode behind the pyramid (1 = full size)
+        self.decode_factor = 1
+        self._content_hash: Optional[str] = None
+        self._bgr: Optional[np.ndarray] = None
+        self._decoded = False
+        self._pyramid: Optional[Dict[int, np.ndarray]] = None
+        self._full_pyramid: Optional[Dict[int, np.ndarray]] = None
+        self._rgb: Dict[int, Image.Image] = {}
+        self._payloads: Dict[ImageEncoding, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_file(
+        cls,
+        source: BinaryIO,
+        filename: Optional[str] = None,
+        min_side: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ) -> "ImageInput":
+        """
+        Read an open (spooled) upload file and hash it in the same pass (blocking)
+
+        Raises:
+            ImageTooLargeError: more than max_bytes - reading stops at the
+                first chunk past the limit
+        """
+        digest = hashlib.sha256()
+        chunks = []
+        size = 0
+        while True:
+            chunk = source.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise ImageTooLargeError(max_bytes)
+            digest.update(chunk)
+            chunks.append(chunk)
+
+        image = cls(b"".join(chunks), filename=filename, min_side=min_side)
+        image._content_hash = digest.hexdigest()
+        return image
+
+    @classmethod
+    def from_path(cls, image_path: str, min_side: Optional[int] = None) -> "ImageInput":
+        """Read an image file from disk (blocking)"""
+        with open(image_path, "rb") as f:
+            return cls.from_file(f, filename=os.path.basename(image_path), min_side=min_side)
+
+    @classmethod
+    def from_array(cls, bgr: np.ndarray, filename: Optional[str] = None) -> "ImageInput":
+        """
+        Wrap an already decoded, upright BGR array (e.g. handed over from
+        another process). There are no encoded bytes: only pixel views work.
+        """
+        image = cls(b"", filename=filename)
+        image._bgr = bgr
+        image._decoded = True
+        return image
+
+    @property
+    def content_hash(self) -> str:
+        """sha256 hex digest of the raw bytes"""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self.data).hexdigest()
+        return self._content_hash
+
+    @property
+    def bgr(self) -> Optional[np.ndarray]:
+        """Full-resolution, upright BGR array (None if the bytes are not a decodable image)"""
+        if not self._decoded:
+            self._bgr = decode_bgr(self.data)
+            self._decoded = True
+        return self._bgr
+
+    def level(self, max_side: int) -> Optional[np.ndarray]:
+        """
+        BGR view whose longest side is at most `max_side`
+
+        The first call builds every pyramid level in one pass; sizes outside
+        PYRAMID_LEVELS are resampled from the closest larger level.
+        """
+        if self._pyramid is None:
+            # Keep the full-resolution array only if someone asked for it;
+            # otherwise it is freed as soon as the pyramid is built
+            if self._decoded:
+                image = self._bgr
+            elif settings.JPEG_REDUCED_DECODE:
+                image, self.decode_factor = decode_bgr_reduced(self.data, self.min_side)
+            else:
+                image = decode_bgr(self.data)
+            if image is None:
+                return None
+            self._pyramid = build_pyramid(image, PYRAMID_LEVELS)
+
+        return self._pyramid_level(self._pyramid, max_side)
+
+    def full_level(self, max_side: int) -> Optional[np.ndarray]:
+        """
+        Same view as level(max_side) but built from a full-size decode, for
+        the rare caller that must match results computed before reduced
+        decoding (the pyramid of a reduced decode differs in the last bits)
+        """
+        if self._pyramid is not None and self.decode_factor == 1:
+            return self.level(max_side)
+        if self._full_pyramid is None:
+            image = self._bgr if self._decoded else decode_bgr(self.data)
+            if image is None:
+                return None
+            self._full_pyramid = build_pyramid(image, PYRAMID_LEVELS)
+        return self._pyramid_level(self._full_pyramid, max_side)
+
+    def _pyramid_level(self, pyramid: Dict[int, np.ndarray], max_side: int) -> np.ndarray:
+        """Level of `pyramid`, resampled from the closest larger level if missing"""
+        if max_side not in pyramid:
+            larger = [side for side in pyramid if side >= max_side]
+            source = pyramid[min(larger)] if larger else self.bgr
+            pyramid[max_side] = resize_max_side(source, max_side)
+        return pyramid[max_side]
+
+    def rgb_pil(self, max_side: int) -> Optional[Image.Image]:
+        """RGB PIL view whose longest side is at most `max_side`"""
+        if max_side not in self._rgb:
+            image = self.level(max_side)
+            if image is None:
+                return None
+            self._rgb[max_side] = to_rgb_pil(image)
+        return self._rgb[max_side]
+
+    def payload(self, encoding: ImageEncoding) -> Optional[Dict[str, Any]]:
+        """Encoded image blob for the Gemini request (cached per encoding)"""
+        if encoding not in self._payloads:
+            image = self.rgb_pil(encoding.max_side)
+            if image is None:
+                return None
+            self._payloads[encoding] = {
+                "mime_type": encoding.mime_type,
+                "data": encode_image(image, encoding)
+            }
+        return self._payloads[encoding]
+
+    def save(self, file_path: str) -> None:
+        """
+        Write the original bytes to disk (blocking)
+
+        Written to a temporary file first and renamed into place, so a
+        failed write never leaves a truncated upload behind.
+        """
+        temp_path = f"{file_path}.part"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(self.data)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+ImageSource = Union[str, ImageInput]
@@ -0,0 +1,79 @@
+"""
+Incremental JSON parser for streamed model output
+=================================================
+Gemini streams the diagnosis JSON in arbitrary text chunks. The parser
+is fed those chunks and emits each top-level field of the root object as
+soon as its value is complete, e.g. ("disease_name", "Hawar Daun") long
+before "recommendations" and "analysis_notes" have arrived.
+
+Text before the first "{" (markdown fences, whitespace) is skipped.
+Fields whose text is not valid JSON are skipped; the full response is
+still parsed normally once the stream ends.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class IncrementalJSONParser:
+    """Emit top-level (key, value) pairs of a streamed JSON object"""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of streamed text
+
+        Returns:
+            Top-level fields completed by this chunk, in document order
+        """
+        self._text += chunk
+        fields: List[Tuple[str, Any]] = []
+        text = self._text
+
+        while self._pos < len(text) and not self.done:
+            ch = text[self._pos]
+
+            if self._member_start is None:
+                # Not inside the root object yet
+                if ch == "{":
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(text[self._member_start:self._pos], fields)
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                self._emit(text[self._member_start:self._pos], fields)
+                self._member_start = self._pos + 1
+
+            self._pos += 1
+
+        return fields
+
+    @staticmethod
+    def _emit(member: str, fields: List[Tuple[str, Any]]) -> None:
+        if not member.strip():
+            return
+        try:
+            fields.extend(json.loads("{" + member + "}").items())
+        except json.JSONDecodeError:
+            pass
@@ -16,13 +16,123 @@ Algorithm:
 2. Detect green pixels (hue 35-85)
 3. Calculate percentage of green area
 4. Valid if >= 25% green area + texture analysis
+
+Fast mode (LEAF_VALIDATOR_MODE=fast):
+1. Same features on the 256px thumbnail of the shared pyramid
+2. Green mask from a precomputed BGR lookup table (no HSV conversion,
+   bit-identical to cvtColor + inRange)
+3. Obvious accepts/rejects (almost all or no green) skip texture analysis
+4. Thumbnail values close to a decision threshold are re-checked at
+   VALIDATION_LEVEL, so decisions follow the exact mode
+
+Reduced JPEG decode (JPEG_REDUCED_DECODE): photos are decoded at the
+smallest DCT scale that still covers VALIDATION_LEVEL; the values differ
+from a full decode only slightly, so results close to a threshold are
+re-checked on a full decode and decisions do not change.
 """
 
 import cv2
 import numpy as np
 from PIL import Image
+import logging
+import multiprocessing
 import os
-from typing import Dict, Optional
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.ml.image_input import ImageInput, ImageSource
+from app.ml.preprocessing import THUMBNAIL_LEVEL, VALIDATION_LEVEL, resize_max_side
+
+logger = logging.getLogger(__name__)
+
+# Green in HSV - Hue: 35-85, Saturation: 40-255 (avoid gray/white), Value: 40-255 (avoid dark)
+GREEN_LOWER = np.array([35, 40, 40])
+GREEN_UPPER = np.array([85, 255, 255])
+
+# Decision thresholds (percent green area / texture score)
+GREEN_DOMINANT = 30
+GREEN_WITH_TEXTURE = 20
+TEXTURE_WITH_GREEN = 10
+TEXTURE_STRONG = 30
+
+VALIDATOR_MODES = ("exact", "fast")
+FAST_LEVEL = THUMBNAIL_LEVEL
+# How far thumbnail values may drift from the VALIDATION_LEVEL ones (measured
+# with bench_leaf_validator: green <= ~2 points; texture up to ~20, mostly
+# fine noise that the thumbnail smooths away); within this distance of a
+# threshold the photo is re-checked at VALIDATION_LEVEL
+FAST_GREEN_MARGIN = 3.0
+FAST_TEXTURE_MARGIN = 25.0
+# A few scattered green pixels: edge density over such a small mask is not
+# stable across sizes, always re-check
+FAST_SPARSE_GREEN_PERCENT = 2.0
+
+# How far values from a reduced JPEG decode may drift from the full decode
+# ones (bench_leaf_validator on real photos: green <= ~0.2 points, texture
+# <= ~4); within this distance of a threshold the full decode decides
+DECODE_GREEN_MARGIN = 0.5
+DECODE_TEXTURE_MARGIN = 5.0
+
+_green_lut: Optional[np.ndarray] = None
+_green_lut_lock = threading.Lock()
+
+
+def get_green_lut() -> np.ndarray:
+    """
+    Green mask value (0/255) of every 24-bit BGR colour, indexed by
+    B | G << 8 | R << 16 (16 MB, built once in ~50 ms)
+    """
+    global _green_lut
+    if _green_lut is None:
+        with _green_lut_lock:
+            if _green_lut is None:
+                lut = np.empty(1 << 24, dtype=np.uint8)
+                green, blue = np.mgrid[0:256, 0:256].astype(np.uint8)
+                plane = np.empty((256, 256, 3), dtype=np.uint8)
+                plane[..., 0] = blue
+                plane[..., 1] = green
+                # One red plane at a time keeps the build small
+                for red in range(256):
+                    plane[..., 2] = red
+                    hsv = cv2.cvtColor(plane, cv2.COLOR_BGR2HSV)
+                    lut[red << 16:(red + 1) << 16] = cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER).ravel()
+                _green_lut = lut
+    return _green_lut
+
+
+def green_mask_lut(image_cv: np.ndarray) -> np.ndarray:
+    """Same mask as cvtColor(HSV) + inRange(GREEN_LOWER, GREEN_UPPER), via the lookup table"""
+    # BGRA pixels read as little-endian uint32 = B | G << 8 | R << 16 | A << 24
+    codes = cv2.cvtColor(image_cv, cv2.COLOR_BGR2BGRA).view(np.uint32)[..., 0]
+    codes &= 0xFFFFFF
+    return get_green_lut().take(codes)
+
+
+def is_leaf(green_percentage: float, texture_score: float) -> bool:
+    """Decision rule of LeafImageValidator.decide (monotone in both values)"""
+    return (
+        green_percentage >= GREEN_DOMINANT
+        or (green_percentage >= GREEN_WITH_TEXTURE and texture_score >= TEXTURE_WITH_GREEN)
+        or texture_score >= TEXTURE_STRONG
+    )
+
+
+def is_borderline(
+    green_percentage: float,
+    texture_score: float,
+    green_margin: float,
+    texture_margin: float
+) -> bool:
+    """True if moving the values by up to their margins can change is_leaf"""
+    return (
+        is_leaf(green_percentage - green_margin, texture_score - texture_margin)
+        != is_leaf(green_percentage + green_margin, texture_score + texture_margin)
+    )
+
 
 class LeafImageValidator:
     """
@@ -30,29 +140,28 @@ class LeafImageValidator:
     HEMAT JATAH API - Tidak pakai Gemini!
     """
     
-    def __init__(self):
+    def __init__(self, mode: str = "exact"):
         """Initialize validator - No API needed!"""
-        pass
+        if mode not in VALIDATOR_MODES:
+            raise ValueError(f"LEAF_VALIDATOR_MODE must be one of {VALIDATOR_MODES}, got {mode!r}")
+        self.mode = mode
     
-    def detect_green_pixels(self, image_cv: np.ndarray) -> tuple:
+    def detect_green_pixels(self, image_cv: np.ndarray, use_lut: bool = False) -> Tuple[float, np.ndarray]:
         """
         Deteksi persentase pixel hijau dalam gambar
         
+        Args:
+            use_lut: Lookup table instead of HSV conversion (same mask)
+
         Returns:
             (green_percentage, green_mask)
         """
-        # Convert to HSV color space
-        hsv = cv2.cvtColor(image_cv, cv2.COLOR_BGR2HSV)
-        
-        # Define green color range in HSV
-        # Hue: 35-85 (green range)
-        # Saturation: 40-255 (avoid gray/white)
-        # Value: 40-255 (avoid dark)
-        lower_green = np.array([35, 40, 40])
-        upper_green = np.array([85, 255, 255])
-        
-        # Create mask for green pixels
-        green_mask = cv2.inRange(hsv, lower_green, upper_green)
+        if use_lut:
+            green_mask = green_mask_lut(image_cv)
+        else:
+            # Convert to HSV color space, mask for green pixels
+            hsv = cv2.cvtColor(image_cv, cv2.COLOR_BGR2HSV)
+            green_mask = cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER)
         
         # Calculate percentage
         total_pixels = image_cv.shape[0] * image_cv.shape[1]
@@ -77,13 +186,15 @@ class LeafImageValidator:
             masked_gray = cv2.bitwise_and(gray, gray, mask=green_mask)
             
             # Calculate edge density (leaf texture)
+            green_pixels = cv2.countNonZero(green_mask)
             edges = cv2.Canny(masked_gray, 50, 150)
-            edge_density = (cv2.countNonZero(edges) / cv2.countNonZero(green_mask)) * 100 if cv2.countNonZero(green_mask) > 0 else 0
+            edge_density = (cv2.countNonZero(edges) / green_pixels) * 100 if green_pixels > 0 else 0
             
-            # Calculate variance (texture complexity)
-            green_region = masked_gray[green_mask > 0]
-            if len(green_region) > 0:
-                variance = np.var(green_region)
+            # Calculate variance (texture complexity) - one masked pass,
+            # no copy of the green pixels
+            if green_pixels > 0:
+                _, std = cv2.meanStdDev(gray, mask=green_mask)
+                variance = float(std[0, 0]) ** 2
                 texture_complexity = min(variance / 10, 100)  # Normalize
             else:
                 texture_complexity = 0
@@ -97,18 +208,32 @@ class LeafImageValidator:
             print(f"Texture analysis error: {e}")
             return 50  # Default middle score
     
-    def validate(self, image_path: str) -> Dict:
+    def load_image(self, image: ImageSource) -> Optional[np.ndarray]:
+        """
+        Decode photo into a BGR array at the validator working size
+        (None if missing or unreadable)
+
+        The array is the VALIDATION_LEVEL view of the shared resize pyramid,
+        so an ImageInput is not decoded or resized again here.
+        """
+        if not isinstance(image, ImageInput):
+            if not os.path.exists(image):
+                return None
+            image = ImageInput.from_path(image, min_side=VALIDATION_LEVEL)
+        return image.level(VALIDATION_LEVEL)
+
+    def validate(self, image: ImageSource) -> Dict:
         """
         Validate leaf photo using OpenCV color detection.
         
         Args:
-            image_path: Path to the photo to validate
+            image: Path to the photo, or an in-memory ImageInput
             
         Returns:
             Dict with validation results
         """
         
-        if not os.path.exists(image_path):
+        if not isinstance(image, ImageInput) and not os.path.exists(image):
             return {
                 "is_valid": False,
                 "confidence": 0,
@@ -118,9 +243,95 @@ class LeafImageValidator:
             }
         
         try:
+            if not isinstance(image, ImageInput):
+                # Only this validator needs the pixels: decode just large enough
+                image = ImageInput.from_path(image, min_side=VALIDATION_LEVEL)
+            if self.mode == "fast":
+                return self.validate_fast(image)
+
             # Load image dengan OpenCV
-            image_cv = cv2.imread(image_path)
-            
+            image_cv = self.load_image(image)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return {
+                "is_valid": False,
+                "confidence": 0,
+                "reason": f"Error saat validasi: {str(e)}",
+                "detected_content": "Error",
+                "suggestion": "Pastikan file adalah foto yang valid (JPG/PNG)"
+            }
+
+        return self.confirm_full_decode(image, self.validate_image(image_cv))
+
+    def confirm_full_decode(self, image: ImageInput, result: Dict, use_lut: bool = False) -> Dict:
+        """
+        Re-validate on a full decode when `result` comes from a reduced JPEG
+        decode and lies close to a decision threshold
+
+        Returns:
+            `result`, or the result on the full-decode VALIDATION_LEVEL view
+        """
+        debug_info = result.get("debug_info")
+        if image.decode_factor == 1 or debug_info is None:
+            return result
+        green_percentage, texture_score = debug_info["green_percentage"], debug_info["texture_score"]
+        sparse = 0 < green_percentage < FAST_SPARSE_GREEN_PERCENT
+        if not sparse and not is_borderline(green_percentage, texture_score,
+                                            DECODE_GREEN_MARGIN, DECODE_TEXTURE_MARGIN):
+            return result
+
+        metrics.increment("leaf_validator.full_decode_rechecks")
+        return self.validate_image(image.full_level(VALIDATION_LEVEL), use_lut=use_lut)
+
+    def validate_fast(self, image: ImageInput) -> Dict:
+        """
+        Fast mode: decide on the thumbnail, re-check at VALIDATION_LEVEL
+        only when the thumbnail values are close to a threshold.
+
+        Args:
+            image: Upload with its shared resize pyramid
+
+        Returns:
+            Dict with validation results (same as validate_image)
+        """
+        thumbnail = image.level(FAST_LEVEL)
+        if thumbnail is None:
+            return self.validate_image(None)
+
+        green_percentage, green_mask = self.detect_green_pixels(thumbnail, use_lut=True)
+
+        # Obvious accept / reject: confidence is capped at 95 and a photo
+        # without green has no texture score, so texture cannot matter
+        if green_percentage >= 95 or green_percentage == 0:
+            metrics.increment("leaf_validator.fast_exits")
+            return self.decide(green_percentage, 0.0)
+
+        texture_score = self.analyze_texture(thumbnail, green_mask)
+
+        borderline = 0 < green_percentage < FAST_SPARSE_GREEN_PERCENT or is_borderline(
+            green_percentage, texture_score, FAST_GREEN_MARGIN, FAST_TEXTURE_MARGIN
+        )
+        if borderline:
+            metrics.increment("leaf_validator.fast_rechecks")
+            result = self.validate_image(image.level(VALIDATION_LEVEL), use_lut=True)
+            return self.confirm_full_decode(image, result, use_lut=True)
+
+        metrics.increment("leaf_validator.fast_decisions")
+        return self.decide(green_percentage, texture_score)
+
+    def validate_image(self, image_cv: Optional[np.ndarray], use_lut: bool = False) -> Dict:
+        """
+        Validate an already decoded BGR photo.
+
+        Args:
+            image_cv: Decoded image from load_image (None = unreadable)
+            use_lut: Green mask from the lookup table (same result, no HSV)
+
+        Returns:
+            Dict with validation results
+        """
+        try:
             if image_cv is None:
                 return {
                     "is_valid": False,
@@ -130,86 +341,17 @@ class LeafImageValidator:
                     "suggestion": "Upload file JPG/PNG yang valid"
                 }
             
-            # Resize jika terlalu besar (untuk performance)
-            max_size = 800
-            height, width = image_cv.shape[:2]
-            if max(height, width) > max_size:
-                scale = max_size / max(height, width)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                image_cv = cv2.resize(image_cv, (new_width, new_height))
+            # Resize jika terlalu besar (untuk performance) - no-op untuk
+            # array dari load_image, sudah di VALIDATION_LEVEL
+            image_cv = resize_max_side(image_cv, VALIDATION_LEVEL)
             
             # Deteksi pixel hijau
-            green_percentage, green_mask = self.detect_green_pixels(image_cv)
+            green_percentage, green_mask = self.detect_green_pixels(image_cv, use_lut=use_lut)
             
             # Analisis tekstur
             texture_score = self.analyze_texture(image_cv, green_mask)
             
-            # DECISION LOGIC (More lenient thresholds)
-            # Valid jika:
-            # 1. Area hijau >= 20% DAN texture score >= 10 (lowered from 25% & 15)
-            # 2. ATAU area hijau >= 30% (lowered from 40%)
-            # 3. ATAU texture score >= 30 (high texture = leaf pattern)
-            
-            is_valid = False
-            confidence = 0
-            reason = ""
-            detected_content = ""
-            suggestion = ""
-            
-            if green_percentage >= 30:
-                # Dominan hijau = kemungkinan besar daun
-                is_valid = True
-                confidence = min(int(green_percentage + texture_score * 0.3), 95)
-                reason = f"Foto menunjukkan area hijau dominan ({green_percentage:.1f}%)"
-                detected_content = "Daun/tanaman dengan area hijau besar"
-                suggestion = ""
-                
-            elif green_percentage >= 20 and texture_score >= 10:
-                # Cukup hijau + ada texture = kemungkinan daun
-                is_valid = True
-                confidence = min(int(green_percentage * 0.7 + texture_score * 0.8), 90)
-                reason = f"Foto menunjukkan area hijau ({green_percentage:.1f}%) dengan tekstur daun"
-                detected_content = "Daun/tanaman dengan tekstur natural"
-                suggestion = ""
-                
-            elif texture_score >= 30:
-                # Texture tinggi = pola daun terdeteksi
-                is_valid = True
-                confidence = min(int(texture_score + green_percentage * 0.5), 85)
-                reason = f"Tekstur daun terdeteksi (score: {texture_score:.1f})"
-                detected_content = "Daun dengan pola tekstur yang jelas"
-                suggestion = ""
-                
-            elif green_percentage >= 10:
-                # Sedikit hijau - mungkin background atau daun kering
-                is_valid = False
-                confidence = int(green_percentage * 2)
-                reason = f"Area hijau terlalu sedikit ({green_percentage:.1f}%)"
-                detected_content = "Foto dengan sedikit area hijau - mungkin bukan daun segar"
-                suggestion = "Upload foto close-up daun segar dengan warna hijau yang jelas"
-                
-            else:
-                # Hampir tidak ada hijau - pasti bukan daun
-                is_valid = False
-                confidence = 10
-                reason = f"Tidak ada area hijau yang signifikan ({green_percentage:.1f}%)"
-                detected_content = "Foto tanpa elemen hijau - kemungkinan orang/hewan/benda"
-                suggestion = "Upload foto daun tanaman yang segar dengan warna hijau"
-            
-            result = {
-                "is_valid": is_valid,
-                "confidence": confidence,
-                "reason": reason,
-                "detected_content": detected_content,
-                "suggestion": suggestion,
-                "debug_info": {
-                    "green_percentage": round(green_percentage, 2),
-                    "texture_score": round(texture_score, 2)
-                }
-            }
-            
-            return result
+            return self.decide(green_percentage, texture_score)
                 
         except Exception as e:
             import traceback
@@ -222,19 +364,255 @@ class LeafImageValidator:
                 "suggestion": "Pastikan file adalah foto yang valid (JPG/PNG)"
             }
 
+    def validate_many(
+        self,
+        images: Sequence[ImageSource],
+        processes: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Validate many photos in parallel (blocking)
+
+        Threads by default - decoding, resizing and the OpenCV kernels
+        release the GIL. With processes > 0 the photos are still decoded on
+        threads here, then their VALIDATION_LEVEL arrays are handed to
+        worker processes through one shared memory block instead of being
+        pickled.
+
+        Args:
+            images: Paths to the photos, or in-memory ImageInputs
+            processes: Worker processes (default LEAF_VALIDATION_PROCESSES, 0 = threads only)
+
+        Returns:
+            One result dict per photo, in input order
+        """
+        if processes is None:
+            processes = settings.LEAF_VALIDATION_PROCESSES
+        if not images:
+            return []
+
+        threads = get_validation_threads()
+        if processes <= 0:
+            return list(threads.map(self.validate, images))
+
+        inputs, prepared = zip(*threads.map(self._prepare, images))
+        arrays = [(index, item) for index, item in enumerate(prepared) if isinstance(item, np.ndarray)]
+        results: List[Optional[Dict]] = [item if isinstance(item, dict) else None for item in prepared]
+        if not arrays:
+            return results
+
+        block = shared_memory.SharedMemory(create=True, size=sum(array.nbytes for _, array in arrays))
+        try:
+            tasks, offset = [], 0
+            for index, array in arrays:
+                view = np.ndarray(array.shape, dtype=np.uint8, buffer=block.buf, offset=offset)
+                view[...] = array
+                del view
+                tasks.append((block.name, offset, array.shape, self.mode))
+                offset += array.nbytes
+
+            pool = get_validation_processes(processes)
+            chunksize = max(1, len(tasks) // (processes * 4))
+            for (index, _), result in zip(arrays, pool.map(_validate_shared, tasks, chunksize=chunksize)):
+                results[index] = result
+        finally:
+            block.close()
+            block.unlink()
+
+        # Workers only see the (possibly reduced-decode) array; re-check
+        # near-threshold results on a full decode here
+        for index, _ in arrays:
+            results[index] = self.confirm_full_decode(inputs[index], results[index], use_lut=self.mode == "fast")
+        return results
+
+    def _prepare(self, image: ImageSource) -> Tuple[Optional[ImageInput], Union[np.ndarray, Dict]]:
+        """
+        (ImageInput, VALIDATION_LEVEL array for a worker process), or the
+        final result in place of the array if there is none
+        """
+        if not isinstance(image, ImageInput) and not os.path.exists(image):
+            return None, self.validate(image)
+        try:
+            if not isinstance(image, ImageInput):
+                image = ImageInput.from_path(image, min_side=VALIDATION_LEVEL)
+            image_cv = self.load_image(image)
+        except Exception as e:
+            logger.warning(f"Gagal membaca gambar: {e}")
+            image_cv = None
+        return image, image_cv if image_cv is not None else self.validate_image(None)
+
+    def decide(self, green_percentage: float, texture_score: float) -> Dict:
+        """
+        Validation result from the green area and texture score
+
+        Returns:
+            Dict with validation results
+        """
+        # DECISION LOGIC (More lenient thresholds)
+        # Valid jika:
+        # 1. Area hijau >= 20% DAN texture score >= 10 (lowered from 25% & 15)
+        # 2. ATAU area hijau >= 30% (lowered from 40%)
+        # 3. ATAU texture score >= 30 (high texture = leaf pattern)
+        
+        is_valid = False
+        confidence = 0
+        reason = ""
+        detected_content = ""
+        suggestion = ""
+        
+        if green_percentage >= GREEN_DOMINANT:
+            # Dominan hijau = kemungkinan besar daun
+            is_valid = True
+            confidence = min(int(green_percentage + texture_score * 0.3), 95)
+            reason = f"Foto menunjukkan area hijau dominan ({green_percentage:.1f}%)"
+            detected_content = "Daun/tanaman dengan area hijau besar"
+            suggestion = ""
+            
+        elif green_percentage >= GREEN_WITH_TEXTURE and texture_score >= TEXTURE_WITH_GREEN:
+            # Cukup hijau + ada texture = kemungkinan daun
+            is_valid = True
+            confidence = min(int(green_percentage * 0.7 + texture_score * 0.8), 90)
+            reason = f"Foto menunjukkan area hijau ({green_percentage:.1f}%) dengan tekstur daun"
+            detected_content = "Daun/tanaman dengan tekstur natural"
+            suggestion = ""
+            
+        elif texture_score >= TEXTURE_STRONG:
+            # Texture tinggi = pola daun terdeteksi
+            is_valid = True
+            confidence = min(int(texture_score + green_percentage * 0.5), 85)
+            reason = f"Tekstur daun terdeteksi (score: {texture_score:.1f})"
+            detected_content = "Daun dengan pola tekstur yang jelas"
+            suggestion = ""
+            
+        elif green_percentage >= 10:
+            # Sedikit hijau - mungkin background atau daun kering
+            is_valid = False
+            confidence = int(green_percentage * 2)
+            reason = f"Area hijau terlalu sedikit ({green_percentage:.1f}%)"
+            detected_content = "Foto dengan sedikit area hijau - mungkin bukan daun segar"
+            suggestion = "Upload foto close-up daun segar dengan warna hijau yang jelas"
+            
+        else:
+            # Hampir tidak ada hijau - pasti bukan daun
+            is_valid = False
+            confidence = 10
+            reason = f"Tidak ada area hijau yang signifikan ({green_percentage:.1f}%)"
+            detected_content = "Foto tanpa elemen hijau - kemungkinan orang/hewan/benda"
+            suggestion = "Upload foto daun tanaman yang segar dengan warna hijau"
+        
+        result = {
+            "is_valid": is_valid,
+            "confidence": confidence,
+            "reason": reason,
+            "detected_content": detected_content,
+            "suggestion": suggestion,
+            "debug_info": {
+                "green_percentage": round(green_percentage, 2),
+                "texture_score": round(texture_score, 2)
+            }
+        }
+        
+        return result
+
+
+_leaf_validator: Optional[LeafImageValidator] = None
+_validator_lock = threading.Lock()
+
 
 def get_leaf_validator() -> LeafImageValidator:
     """
     Get leaf validator instance (OpenCV-based, no API key needed!)
     
+    The validator holds no per-photo state, so one instance is shared
+    across requests and threads.
+
     Returns:
         LeafImageValidator instance
     """
+    global _leaf_validator
+    if _leaf_validator is None:
+        with _validator_lock:
+            if _leaf_validator is None:
+                try:
+                    _leaf_validator = LeafImageValidator(mode=settings.LEAF_VALIDATOR_MODE)
+                except Exception as e:
+                    print(f"Validator initialization failed: {e}")
+                    raise
+    return _leaf_validator
+
+
+# Pools for validate_many (separate from the CPU executor, so validate_many
+# may itself run on a CPU executor thread without starving it)
+_validation_threads: Optional[ThreadPoolExecutor] = None
+_validation_processes: Optional[ProcessPoolExecutor] = None
+_validation_processes_size = 0
+_pool_lock = threading.Lock()
+
+
+def get_validation_threads() -> ThreadPoolExecutor:
+    global _validation_threads
+    if _validation_threads is None:
+        with _pool_lock:
+            if _validation_threads is None:
+                _validation_threads = ThreadPoolExecutor(
+                    max_workers=settings.LEAF_VALIDATION_WORKERS,
+                    thread_name_prefix="grovia-validate"
+                )
+    return _validation_threads
+
+
+def get_validation_processes(processes: int) -> ProcessPoolExecutor:
+    global _validation_processes, _validation_processes_size
+    with _pool_lock:
+        if _validation_processes is None or _validation_processes_size != processes:
+            if _validation_processes is not None:
+                _validation_processes.shutdown(wait=False, cancel_futures=True)
+            # spawn: forking a process that runs threads (uvicorn, executors) is unsafe
+            _validation_processes = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_validation_process
+            )
+            _validation_processes_size = processes
+            logger.info(f"Leaf validation processes started ({processes} workers)")
+    return _validation_processes
+
+
+def shutdown_validation_pools() -> None:
+    """Stop the validate_many pools (called from the application lifespan)"""
+    global _validation_threads, _validation_processes, _validation_processes_size
+    with _pool_lock:
+        if _validation_threads is not None:
+            _validation_threads.shutdown(wait=True, cancel_futures=True)
+        if _validation_processes is not None:
+            _validation_processes.shutdown(wait=True, cancel_futures=True)
+        _validation_threads = None
+        _validation_processes = None
+        _validation_processes_size = 0
+
+
+def _init_validation_process() -> None:
+    # One OpenCV thread per process - the pool already uses every core
+    cv2.setNumThreads(1)
+
+
+def _validate_shared(task: Tuple[str, int, Tuple[int, ...], str]) -> Dict:
+    """Worker process: validate one array inside the shared memory block"""
+    name, offset, shape, mode = task
+    # Spawned workers share the parent's resource tracker, so attaching
+    # here does not make the block "leak" - the parent unlinks it
+    block = shared_memory.SharedMemory(name=name)
+    image_cv = image = None
     try:
-        return LeafImageValidator()
-    except Exception as e:
-        print(f"Validator initialization failed: {e}")
-        raise
+        image_cv = np.ndarray(shape, dtype=np.uint8, buffer=block.buf, offset=offset)
+        validator = LeafImageValidator(mode=mode)
+        if mode == "fast":
+            image = ImageInput.from_array(image_cv)
+            return validator.validate_fast(image)
+        return validator.validate_image(image_cv)
+    finally:
+        # Views must be gone before the mapping is closed
+        image_cv = image = None
+        block.close()
 
 
 # Test function
@@ -0,0 +1,305 @@
+"""
+Local CPU Classifier (first stage of the detection cascade)
+===========================================================
+Classifies a leaf photo into the classes of labels.json in tens of
+milliseconds, without any API call. The engine is chosen from the
+extension of MODEL_PATH:
+
+- .onnx: CNN exported to ONNX, run by ONNX Runtime on the CPU
+         (optional dependency: pip install onnxruntime)
+- .npz:  softmax regression over colour/texture features, plain NumPy
+         (fit with: python -m app.scripts.evaluate_cascade --fit-numpy)
+
+Both work on the shared ImageInput pyramid, so the photo is not decoded
+again. Results use the same dict contract as the Gemini model; the
+per-class details (Indonesian name, recommendations) come from
+label_details.json next to labels.json.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.ml.image_input import ImageInput, ImageSource
+from app.ml.preprocessing import THUMBNAIL_LEVEL
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional - only needed for .onnx models
+    ort = None
+
+logger = logging.getLogger(__name__)
+
+LABEL_DETAILS_FILENAME = "label_details.json"
+
+# ImageNet normalisation used by the usual CNN exports
+ONNX_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+ONNX_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# Feature layout of the NumPy engine (HSV histogram + texture + colour stats)
+HSV_BINS = (12, 4, 4)
+GRADIENT_BINS = 8
+
+
+class LocalPrediction(NamedTuple):
+    """Top class of one local classification"""
+    class_index: int
+    label: str
+    confidence: float
+    probabilities: np.ndarray
+    duration_ms: float
+
+
+def load_labels(labels_path: str) -> List[str]:
+    """Class names ordered by class index ({"0": "Sehat", ...} in labels.json)"""
+    with open(labels_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return [raw[key] for key in sorted(raw, key=int)]
+
+
+def load_label_details(labels_path: str) -> Dict[str, Dict]:
+    """Per-class details from label_details.json next to labels.json ({} if missing)"""
+    details_path = os.path.join(os.path.dirname(labels_path), LABEL_DETAILS_FILENAME)
+    if not os.path.exists(details_path):
+        return {}
+    with open(details_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def disease_id_of(label: str, details: Dict[str, Dict]) -> str:
+    return details.get(label, {}).get("disease_id", label.lower().replace(" ", "_"))
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def extract_features(image_bgr: np.ndarray) -> np.ndarray:
+    """Colour/texture feature vector of a (thumbnail) BGR image for the NumPy engine"""
+    hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1, 2], None, list(HSV_BINS), [0, 180, 0, 256, 0, 256]).ravel()
+    hist /= max(hist.sum(), 1.0)
+
+    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    magnitude = np.log1p(np.sqrt(gx * gx + gy * gy))
+    gradient_hist, _ = np.histogram(magnitude, bins=GRADIENT_BINS, range=(0.0, 7.0))
+    gradient_hist = gradient_hist.astype(np.float32) / max(magnitude.size, 1)
+
+    laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+    hsv_float = hsv.reshape(-1, 3).astype(np.float32) / 255.0
+    stats = np.concatenate([
+        hsv_float.mean(axis=0),
+        hsv_float.std(axis=0),
+        [np.log1p(np.abs(laplacian).mean()), np.log1p(laplacian.var()) / 10.0]
+    ])
+
+    return np.concatenate([hist, gradient_hist, stats]).astype(np.float32)
+
+
+def fit_softmax_regression(
+    features: np.ndarray,
+    labels: np.ndarray,
+    num_classes: int,
+    epochs: int = 500,
+    learning_rate: float = 0.5,
+    l2: float = 1e-3
+) -> Dict[str, np.ndarray]:
+    """
+    Fit the NumPy engine (full-batch gradient descent)
+
+    Returns:
+        Arrays to save with np.savez: weights, bias, mean, std
+    """
+    mean = features.mean(axis=0)
+    std = features.std(axis=0) + 1e-6
+    x = (features - mean) / std
+    onehot = np.eye(num_classes, dtype=np.float32)[labels]
+
+    weights = np.zeros((x.shape[1], num_classes), dtype=np.float32)
+    bias = np.zeros(num_classes, dtype=np.float32)
+    for _ in range(epochs):
+        probs = softmax(x @ weights + bias)
+        grad = (probs - onehot) / len(x)
+        weights -= learning_rate * (x.T @ grad + l2 * weights)
+        bias -= learning_rate * grad.sum(axis=0)
+
+    return {"weights": weights, "bias": bias, "mean": mean, "std": std}
+
+
+class NumpyEngine:
+    """Softmax regression over extract_features (weights from an .npz file)"""
+
+    name = "numpy"
+
+    def __init__(self, model_path: str):
+        data = np.load(model_path)
+        self.weights = data["weights"]
+        self.bias = data["bias"]
+        self.mean = data["mean"]
+        self.std = data["std"]
+
+    def predict_proba(self, image: ImageInput) -> Optional[np.ndarray]:
+        thumbnail = image.level(THUMBNAIL_LEVEL)
+        if thumbnail is None:
+            return None
+        x = (extract_features(thumbnail) - self.mean) / self.std
+        return softmax(x @ self.weights + self.bias)
+
+
+class OnnxEngine:
+    """CNN exported to ONNX, run on the CPU execution provider"""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, input_size: Tuple[int, int], threads: int):
+        if ort is None:
+            raise RuntimeError("onnxruntime is not installed (pip install onnxruntime)")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        shape = self.session.get_inputs()[0].shape
+        # NCHW (PyTorch exports) or NHWC (Keras/TF exports)
+        self.channels_first = len(shape) == 4 and shape[1] == 3
+        self.input_size = input_size
+
+    def predict_proba(self, image: ImageInput) -> Optional[np.ndarray]:
+        source = image.level(max(THUMBNAIL_LEVEL, *self.input_size))
+        if source is None:
+            return None
+        resized = cv2.resize(source, tuple(self.input_size), interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+        tensor = (rgb - ONNX_MEAN) / ONNX_STD
+        if self.channels_first:
+            tensor = tensor.transpose(2, 0, 1)
+
+        output = self.session.run(None, {self.input_name: tensor[np.newaxis].astype(np.float32)})[0][0]
+        # Exports differ: some end with softmax, some return logits
+        if output.min() < 0 or not np.isclose(output.sum(), 1.0, atol=1e-3):
+            output = softmax(output)
+        return output
+
+
+class LocalClassifier:
+    """Local engine + labels + per-class details"""
+
+    def __init__(self, model_path: str, labels_path: str):
+        self.labels = load_labels(labels_path)
+        self.details = load_label_details(labels_path)
+
+        extension = os.path.splitext(model_path)[1].lower()
+        if extension == ".onnx":
+            self.engine = OnnxEngine(model_path, settings.IMAGE_SIZE, settings.LOCAL_CLASSIFIER_THREADS)
+        elif extension == ".npz":
+            self.engine = NumpyEngine(model_path)
+        else:
+            raise ValueError(f"Unsupported local model format: {model_path} (use .onnx or .npz)")
+
+        with open(model_path, "rb") as f:
+            self.fingerprint = hashlib.sha256(f.read()).hexdigest()[:12]
+        self.model_version = f"local-{self.engine.name}:{self.fingerprint}"
+        logger.info(f"Local classifier loaded: {model_path} ({self.engine.name}, {len(self.labels)} classes)")
+
+    def classify(self, image_path: ImageSource) -> Optional[LocalPrediction]:
+        """
+        Top class of one image (blocking - run on the CPU executor)
+
+        Returns:
+            LocalPrediction or None if the image cannot be decoded
+        """
+        image = image_path if isinstance(image_path, ImageInput) else ImageInput.from_path(image_path)
+        started = time.perf_counter()
+        probabilities = self.engine.predict_proba(image)
+        if probabilities is None:
+            return None
+
+        class_index = int(np.argmax(probabilities))
+        return LocalPrediction(
+            class_index=class_index,
+            label=self.labels[class_index],
+            confidence=float(probabilities[class_index]),
+            probabilities=probabilities,
+            duration_ms=round((time.perf_counter() - started) * 1000, 2)
+        )
+
+    def class_details(self, label: str) -> Dict:
+        """disease_id / name / recommendations of a class (defaults when not described)"""
+        details = self.details.get(label, {})
+        return {
+            "disease_id": disease_id_of(label, self.details),
+            "disease_name": details.get("disease_name", label),
+            "scientific_name": details.get("scientific_name", "N/A"),
+            "category": details.get("category", "INFECTIOUS_DISEASE"),
+            "severity": details.get("severity", "Unknown"),
+            "symptoms": list(details.get("symptoms", [])),
+            "recommendations": list(details.get("recommendations", [])),
+            "prevention": list(details.get("prevention", []))
+        }
+
+    def to_result(self, prediction: LocalPrediction, top_k: int = 3) -> Dict:
+        """Detection result dict (same contract as the Gemini model)"""
+        result = self.class_details(prediction.label)
+        result["confidence"] = round(prediction.confidence, 4)
+        result["all_predictions"] = [
+            {"disease_name": self.class_details(self.labels[i])["disease_name"],
+             "confidence": round(float(prediction.probabilities[i]), 4)}
+            for i in np.argsort(prediction.probabilities)[::-1][:top_k]
+        ]
+        result["analysis_notes"] = (
+            f"Klasifikasi model lokal ({self.engine.name}): {prediction.label} "
+            f"({prediction.confidence:.1%}) dalam {prediction.duration_ms:.0f} ms"
+        )
+        return result
+
+
+# Global instance (singleton pattern)
+_local_classifier: Optional[LocalClassifier] = None
+_lock = threading.Lock()
+
+
+def get_local_classifier() -> LocalClassifier:
+    """Get or load the local classifier (MODEL_PATH / LABELS_PATH)"""
+    global _local_classifier
+    if _local_classifier is None:
+        with _lock:
+            if _local_classifier is None:
+                _local_classifier = LocalClassifier(settings.MODEL_PATH, settings.LABELS_PATH)
+    return _local_classifier
+
+
+def evaluate_thresholds(
+    confidences: np.ndarray,
+    local_correct: np.ndarray,
+    remote_correct: Optional[np.ndarray],
+    thresholds: List[float]
+) -> List[Tuple[float, float, float, Optional[float]]]:
+    """
+    Cascade trade-off per threshold
+
+    Returns:
+        (threshold, share answered locally = Gemini calls saved, local
+        precision on those, cascade accuracy or None without remote labels)
+    """
+    rows = []
+    for threshold in thresholds:
+        local = confidences >= threshold
+        share = float(local.mean()) if len(local) else 0.0
+        precision = float(local_correct[local].mean()) if local.any() else 1.0
+        accuracy = None
+        if remote_correct is not None:
+            accuracy = float(np.where(local, local_correct, remote_correct).mean())
+        rows.append((threshold, share, precision, accuracy))
+    return rows
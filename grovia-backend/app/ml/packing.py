@@ -0,0 +1,132 @@
+"""
+Request packing: several images in one model call
+=================================================
+- MicroBatcher: callers submit one item and await its own result; pending
+  items are flushed together once the current pack size is reached or
+  after a short linger, whichever comes first
+- PackSizeController: adapts the pack size to measured call latency
+  (additive increase while calls stay well under the target latency,
+  halve when a call is slow or its response is malformed)
+
+A MicroBatcher is bound to the event loop it is used on - create one per
+batch / worker loop. The controller is plain shared state (thread-safe).
+"""
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Below this fraction of the target latency a call may grow the pack
+GROW_BELOW_FRACTION = 0.6
+
+
+class PackSizeController:
+    """Pack size from observed call latency (AIMD)"""
+
+    def __init__(self, max_size: int, target_latency: float, initial_size: int = 2, min_size: int = 1):
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.target_latency = target_latency
+        self._size = max(self.min_size, min(initial_size, self.max_size))
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def observe(self, pack_size: int, seconds: float, ok: bool = True) -> None:
+        """
+        Record one packed call
+
+        Args:
+            pack_size: Images in the call
+            seconds: Call latency
+            ok: False if the packed response was malformed
+        """
+        with self._lock:
+            if not ok or seconds > self.target_latency:
+                self._size = max(self.min_size, self._size // 2)
+            elif pack_size >= self._size and seconds < self.target_latency * GROW_BELOW_FRACTION:
+                # Only a full pack says something about a bigger one
+                self._size = min(self.max_size, self._size + 1)
+            size = self._size
+        metrics.set_gauge("gemini.pack_size", size)
+
+
+class MicroBatcher(Generic[T, R]):
+    """Group concurrent submissions into calls of `flush`"""
+
+    def __init__(
+        self,
+        flush: Callable[[List[T]], Awaitable[Sequence[R]]],
+        max_size: Callable[[], int],
+        linger: float = 0.05
+    ):
+        """
+        Args:
+            flush: Processes a group, returns one result per item (same order)
+            max_size: Current pack size (read at every submission)
+            linger: Seconds to wait for more items before flushing a partial group
+        """
+        self._flush = flush
+        self._max_size = max_size
+        self._linger = linger
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    async def submit(self, item: T) -> R:
+        """Queue `item` and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= max(1, self._max_size()):
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._linger, self._dispatch)
+
+        return await future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        group, self._pending = self._pending, []
+        # Submitters that gave up (cancelled) are not sent
+        group = [(item, future) for item, future in group if not future.done()]
+        if not group:
+            return
+
+        task = asyncio.ensure_future(self._run(group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: List[Tuple[T, asyncio.Future]]) -> None:
+        try:
+            results = list(await self._flush([item for item, _ in group]))
+        except asyncio.CancelledError:
+            for _, future in group:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if len(results) != len(group):
+            logger.error(f"Packed flush returned {len(results)} results for {len(group)} items")
+            results += [None] * (len(group) - len(results))
+
+        for (_, future), result in zip(group, results):
+            if not future.done():
+                future.set_result(result)
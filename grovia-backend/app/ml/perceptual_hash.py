@@ -0,0 +1,281 @@
+"""
+Perceptual hashing + near-duplicate index
+=========================================
+Finds earlier detections of (almost) the same photo: the same leaf
+re-shot, re-compressed by a messaging app or slightly cropped.
+
+- dHash (difference hash): 64-bit, computed from an already decoded
+  BGR image (the THUMBNAIL_LEVEL view of the shared pyramid), so no
+  extra decode
+- MultiIndexHashTable: Hamming-distance lookup by splitting the hash
+  into m chunks. Two hashes within distance r must agree on at least one
+  chunk up to floor(r / m) bits (pigeonhole), so only a few buckets are
+  probed instead of scanning every entry. Entries expire with the cached
+  result they point to and are removed when that result leaves the cache
+  (DetectionResultCache on_discard), so the index does not outgrow it.
+"""
+import logging
+import threading
+import time
+from datetime import timezone
+from itertools import combinations
+from typing import Dict, List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+# Smallest index size at which expired entries are pruned
+MIN_PRUNE_SIZE = 1024
+
+
+def dhash(image_bgr: np.ndarray, hash_size: int = 8) -> int:
+    """
+    Compute the 64-bit difference hash of a BGR image
+
+    Args:
+        image_bgr: Decoded image (any size)
+        hash_size: Hash grid size (8 -> 64 bits)
+
+    Returns:
+        Hash as an unsigned int
+    """
+    if image_bgr.ndim == 3:
+        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = image_bgr
+
+    # INTER_AREA averages every source pixel, which makes the hash robust
+    # to re-compression and small scale changes
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = small[:, 1:] > small[:, :-1]
+
+    return int.from_bytes(np.packbits(diff.flatten()).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return (a ^ b).bit_count()
+
+
+def hash_to_hex(value: int) -> str:
+    """Fixed-width hex representation (for storage)"""
+    return f"{value:016x}"
+
+
+def hex_to_hash(value: str) -> int:
+    return int(value, 16)
+
+
+class HashMatch(NamedTuple):
+    """Result of a near-duplicate lookup"""
+    key: str
+    hash: int
+    distance: int
+    confidence: float
+
+
+class MultiIndexHashTable:
+    """Multi-index hash table for Hamming-distance search over 64-bit hashes"""
+
+    def __init__(self, chunks: int = 3):
+        if not 1 <= chunks <= HASH_BITS:
+            raise ValueError("chunks must be between 1 and 64")
+
+        # Chunk widths differ by at most one bit (64 = 21 + 21 + 22 for m=3)
+        self.chunks = chunks
+        base, extra = divmod(HASH_BITS, chunks)
+        self._widths = [base + (1 if i >= chunks - extra else 0) for i in range(chunks)]
+        self._offsets = [sum(self._widths[:i]) for i in range(chunks)]
+        self._flip_masks: Dict[tuple, List[int]] = {}
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(chunks)]
+        self._hashes: List[int] = []
+        self._keys: List[str] = []
+        self._confidences: List[float] = []
+        self._expires_at: List[Optional[float]] = []
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Expired entries are pruned once the index doubles since the last prune
+        self._prune_at = MIN_PRUNE_SIZE
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _split(self, value: int) -> List[int]:
+        return [
+            (value >> offset) & ((1 << width) - 1)
+            for offset, width in zip(self._offsets, self._widths)
+        ]
+
+    def _masks(self, width: int, radius: int) -> List[int]:
+        """XOR masks flipping up to `radius` of `width` bits (cached)"""
+        key = (width, radius)
+        masks = self._flip_masks.get(key)
+        if masks is None:
+            masks = [0]
+            for r in range(1, radius + 1):
+                for bits in combinations(range(width), r):
+                    masks.append(sum(1 << bit for bit in bits))
+            self._flip_masks[key] = masks
+        return masks
+
+    def add(self, key: str, value: int, confidence: float = 1.0, expires_at: Optional[float] = None) -> None:
+        """
+        Index a hash under `key` (keys already indexed are ignored)
+
+        Args:
+            expires_at: time.time() after which the entry is ignored and
+                pruned (None: never expires)
+        """
+        with self._lock:
+            if key in self._positions:
+                return
+
+            position = len(self._hashes)
+            self._hashes.append(value)
+            self._keys.append(key)
+            self._confidences.append(confidence)
+            self._expires_at.append(expires_at)
+            self._positions[key] = position
+
+            for table, chunk in zip(self._tables, self._split(value)):
+                table.setdefault(chunk, []).append(position)
+
+            if len(self._hashes) >= self._prune_at:
+                self._remove_expired(time.time())
+                self._prune_at = max(MIN_PRUNE_SIZE, 2 * len(self._hashes))
+
+    def remove(self, key: str) -> bool:
+        """Drop the entry of `key` (False if it was not indexed)"""
+        with self._lock:
+            return self._remove(key)
+
+    def remove_expired(self) -> int:
+        """Drop every expired entry, returns how many"""
+        with self._lock:
+            return self._remove_expired(time.time())
+
+    def _remove_expired(self, now: float) -> int:
+        expired = [
+            key for key, expires_at in zip(self._keys, self._expires_at)
+            if expires_at is not None and expires_at <= now
+        ]
+        for key in expired:
+            self._remove(key)
+        return len(expired)
+
+    def _remove(self, key: str) -> bool:
+        # The last entry moves into the freed position, so the lists stay dense
+        position = self._positions.pop(key, None)
+        if position is None:
+            return False
+
+        for table, chunk in zip(self._tables, self._split(self._hashes[position])):
+            bucket = table[chunk]
+            bucket.remove(position)
+            if not bucket:
+                del table[chunk]
+
+        last = len(self._hashes) - 1
+        if position != last:
+            for table, chunk in zip(self._tables, self._split(self._hashes[last])):
+                bucket = table[chunk]
+                bucket[bucket.index(last)] = position
+            self._hashes[position] = self._hashes[last]
+            self._keys[position] = self._keys[last]
+            self._confidences[position] = self._confidences[last]
+            self._expires_at[position] = self._expires_at[last]
+            self._positions[self._keys[position]] = position
+
+        self._hashes.pop()
+        self._keys.pop()
+        self._confidences.pop()
+        self._expires_at.pop()
+        return True
+
+    def search(self, value: int, max_distance: int) -> List[HashMatch]:
+        """
+        Find every indexed, unexpired hash within `max_distance` bits
+
+        Returns:
+            Matches sorted by distance, then by confidence (highest first)
+        """
+        radius = max_distance // self.chunks
+        matches: List[HashMatch] = []
+        seen = set()
+        now = time.time()
+
+        with self._lock:
+            for table, chunk, width in zip(self._tables, self._split(value), self._widths):
+                for mask in self._masks(width, radius):
+                    for position in table.get(chunk ^ mask, ()):
+                        if position in seen:
+                            continue
+                        seen.add(position)
+
+                        expires_at = self._expires_at[position]
+                        if expires_at is not None and expires_at <= now:
+                            continue
+                        distance = hamming_distance(value, self._hashes[position])
+                        if distance <= max_distance:
+                            matches.append(HashMatch(
+                                key=self._keys[position],
+                                hash=self._hashes[position],
+                                distance=distance,
+                                confidence=self._confidences[position]
+                            ))
+
+        matches.sort(key=lambda m: (m.distance, -m.confidence))
+        return matches
+
+    def nearest(self, value: int, max_distance: int, min_confidence: float = 0.0) -> Optional[HashMatch]:
+        """Closest match within `max_distance` whose confidence is at least `min_confidence`"""
+        for match in self.search(value, max_distance):
+            if match.confidence >= min_confidence:
+                return match
+        return None
+
+
+# Global index (one per worker process)
+_phash_index: Optional[MultiIndexHashTable] = None
+
+
+def get_phash_index() -> MultiIndexHashTable:
+    """Get or create the near-duplicate index"""
+    global _phash_index
+    if _phash_index is None:
+        _phash_index = MultiIndexHashTable(chunks=settings.PHASH_INDEX_CHUNKS)
+    return _phash_index
+
+
+def load_phash_index(model_version: str) -> int:
+    """
+    Warm the index from the detection_cache table (blocking, call at startup)
+
+    Returns:
+        Number of hashes loaded
+    """
+    from app.database import SessionLocal
+    from app.crud import detection_cache as cache_crud
+
+    index = get_phash_index()
+    db = SessionLocal()
+    try:
+        loaded = 0
+        for cache_key, phash, confidence, expires_at in cache_crud.iter_phash_entries(
+            db,
+            model_version=model_version,
+            min_confidence=settings.PHASH_MIN_CONFIDENCE
+        ):
+            # Stored as naive UTC
+            expires_at = expires_at.replace(tzinfo=timezone.utc).timestamp()
+            index.add(cache_key, hex_to_hash(phash), confidence, expires_at=expires_at)
+            loaded += 1
+        logger.info(f"Perceptual hash index loaded: {loaded} entries")
+        return loaded
+    finally:
+        db.close()
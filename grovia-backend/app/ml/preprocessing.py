@@ -0,0 +1,187 @@
+"""
+Shared image preprocessing
+==========================
+One decode, one pass, every consumer picks the size it needs:
+
+1. Decode with OpenCV (applies the EXIF orientation tag, so phone photos
+   are upright for every consumer - PIL.Image.open does not do this).
+   JPEGs are decoded at 1/2, 1/4 or 1/8 scale straight from the DCT
+   coefficients when the largest level needed still fits, with the
+   scale picked from the header dimensions
+2. Build a small resize pyramid from largest to smallest level, each
+   level resampled from the previous one with INTER_AREA (anti-aliased,
+   and cheap because every step works on the already reduced image)
+3. Convert color only at the level a consumer asks for
+4. Encode the Gemini payload explicitly (format, quality, chroma
+   subsampling) instead of letting the SDK pick an encoding
+
+Levels in use:
+- 1024: image sent to Gemini
+- 800:  LeafImageValidator working size
+- 256:  perceptual hash / thumbnails
+"""
+import io
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+GEMINI_LEVEL = 1024
+VALIDATION_LEVEL = 800
+THUMBNAIL_LEVEL = 256
+
+PYRAMID_LEVELS: Tuple[int, ...] = (GEMINI_LEVEL, VALIDATION_LEVEL, THUMBNAIL_LEVEL)
+
+IMAGE_MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+JPEG_SUBSAMPLING = ("4:4:4", "4:2:2", "4:2:0")
+
+
+class ImageEncoding(NamedTuple):
+    """How the image sent to Gemini is encoded"""
+    max_side: int = GEMINI_LEVEL
+    format: str = "jpeg"
+    quality: int = 85
+    # JPEG only - WebP lossy is always 4:2:0
+    subsampling: str = "4:2:0"
+
+    def validate(self) -> "ImageEncoding":
+        if self.format not in IMAGE_MIME_TYPES:
+            raise ValueError(f"Unsupported image format: {self.format} (use {', '.join(IMAGE_MIME_TYPES)})")
+        if self.subsampling not in JPEG_SUBSAMPLING:
+            raise ValueError(f"Unsupported chroma subsampling: {self.subsampling}")
+        if not 1 <= self.quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        if self.max_side < 64:
+            raise ValueError("max_side must be at least 64")
+        return self
+
+    @property
+    def mime_type(self) -> str:
+        return IMAGE_MIME_TYPES[self.format]
+
+
+# libjpeg DCT scaling: decode straight to 1/n size (largest reduction first)
+REDUCED_DECODE_FLAGS: Tuple[Tuple[int, int], ...] = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def decode_bgr(data: bytes) -> Optional[np.ndarray]:
+    """Decode image bytes to an upright BGR array (None if not decodable)"""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if not buffer.size:
+        return None
+    # IMREAD_COLOR applies EXIF orientation and drops alpha
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def image_header(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """(format, width, height) from the image header, without decoding pixels"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.format, image.width, image.height
+    except Exception:
+        return None
+
+
+def reduced_decode_factor(data: bytes, min_side: int) -> int:
+    """
+    Largest JPEG DCT scale-down (8, 4 or 2) whose longest side is still at
+    least `min_side`; 1 = decode at full size (not a JPEG, or too small)
+    """
+    header = image_header(data)
+    if header is None or header[0] != "JPEG":
+        return 1
+    longest = max(header[1], header[2])
+    for factor, _ in REDUCED_DECODE_FLAGS:
+        if longest // factor >= min_side:
+            return factor
+    return 1
+
+
+def decode_bgr_reduced(data: bytes, min_side: int) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Decode to an upright BGR array whose longest side is at least
+    `min_side` (or the full image, if smaller), as cheaply as possible
+
+    Returns:
+        (array or None if not decodable, scale-down factor used)
+    """
+    factor = reduced_decode_factor(data, min_side)
+    if factor == 1:
+        return decode_bgr(data), 1
+    flags = dict(REDUCED_DECODE_FLAGS)[factor]
+    # Reduced flags include IMREAD_COLOR: EXIF orientation still applies
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image is None:
+        return decode_bgr(data), 1
+    return image, factor
+
+
+def fit_size(width: int, height: int, max_side: int) -> Tuple[int, int]:
+    """Target (width, height) so the longest side is at most max_side"""
+    if max(width, height) <= max_side:
+        return width, height
+    scale = max_side / max(width, height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def resize_max_side(image: np.ndarray, max_side: int) -> np.ndarray:
+    """Downsize so the longest side is at most max_side (never upsizes)"""
+    height, width = image.shape[:2]
+    size = fit_size(width, height, max_side)
+    if size == (width, height):
+        return image
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def build_pyramid(image: np.ndarray, levels: Iterable[int] = PYRAMID_LEVELS) -> Dict[int, np.ndarray]:
+    """
+    Build every pyramid level in one pass, largest first
+
+    Args:
+        image: Full-resolution BGR image
+        levels: Max side of each level
+
+    Returns:
+        Dict max_side -> BGR array (levels larger than the image share it)
+    """
+    pyramid: Dict[int, np.ndarray] = {}
+    current = image
+    for max_side in sorted(set(levels), reverse=True):
+        current = resize_max_side(current, max_side)
+        pyramid[max_side] = current
+    return pyramid
+
+
+def to_rgb_pil(image: np.ndarray) -> Image.Image:
+    """BGR array -> RGB PIL image"""
+    return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+def encode_image(image: Image.Image, encoding: ImageEncoding) -> bytes:
+    """
+    Encode an RGB PIL image for the Gemini request
+
+    Args:
+        image: RGB image, already at the target size
+        encoding: Format/quality/subsampling to use
+
+    Returns:
+        Encoded bytes
+    """
+    buffer = io.BytesIO()
+    if encoding.format == "webp":
+        image.save(buffer, format="WEBP", quality=encoding.quality, method=4)
+    else:
+        image.save(
+            buffer,
+            format="JPEG",
+            quality=encoding.quality,
+            subsampling=encoding.subsampling,
+            optimize=True
+        )
+    return buffer.getvalue()
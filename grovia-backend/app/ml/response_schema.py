@@ -0,0 +1,136 @@
+"""
+Gemini response schema and strict parser
+========================================
+DETECTION_SCHEMA is sent as `response_schema` together with
+response_mime_type "application/json" (GEMINI_JSON_MODE), so Gemini
+answers with bare JSON holding the fields _validate_and_enhance_result
+expects - no markdown fences, no prose around it.
+
+The same schema checks the parsed response: one JSON parse (orjson) and
+one walk over the parsed value. Only the keys of the Gemini Schema proto
+are used (type, format, enum, items, min_items, max_items, properties,
+required, nullable), so the dicts can be handed to the SDK as they are.
+"""
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+DETECTION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "disease_id": {"type": "string"},
+        "disease_name": {"type": "string"},
+        "scientific_name": {"type": "string"},
+        "confidence": {"type": "number"},
+        "category": {"type": "string"},
+        "severity": {"type": "string", "format": "enum", "enum": ["None", "Low", "Medium", "High"]},
+        "symptoms": STRING_LIST,
+        "differential_diagnosis": STRING_LIST,
+        "key_indicators": STRING_LIST,
+        "recommendations": STRING_LIST,
+        "prevention": STRING_LIST,
+        "analysis_notes": {"type": "string"},
+    },
+    "required": [
+        "disease_id", "disease_name", "scientific_name", "confidence", "category",
+        "severity", "symptoms", "recommendations", "prevention", "analysis_notes",
+    ],
+}
+
+# predict_packed_async: one item per photo, identified by image_index
+PACKED_ITEM_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": dict(DETECTION_SCHEMA["properties"], image_index={"type": "integer"}),
+    "required": ["image_index"] + DETECTION_SCHEMA["required"],
+}
+PACKED_DETECTION_SCHEMA: Dict[str, Any] = {"type": "array", "items": PACKED_ITEM_SCHEMA}
+
+
+class ResponseParseError(ValueError):
+    """Response text is not JSON, or does not match the schema"""
+
+    def __init__(self, message: str, data: Any = None):
+        super().__init__(message)
+        # Parsed value when the text was JSON but off-schema (None otherwise)
+        self.data = data
+
+
+def loads(text: str) -> Any:
+    """Parse JSON text with orjson"""
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError as e:
+        raise ResponseParseError(f"Invalid JSON: {e}") from e
+
+
+def _type_error(path: str, expected: str, value: Any) -> str:
+    return f"{path}: expected {expected}, got {type(value).__name__}"
+
+
+def schema_errors(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """All places where `value` does not match `schema` (empty list = valid)"""
+    if value is None:
+        return [] if schema.get("nullable") else [f"{path}: missing value"]
+
+    kind = schema.get("type")
+    if kind == "object":
+        if not isinstance(value, dict):
+            return [_type_error(path, "object", value)]
+        errors = [f"{path}.{name}: required" for name in schema.get("required", ()) if name not in value]
+        for name, child in schema.get("properties", {}).items():
+            if name in value:
+                errors += schema_errors(value[name], child, f"{path}.{name}")
+        return errors
+
+    if kind == "array":
+        if not isinstance(value, list):
+            return [_type_error(path, "array", value)]
+        errors = []
+        if "min_items" in schema and len(value) < schema["min_items"]:
+            errors.append(f"{path}: fewer than {schema['min_items']} items")
+        if "max_items" in schema and len(value) > schema["max_items"]:
+            errors.append(f"{path}: more than {schema['max_items']} items")
+        items = schema.get("items")
+        if items is not None:
+            for index, item in enumerate(value):
+                errors += schema_errors(item, items, f"{path}[{index}]")
+        return errors
+
+    if kind == "string":
+        if not isinstance(value, str):
+            return [_type_error(path, "string", value)]
+        if "enum" in schema and value not in schema["enum"]:
+            return [f"{path}: {value!r} not one of {schema['enum']}"]
+        return []
+
+    if kind == "number":
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return [_type_error(path, "number", value)]
+        return []
+
+    if kind == "integer":
+        if isinstance(value, bool) or not isinstance(value, int):
+            return [_type_error(path, "integer", value)]
+        return []
+
+    if kind == "boolean" and not isinstance(value, bool):
+        return [_type_error(path, "boolean", value)]
+    return []
+
+
+def parse_response(text: str, schema: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Parse a JSON response and check it against `schema`
+
+    Raises:
+        ResponseParseError: not JSON, or off-schema (the parsed value is
+            kept on the error, so the caller may still salvage it)
+    """
+    data = loads(text)
+    if schema is not None:
+        errors = schema_errors(data, schema)
+        if errors:
+            raise ResponseParseError("; ".join(errors[:5]), data=data)
+    return data
@@ -0,0 +1,204 @@
+"""
+Content-addressed cache for detection results
+=============================================
+Key = sha256(model/prompt version + sha256 of the uploaded image bytes),
+so a re-uploaded or retried photo skips the Gemini round trip.
+
+Tiers:
+1. In-process LRU with TTL and a size bound (per worker)
+2. Persistent table `detection_cache` (survives restarts, shared by workers)
+
+Keys that leave the cache for good (expired, or evicted without a
+persistent tier behind them) are dropped from the near-duplicate index.
+"""
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.crud import detection_cache as cache_crud
+from app.ml.perceptual_hash import get_phash_index
+
+logger = logging.getLogger(__name__)
+
+# Results that must never be served from cache
+UNCACHEABLE_DISEASE_IDS = {"unknown"}
+
+# Fields describing one model call, not the diagnosis - never stored
+PER_REQUEST_FIELDS = ("token_usage",)
+
+
+def make_cache_key(content_hash: str, model_version: str) -> str:
+    """Build the cache key from the image content hash and model/prompt version"""
+    return hashlib.sha256(f"{model_version}\0{content_hash}".encode("utf-8")).hexdigest()
+
+
+class DetectionResultCache:
+    """
+    Two-tier (memory LRU + database) detection result cache
+
+    Args:
+        on_discard: Called with every key whose result is gone from both tiers
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        persistent: bool = True,
+        on_discard: Optional[Callable[[str], None]] = None
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self.on_discard = on_discard
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _discard(self, keys: List[str]) -> None:
+        if self.on_discard is not None:
+            for key in keys:
+                self.on_discard(key)
+
+    def _get_memory(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, result = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return result
+
+            del self._entries[key]
+            metrics.increment("detection_cache.expirations")
+            metrics.set_gauge("detection_cache.memory_entries", len(self._entries))
+
+        # The persistent copy was written at the same time, so it expired too
+        self._discard([key])
+        return None
+
+    def _put_memory(self, key: str, result: Dict) -> None:
+        evicted = []
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                metrics.increment("detection_cache.evictions")
+
+            metrics.set_gauge("detection_cache.memory_entries", len(self._entries))
+
+        if not self.persistent:
+            # Nothing left to serve these from
+            self._discard(evicted)
+
+    def get(self, key: str, db: Optional[Session] = None) -> Optional[Dict]:
+        """
+        Look up a cached result (blocking when it falls through to the database)
+
+        Returns:
+            Deep copy of the cached result, or None on miss
+        """
+        result = self._get_memory(key)
+        if result is not None:
+            metrics.increment("detection_cache.hits.memory")
+            return copy.deepcopy(result)
+
+        if self.persistent and db is not None:
+            try:
+                result = cache_crud.get_cached_result(db, key)
+            except Exception as e:
+                logger.warning(f"Detection cache lookup failed: {e}")
+                result = None
+
+            if result is not None:
+                metrics.increment("detection_cache.hits.persistent")
+                self._put_memory(key, result)
+                return copy.deepcopy(result)
+
+        metrics.increment("detection_cache.misses")
+        return None
+
+    def put(
+        self,
+        key: str,
+        model_version: str,
+        result: Dict,
+        db: Optional[Session] = None,
+        phash: Optional[str] = None
+    ) -> None:
+        """Store a result in both tiers (blocking when persistent)"""
+        if result.get("disease_id") in UNCACHEABLE_DISEASE_IDS:
+            return
+
+        result = copy.deepcopy(result)
+        for field in PER_REQUEST_FIELDS:
+            result.pop(field, None)
+        self._put_memory(key, result)
+        metrics.increment("detection_cache.writes")
+
+        if self.persistent and db is not None:
+            try:
+                cache_crud.save_cached_result(db, key, model_version, result, self.ttl_seconds, phash=phash)
+            except Exception as e:
+                logger.warning(f"Detection cache write failed: {e}")
+                db.rollback()
+
+    def clear_memory(self) -> None:
+        """Drop every in-process entry"""
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            metrics.set_gauge("detection_cache.memory_entries", 0)
+
+        if not self.persistent:
+            self._discard(keys)
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters and current size"""
+        hits_memory = metrics.get("detection_cache.hits.memory")
+        hits_persistent = metrics.get("detection_cache.hits.persistent")
+        misses = metrics.get("detection_cache.misses")
+        lookups = hits_memory + hits_persistent + misses
+
+        with self._lock:
+            size = len(self._entries)
+
+        return {
+            "memory_entries": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits_memory": hits_memory,
+            "hits_persistent": hits_persistent,
+            "misses": misses,
+            "evictions": metrics.get("detection_cache.evictions"),
+            "expirations": metrics.get("detection_cache.expirations"),
+            "hit_rate": round((hits_memory + hits_persistent) / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global instance
+_result_cache: Optional[DetectionResultCache] = None
+
+
+def get_result_cache() -> DetectionResultCache:
+    """Get or create the detection result cache"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = DetectionResultCache(
+            max_entries=settings.DETECTION_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.DETECTION_CACHE_TTL_SECONDS,
+            persistent=settings.DETECTION_CACHE_PERSISTENT,
+            on_discard=get_phash_index().remove
+        )
+    return _result_cache
@@ -9,11 +9,19 @@ from app.database import Base
 # Import semua model secara eksplisit
 from app.models.user import User
 from app.models.detection_history import DetectionHistory
+from app.models.detection_cache import DetectionCache
+from app.models.detection_job import DetectionJob
+from app.models.image_upload_outbox import ImageUploadOutbox
+from app.models.upload_blob import UploadBlob
 
 
 # Export untuk kemudahan import
 __all__ = [
     "Base",
     "User",
-    "DetectionHistory"
+    "DetectionHistory",
+    "DetectionCache",
+    "DetectionJob",
+    "ImageUploadOutbox",
+    "UploadBlob"
 ]
\ No newline at end of file
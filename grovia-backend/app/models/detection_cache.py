@@ -0,0 +1,43 @@
+"""
+Model untuk cache hasil deteksi (persistent tier)
+File: app/models/detection_cache.py
+"""
+from sqlalchemy import Column, String, Float, DateTime, Text
+from datetime import datetime, timezone
+from app.database import Base
+
+
+class DetectionCache(Base):
+    """
+    Hasil deteksi Gemini yang di-cache berdasarkan hash isi gambar
+    dan versi model/prompt, supaya upload ulang foto yang sama
+    tidak memanggil Gemini lagi
+    """
+    __tablename__ = "detection_cache"
+
+    # sha256(model_version + content hash)
+    cache_key = Column(String(64), primary_key=True)
+
+    # Versi model + prompt saat hasil dibuat (untuk invalidasi)
+    model_version = Column(String(100), nullable=False, index=True)
+
+    # Ringkasan untuk query cepat
+    disease_id = Column(String(100), nullable=False)
+    confidence = Column(Float, nullable=False)
+
+    # Perceptual hash (dHash 64-bit, hex) untuk deteksi foto yang mirip
+    phash = Column(String(16), nullable=True, index=True)
+
+    # Hasil lengkap dari model (JSON string)
+    result = Column(Text, nullable=False)
+
+    # Timestamp
+    created_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<DetectionCache(key={self.cache_key[:12]}, disease={self.disease_id}, version={self.model_version})>"
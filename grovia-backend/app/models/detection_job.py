@@ -0,0 +1,65 @@
+"""
+Model untuk antrian job deteksi (mode asynchronous)
+File: app/models/detection_job.py
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text, LargeBinary, ForeignKey
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
+from datetime import datetime, timezone
+from app.database import Base
+
+# Status job
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class DetectionJob(Base):
+    """
+    Job deteksi yang diproses worker di luar request HTTP
+
+    Gambar disimpan di tabel sampai job selesai. Worker mengambil job
+    dengan lease (lease_owner + lease_expires_at); lease yang habis berarti
+    worker mati dan job boleh diambil worker lain.
+    """
+    __tablename__ = "detection_jobs"
+
+    # UUID (hex) - dikembalikan ke client sebagai job_id
+    id = Column(String(32), primary_key=True)
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    # queued | running | succeeded | failed
+    status = Column(String(20), nullable=False, default=JOB_QUEUED, index=True)
+
+    # Gambar upload (dihapus setelah job selesai) - BLOB 64KB tidak cukup di MySQL
+    image_data = Column(LargeBinary().with_variant(MEDIUMBLOB(), "mysql"), nullable=True)
+    original_filename = Column(String(255), nullable=True)
+    # Nama file tujuan (deterministik per job, jadi upload ulang menimpa file yang sama)
+    filename = Column(String(255), nullable=False)
+
+    # Retry
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    # Job queued tidak diambil sebelum waktu ini (backoff retry)
+    available_at = Column(DateTime, nullable=False, index=True)
+
+    # Lease worker
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+
+    # Hasil: data response /detect (JSON string) + baris detection_history
+    result = Column(Text, nullable=True)
+    error = Column(String(500), nullable=True)
+    detection_id = Column(Integer, ForeignKey("detection_history.id"), nullable=True)
+
+    # Timestamp
+    created_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    completed_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<DetectionJob(id={self.id}, status={self.status}, attempts={self.attempts})>"
@@ -0,0 +1,67 @@
+"""
+Model untuk outbox upload gambar ke Cloudinary
+File: app/models/image_upload_outbox.py
+"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from datetime import datetime, timezone
+from app.database import Base
+
+# Status upload
+UPLOAD_PENDING = "pending"
+UPLOAD_RUNNING = "running"
+UPLOAD_DONE = "done"
+UPLOAD_FAILED = "failed"
+
+
+class ImageUploadOutbox(Base):
+    """
+    Upload Cloudinary yang tertunda untuk satu baris detection_history
+
+    Baris ini ditulis dalam transaksi yang sama dengan detection_history,
+    jadi response /detect tidak menunggu Cloudinary: gambar disimpan di
+    UPLOAD_DIR dulu, lalu worker outbox meng-upload, mengganti image_url
+    ke URL CDN dan menghapus file lokal. Lease sama seperti detection_jobs.
+    """
+    __tablename__ = "image_upload_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Baris history yang image_url-nya diganti (NULL jika history dihapus)
+    detection_id = Column(
+        Integer,
+        ForeignKey("detection_history.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True
+    )
+
+    # File di UPLOAD_DIR + tujuan di Cloudinary
+    filename = Column(String(255), nullable=False)
+    folder = Column(String(255), nullable=False)
+    public_id = Column(String(255), nullable=False)
+
+    # pending | running | done | failed
+    status = Column(String(20), nullable=False, default=UPLOAD_PENDING, index=True)
+
+    # Retry
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    available_at = Column(DateTime, nullable=False, index=True)
+
+    # Lease worker
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+
+    # Hasil
+    cloud_url = Column(String(500), nullable=True)
+    error = Column(String(500), nullable=True)
+
+    # Timestamp
+    created_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    completed_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ImageUploadOutbox(id={self.id}, filename={self.filename}, status={self.status})>"
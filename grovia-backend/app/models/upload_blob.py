@@ -0,0 +1,63 @@
+"""
+Model untuk blob gambar lokal (content-addressed) di UPLOAD_DIR
+File: app/models/upload_blob.py
+"""
+from sqlalchemy import Column, String, Integer, DateTime
+from datetime import datetime, timezone
+from typing import Optional
+import re
+from app.database import Base
+
+# Path relatif blob: ab/cd/<sha256><ext>
+BLOB_PATH = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]+$")
+
+
+def blob_relative_path(content_hash: str, extension: str) -> str:
+    """ab/cd/<hash><ext> for a sha256 hex digest"""
+    extension = (extension or ".jpg").lower()
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension}"
+
+
+def blob_path_of(image_url: str) -> Optional[str]:
+    """Blob path inside a local image URL (uploads/... or /uploads/...), None if not a blob"""
+    for prefix in ("/uploads/", "uploads/"):
+        if image_url.startswith(prefix):
+            path = image_url[len(prefix):]
+            return path if BLOB_PATH.match(path) else None
+    return None
+
+
+def blob_hash(path: str) -> str:
+    """Content hash of a blob path"""
+    return BLOB_PATH.match(path).group(1)
+
+
+class UploadBlob(Base):
+    """
+    Satu file gambar di UPLOAD_DIR, disimpan berdasarkan hash isinya
+    (app/utils/blob_store.py). Foto yang sama hanya disimpan sekali;
+    ref_count = jumlah baris detection_history yang memakai file ini.
+    File dengan ref_count 0 dihapus oleh GC setelah grace period.
+    """
+    __tablename__ = "upload_blobs"
+
+    # sha256 isi file
+    content_hash = Column(String(64), primary_key=True)
+
+    # Path relatif terhadap UPLOAD_DIR: ab/cd/<hash><ext>
+    path = Column(String(255), nullable=False)
+
+    # Jumlah baris detection_history dengan image_url uploads/<path>
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    # Timestamp
+    created_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    # Sejak kapan tidak dipakai (ref_count 0) - acuan grace period GC
+    released_at = Column(DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f"<UploadBlob(content_hash={self.content_hash}, path={self.path}, ref_count={self.ref_count})>"
@@ -29,6 +29,11 @@ class TreatmentRecommendation(BaseModel):
         from_attributes = True
 
 
+class DirectUploadDetectionRequest(BaseModel):
+    # public_id from /detection/upload-signature (folder included)
+    public_id: str = Field(..., min_length=1, max_length=255)
+
+
 class DetectionHistoryCreate(BaseModel):
     disease_id: str
     disease_name: str
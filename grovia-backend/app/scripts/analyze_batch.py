@@ -0,0 +1,84 @@
+"""
+Analyze a folder of leaf photos with Gemini (concurrent batch)
+=============================================================
+Prints progress while the batch runs and a per-image summary at the end,
+in input order. --output writes the full report (results included) as
+JSON.
+
+Usage:
+    python -m app.scripts.analyze_batch ./field_photos --concurrency 8 --output report.json
+    python -m app.scripts.analyze_batch ./field_photos --packed   # several photos per Gemini call
+    python -m app.scripts.analyze_batch ./bulk_import --validate-leaves --processes 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from app.ml.batch import BatchItemResult
+from app.ml.gemini_model import get_gemini_model
+from app.ml.leaf_validator import get_leaf_validator, shutdown_validation_pools
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def print_progress(completed: int, total: int, item: BatchItemResult) -> None:
+    label = item.result["disease_name"] if item.result else item.error
+    print(f"[{completed:>3}/{total}] {item.status:<7} {os.path.basename(item.source)} - {label} "
+          f"({item.duration_ms / 1000:.1f}s)", file=sys.stderr)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder with leaf photos")
+    parser.add_argument("--concurrency", type=int, default=None, help="Default: BATCH_CONCURRENCY")
+    parser.add_argument("--output", help="Write the full report as JSON")
+    parser.add_argument("--packed", action="store_true", default=None,
+                        help="Pack several images per Gemini call (default: GEMINI_PACKING_ENABLED)")
+    parser.add_argument("--validate-leaves", action="store_true",
+                        help="Drop photos the leaf validator rejects before calling Gemini")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Validation worker processes (default: LEAF_VALIDATION_PROCESSES, 0 = threads)")
+    args = parser.parse_args()
+
+    image_paths = sorted(
+        os.path.join(args.folder, name) for name in os.listdir(args.folder)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+    if not image_paths:
+        raise SystemExit(f"No images found in {args.folder}")
+
+    if args.validate_leaves:
+        validations = get_leaf_validator().validate_many(image_paths, processes=args.processes)
+        shutdown_validation_pools()
+        rejected = [(path, v) for path, v in zip(image_paths, validations) if not v["is_valid"]]
+        for path, validation in rejected:
+            print(f"   not a leaf: {os.path.basename(path)} - {validation['reason']}", file=sys.stderr)
+        image_paths = [path for path, v in zip(image_paths, validations) if v["is_valid"]]
+        print(f"{len(rejected)} photos rejected by the leaf validator, {len(image_paths)} left", file=sys.stderr)
+        if not image_paths:
+            return
+
+    model = get_gemini_model()
+    report = await model.analyze_batch_async(
+        image_paths, args.concurrency, on_progress=print_progress, packed=args.packed
+    )
+
+    summary = report.to_dict()
+    print("=" * 60)
+    print(f"{summary['ok']} ok, {summary['failed']} failed, {summary['skipped']} skipped "
+          f"of {summary['total']} in {report.duration_ms / 1000:.1f}s")
+    print("=" * 60)
+    for item in report.items:
+        label = item.result["disease_name"] if item.result else item.error
+        print(f"   {item.index:>3}  {item.status:<7} {os.path.basename(item.source):<30} {label}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
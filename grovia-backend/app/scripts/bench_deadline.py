@@ -0,0 +1,144 @@
+"""
+Benchmark: on-time success against a simulated slow Gemini backend
+=================================================================
+Simulated call latency: log-normal around --median seconds, plus a tail
+of calls that hang (--hang-rate) and transient 503s (--error-rate).
+Every request has the NF06 deadline (--deadline, default 25 s).
+
+Strategies:
+- legacy:  one call, no timeout (the request waits as long as the call)
+- retry:   per-attempt timeout + jittered backoff retries
+- hedged:  retry + a duplicate request once an attempt passes the p95
+
+Reported per strategy: on-time success (result within the deadline),
+late/failed counts, latency p50/p95/p99 and backend calls per request.
+Times are multiplied by --scale so the run takes seconds, not hours.
+
+Usage:
+    python -m app.scripts.bench_deadline --requests 400 --scale 0.02
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from google.api_core.exceptions import ServiceUnavailable
+
+from app.core.deadline import Deadline, DeadlineExceededError, LatencyTracker, call_with_retries
+from app.ml.gemini_model import is_retryable_error
+
+
+class SlowBackend:
+    """Fake model endpoint with a heavy latency tail"""
+
+    def __init__(self, args, rng: random.Random):
+        self.args = args
+        self.rng = rng
+        self.calls = 0
+
+    async def call(self) -> str:
+        self.calls += 1
+        roll = self.rng.random()
+        if roll < self.args.error_rate:
+            await asyncio.sleep(0.2 * self.args.scale)
+            raise ServiceUnavailable("simulated overload")
+        if roll < self.args.error_rate + self.args.hang_rate:
+            await asyncio.sleep(120 * self.args.scale)
+        else:
+            await asyncio.sleep(self.rng.lognormvariate(0, 0.5) * self.args.median * self.args.scale)
+        return "ok"
+
+
+async def run_strategy(name: str, args, seed: int) -> Dict:
+    rng = random.Random(seed)
+    backend = SlowBackend(args, rng)
+    tracker = LatencyTracker()
+    scale = args.scale
+    outcomes: List[Dict] = []
+
+    # Warm the latency window so hedging has a p95 from the start
+    for _ in range(tracker.min_samples):
+        tracker.observe(rng.lognormvariate(0, 0.5) * args.median * scale)
+
+    async def _request() -> None:
+        deadline = Deadline(args.deadline * scale)
+        start = time.perf_counter()
+        ok = False
+        try:
+            if name == "legacy":
+                await backend.call()
+            else:
+                await call_with_retries(
+                    backend.call,
+                    deadline=deadline,
+                    attempt_timeout=args.attempt_timeout * scale,
+                    max_attempts=args.max_attempts,
+                    is_retryable=is_retryable_error,
+                    backoff_base=0.5 * scale,
+                    backoff_max=4.0 * scale,
+                    hedge_tracker=tracker if name == "hedged" else None,
+                    hedge_min_delay=args.hedge_min_delay * scale,
+                    name=f"bench.{name}"
+                )
+            ok = True
+        except (DeadlineExceededError, ServiceUnavailable, asyncio.TimeoutError):
+            pass
+        elapsed = (time.perf_counter() - start) / scale
+        outcomes.append({"ok": ok, "on_time": ok and elapsed <= args.deadline, "latency": elapsed})
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def _bounded() -> None:
+        async with semaphore:
+            await _request()
+
+    await asyncio.gather(*(_bounded() for _ in range(args.requests)))
+
+    latencies = sorted(o["latency"] for o in outcomes)
+
+    def pct(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {
+        "on_time": sum(o["on_time"] for o in outcomes) / len(outcomes),
+        "late": sum(o["ok"] and not o["on_time"] for o in outcomes),
+        "failed": sum(not o["ok"] for o in outcomes),
+        "p50": statistics.median(latencies),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "calls": backend.calls / len(outcomes)
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--median", type=float, default=6.0, help="Median call latency (s)")
+    parser.add_argument("--hang-rate", type=float, default=0.08)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--deadline", type=float, default=25.0)
+    parser.add_argument("--attempt-timeout", type=float, default=15.0)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--hedge-min-delay", type=float, default=2.0)
+    parser.add_argument("--scale", type=float, default=0.02, help="Real seconds per simulated second")
+    args = parser.parse_args()
+
+    # Retry/hedge warnings would drown the table
+    logging.basicConfig(level=logging.ERROR)
+
+    print("=" * 92)
+    print(f"DEADLINE BENCHMARK ({args.requests} requests, median {args.median}s, "
+          f"hang {args.hang_rate:.0%}, 503 {args.error_rate:.0%}, deadline {args.deadline}s)")
+    print("=" * 92)
+    for name in ("legacy", "retry", "hedged"):
+        r = await run_strategy(name, args, seed=7)
+        print(f"   {name:<7} on-time {r['on_time']:6.1%}   late {r['late']:4d}   failed {r['failed']:4d}   "
+              f"p50 {r['p50']:6.1f}s  p95 {r['p95']:6.1f}s  p99 {r['p99']:6.1f}s   calls/req {r['calls']:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+"""
+Benchmark: concurrent /detect + /history latency, inline vs executors
+=====================================================================
+Simulates the detect_disease pipeline stages (upload copy, OpenCV
+validation, Gemini call, Cloudinary upload, DB commit) and a history read
+running on the same event loop, first with every stage called inline
+(the old behaviour) and then with the stages dispatched to the bounded
+CPU / I/O executors from app.core.executors.
+
+Stage durations are simulated with time.sleep, which - like OpenCV, the
+Gemini SDK, Cloudinary and PyMySQL - releases the GIL while it blocks.
+
+Usage:
+    python -m app.scripts.bench_event_loop --detects 8 --histories 40
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+from app.core.executors import run_cpu, run_io, shutdown_executors
+
+# Simulated stage durations in seconds (roughly what production logs show)
+STAGES = {
+    "save_upload": 0.02,
+    "leaf_validation": 0.08,
+    "gemini_predict": 2.0,
+    "cloudinary_upload": 0.4,
+    "db_commit": 0.01,
+}
+HISTORY_QUERY = 0.005
+
+
+async def detect_inline(scale: float) -> None:
+    """Old detect_disease: every blocking stage runs on the event loop"""
+    time.sleep(STAGES["save_upload"] * scale)
+    time.sleep(STAGES["leaf_validation"] * scale)
+    time.sleep(STAGES["gemini_predict"] * scale)
+    time.sleep(STAGES["cloudinary_upload"] * scale)
+    time.sleep(STAGES["db_commit"] * scale)
+
+
+async def detect_offloaded(scale: float) -> None:
+    """New detect_disease: CPU stages on the CPU executor, blocking I/O on the I/O executor"""
+    await run_io(time.sleep, STAGES["save_upload"] * scale)
+    await run_cpu(time.sleep, STAGES["leaf_validation"] * scale)
+    await run_io(time.sleep, STAGES["gemini_predict"] * scale)
+    await run_io(time.sleep, STAGES["cloudinary_upload"] * scale)
+    await run_io(time.sleep, STAGES["db_commit"] * scale)
+
+
+async def history_inline(scale: float) -> None:
+    time.sleep(HISTORY_QUERY * scale)
+
+
+async def history_offloaded(scale: float) -> None:
+    await run_io(time.sleep, HISTORY_QUERY * scale)
+
+
+async def _timed(coro: Awaitable, arrival: float, latencies: List[float]) -> None:
+    """Await a request and record its latency measured from its planned arrival"""
+    await coro
+    latencies.append(time.perf_counter() - arrival)
+
+
+async def run_scenario(
+    detect: Callable[[float], Awaitable],
+    history: Callable[[float], Awaitable],
+    detects: int,
+    histories: int,
+    scale: float
+) -> dict:
+    """Fire `detects` detections at t=0 plus history reads arriving every 50ms"""
+    detect_latencies: List[float] = []
+    history_latencies: List[float] = []
+    gap = 0.05 * scale
+
+    start = time.perf_counter()
+
+    async def history_stream():
+        tasks = []
+        for i in range(histories):
+            # A late loop means the request waited in the socket backlog
+            arrival = start + i * gap
+            tasks.append(asyncio.create_task(_timed(history(scale), arrival, history_latencies)))
+            await asyncio.sleep(max(0.0, start + (i + 1) * gap - time.perf_counter()))
+        await asyncio.gather(*tasks)
+
+    stream = asyncio.create_task(history_stream())
+    detect_tasks = [
+        asyncio.create_task(_timed(detect(scale), start, detect_latencies))
+        for _ in range(detects)
+    ]
+    await asyncio.gather(stream, *detect_tasks)
+    wall = time.perf_counter() - start
+
+    return {
+        "wall": wall,
+        "detect": detect_latencies,
+        "history": history_latencies,
+    }
+
+
+def _pct(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+def _report(name: str, result: dict) -> None:
+    print(f"\n{name}")
+    print(f"   wall time          : {result['wall']:.2f}s")
+    for label in ("detect", "history"):
+        values = result[label]
+        print(
+            f"   {label:<8} latency ms : p50={_pct(values, 50):8.1f}  "
+            f"p95={_pct(values, 95):8.1f}  max={max(values) * 1000:8.1f}  "
+            f"mean={statistics.mean(values) * 1000:8.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--detects", type=int, default=8, help="concurrent /detect requests")
+    parser.add_argument("--histories", type=int, default=40, help="/history reads issued during the run")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every stage duration")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"EVENT LOOP BENCHMARK ({args.detects} detects, {args.histories} history reads)")
+    print("=" * 60)
+
+    before = asyncio.run(run_scenario(detect_inline, history_inline, args.detects, args.histories, args.scale))
+    _report("BEFORE - blocking stages inline on the event loop", before)
+
+    after = asyncio.run(run_scenario(detect_offloaded, history_offloaded, args.detects, args.histories, args.scale))
+    _report("AFTER - stages on bounded CPU / I/O executors", after)
+
+    shutdown_executors()
+
+
+if __name__ == "__main__":
+    main()
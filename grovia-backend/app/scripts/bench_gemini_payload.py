@@ -0,0 +1,145 @@
+"""
+Benchmark: Gemini image payload encoding
+========================================
+Runs the detection prompt over a folder of leaf photos once per encoding
+setting and reports, per setting:
+
+- request bytes (encoded image, before base64)
+- input tokens reported by the API (count_tokens)
+- Gemini latency (median / p95)
+- diagnosis agreement with the first (reference) setting
+
+Use it to pick the cheapest GEMINI_IMAGE_* setting that keeps the
+diagnoses stable. Needs GEMINI_API_KEY; --dry-run only encodes (no API
+calls) and reports bytes and encode time.
+
+Setting format: format:max_side:quality[:subsampling], e.g.
+    jpeg:1024:85:4:2:0   webp:768:75   jpeg:512:70:4:2:0
+
+Usage:
+    python -m app.scripts.bench_gemini_payload --images ./samples \\
+        --settings jpeg:1024:95:4:4:4 jpeg:1024:85:4:2:0 webp:768:75 jpeg:512:70:4:2:0
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Dict, List
+
+from app.ml.image_input import ImageInput
+from app.ml.preprocessing import ImageEncoding
+
+DEFAULT_SETTINGS = [
+    "jpeg:1024:95:4:4:4",
+    "jpeg:1024:85:4:2:0",
+    "webp:1024:80",
+    "jpeg:768:80:4:2:0",
+    "webp:768:75",
+    "jpeg:512:70:4:2:0",
+]
+
+
+def parse_setting(spec: str) -> ImageEncoding:
+    fmt, max_side, quality, *subsampling = spec.split(":")
+    return ImageEncoding(
+        max_side=int(max_side),
+        format=fmt.lower(),
+        quality=int(quality),
+        subsampling=":".join(subsampling) if subsampling else "4:2:0"
+    ).validate()
+
+
+def load_images(folder: str, limit: int) -> List[ImageInput]:
+    names = sorted(
+        name for name in os.listdir(folder)
+        if os.path.splitext(name)[1].lower() in (".jpg", ".jpeg", ".png", ".webp")
+    )
+    return [ImageInput.from_path(os.path.join(folder, name)) for name in names[:limit]]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_setting(model, images: List[ImageInput], encoding: ImageEncoding, concurrency: int) -> List[Dict]:
+    model.image_encoding = encoding
+    prompt = model.create_detection_prompt()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(image: ImageInput) -> Dict:
+        async with semaphore:
+            payload = image.payload(encoding)
+            tokens = (await model.model.count_tokens_async([prompt, payload])).total_tokens
+            start = time.perf_counter()
+            result = await model.predict_async(image)
+            latency = time.perf_counter() - start
+            return {
+                "bytes": len(payload["data"]),
+                "tokens": tokens,
+                "latency": latency,
+                "disease_id": result["disease_id"] if result else None
+            }
+
+    return list(await asyncio.gather(*(_one(image) for image in images)))
+
+
+def encode_only(images: List[ImageInput], encoding: ImageEncoding) -> List[Dict]:
+    rows = []
+    for image in images:
+        image.rgb_pil(encoding.max_side)  # decode + resize are not part of the encode cost
+        start = time.perf_counter()
+        payload = image.payload(encoding)
+        rows.append({
+            "bytes": len(payload["data"]),
+            "encode_ms": (time.perf_counter() - start) * 1000
+        })
+    return rows
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder with leaf photos")
+    parser.add_argument("--settings", nargs="+", default=DEFAULT_SETTINGS)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--dry-run", action="store_true", help="Encode only, no API calls")
+    args = parser.parse_args()
+
+    encodings = [parse_setting(spec) for spec in args.settings]
+    images = load_images(args.images, args.limit)
+    if not images:
+        raise SystemExit(f"No images found in {args.images}")
+
+    print("=" * 78)
+    print(f"GEMINI PAYLOAD BENCHMARK ({len(images)} images, reference = {args.settings[0]})")
+    print("=" * 78)
+
+    if args.dry_run:
+        for spec, encoding in zip(args.settings, encodings):
+            rows = encode_only(images, encoding)
+            print(f"   {spec:<22} bytes {statistics.mean(r['bytes'] for r in rows) / 1024:7.1f} KiB   "
+                  f"encode {statistics.median(r['encode_ms'] for r in rows):6.1f} ms")
+        return
+
+    from app.ml.gemini_model import GeminiPlantDiseaseModel
+    model = GeminiPlantDiseaseModel()
+
+    reference = None
+    for spec, encoding in zip(args.settings, encodings):
+        rows = await run_setting(model, images, encoding, args.concurrency)
+        diagnoses = [r["disease_id"] for r in rows]
+        if reference is None:
+            reference = diagnoses
+        agreement = sum(a == b and a is not None for a, b in zip(diagnoses, reference)) / len(rows)
+        latencies = [r["latency"] for r in rows]
+
+        print(f"   {spec:<22} bytes {statistics.mean(r['bytes'] for r in rows) / 1024:7.1f} KiB   "
+              f"tokens {statistics.mean(r['tokens'] for r in rows):7.0f}   "
+              f"latency p50 {statistics.median(latencies):5.2f}s p95 {percentile(latencies, 0.95):5.2f}s   "
+              f"agreement {agreement:6.1%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,247 @@
+"""
+Benchmark: leaf validator exact vs fast mode
+============================================
+1. Agreement: runs both modes over a reference set and lists every photo
+   where the decisions differ, plus how often fast mode decided on the
+   thumbnail alone, exited early or re-checked at 800px
+2. Throughput: images/sec on one core (OpenCV threads = 1) at several
+   input resolutions, for the validator alone (pyramid already built, as
+   in the detection pipeline) and for decode + pyramid + validator
+3. Batch: validate_many (decode included) one by one, on threads and on
+   worker processes fed through shared memory
+4. Reduced decode: decisions on a reduced JPEG decode (JPEG_REDUCED_DECODE,
+   with its full-decode re-check) vs a full decode, per mode
+
+Without --reference-dir a synthetic set is used (leaf-like, non-leaf and
+borderline photos); run it on real uploads before switching
+LEAF_VALIDATOR_MODE to fast.
+
+Usage:
+    python -m app.scripts.bench_leaf_validator
+    python -m app.scripts.bench_leaf_validator --reference-dir ./photos --sizes 1024x768 4032x3024
+    python -m app.scripts.bench_leaf_validator --batch 200 --processes 4
+"""
+import argparse
+import os
+import time
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.ml.image_input import ImageInput
+from app.ml.leaf_validator import LeafImageValidator, get_green_lut, shutdown_validation_pools
+from app.ml.preprocessing import VALIDATION_LEVEL
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+FAST_COUNTERS = ("leaf_validator.fast_decisions", "leaf_validator.fast_exits", "leaf_validator.fast_rechecks")
+
+
+def synthetic_photo(rng: np.random.Generator, width: int, height: int, kind: str) -> np.ndarray:
+    """Leaf-like / non-leaf / borderline photo (BGR)"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    if kind == "leaf":
+        hue, base = rng.uniform(40, 75), rng.uniform(0.35, 0.95)
+    elif kind == "other":
+        hue, base = rng.choice([5.0, 12.0, 100.0, 120.0, 160.0]), rng.uniform(0.0, 0.3)
+    else:
+        hue, base = rng.uniform(25, 95), rng.uniform(0.05, 0.4)
+
+    hsv = np.empty((height, width, 3), dtype=np.float32)
+    hsv[..., 0] = hue + 6 * np.sin(x / rng.uniform(20, 90))
+    hsv[..., 1] = rng.uniform(30, 200)
+    hsv[..., 2] = rng.uniform(50, 220) + 25 * np.cos(y / rng.uniform(15, 80))
+    image = cv2.cvtColor(np.clip(hsv, 0, 255).astype(np.uint8), cv2.COLOR_HSV2BGR)
+
+    # Leaf-coloured blob covering roughly `base` of the frame, with veins
+    radius = np.sqrt(base * width * height / np.pi)
+    cx, cy = rng.uniform(0.3, 0.7) * width, rng.uniform(0.3, 0.7) * height
+    blob = (x - cx) ** 2 / 1.6 + (y - cy) ** 2 * 1.6 <= radius ** 2
+    leaf = np.zeros_like(image)
+    leaf[...] = cv2.cvtColor(np.uint8([[[rng.uniform(38, 80), rng.uniform(80, 230), rng.uniform(60, 200)]]]),
+                             cv2.COLOR_HSV2BGR)[0, 0]
+    image[blob] = leaf[blob]
+    for _ in range(int(rng.integers(0, 12))):
+        angle = rng.uniform(0, np.pi)
+        end = (int(cx + radius * np.cos(angle)), int(cy + radius * np.sin(angle)))
+        cv2.line(image, (int(cx), int(cy)), end, (60, 140, 90), max(1, width // 400))
+
+    noise = rng.normal(0, rng.uniform(2, 20), image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def encode(image: np.ndarray) -> bytes:
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def reference_set(reference_dir: str, count: int) -> List[Tuple[str, bytes]]:
+    if reference_dir:
+        photos = []
+        for root, _, files in os.walk(reference_dir):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    with open(path, "rb") as f:
+                        photos.append((path, f.read()))
+        return photos
+
+    rng = np.random.default_rng(0)
+    photos = []
+    for i in range(count):
+        kind = ("leaf", "other", "borderline")[i % 3]
+        width = int(rng.choice([640, 1024, 1600, 2048]))
+        height = width * 3 // 4
+        photos.append((f"synthetic/{kind}_{i:03d}", encode(synthetic_photo(rng, width, height, kind))))
+    return photos
+
+
+def check_agreement(photos: List[Tuple[str, bytes]]) -> None:
+    exact = LeafImageValidator(mode="exact")
+    fast = LeafImageValidator(mode="fast")
+    before = {name: metrics.snapshot()["counters"].get(name, 0) for name in FAST_COUNTERS}
+
+    mismatches = []
+    for name, data in photos:
+        image = ImageInput(data)
+        expected = exact.validate(image)
+        actual = fast.validate(image)
+        if expected["is_valid"] != actual["is_valid"]:
+            mismatches.append((name, expected, actual))
+
+    counters = metrics.snapshot()["counters"]
+    total = max(len(photos), 1)
+    print(f"   Photos: {len(photos)}   agreement: {1 - len(mismatches) / total:.2%}")
+    for counter in FAST_COUNTERS:
+        share = (counters.get(counter, 0) - before[counter]) / total
+        print(f"   {counter.split('.')[-1]:<16} {share:7.1%}")
+    for name, expected, actual in mismatches:
+        print(f"   MISMATCH {name}: exact {expected['is_valid']} {expected.get('debug_info')} "
+              f"fast {actual['is_valid']} {actual.get('debug_info')}")
+
+
+def check_decode_agreement(photos: List[Tuple[str, bytes]]) -> None:
+    counter = "leaf_validator.full_decode_rechecks"
+    enabled = settings.JPEG_REDUCED_DECODE
+    for mode in ("exact", "fast"):
+        validator = LeafImageValidator(mode=mode)
+        before = metrics.snapshot()["counters"].get(counter, 0)
+        mismatches, reduced = [], 0
+        for name, data in photos:
+            settings.JPEG_REDUCED_DECODE = False
+            expected = validator.validate(ImageInput(data))
+            settings.JPEG_REDUCED_DECODE = True
+            image = ImageInput(data, min_side=VALIDATION_LEVEL)
+            actual = validator.validate(image)
+            reduced += image.decode_factor > 1
+            if expected["is_valid"] != actual["is_valid"]:
+                mismatches.append((name, expected, actual))
+        settings.JPEG_REDUCED_DECODE = enabled
+
+        rechecks = metrics.snapshot()["counters"].get(counter, 0) - before
+        total = max(len(photos), 1)
+        print(f"   {mode:<6} reduced decodes {reduced / total:6.1%}   re-checked {rechecks / total:6.1%}   "
+              f"agreement {1 - len(mismatches) / total:.2%}")
+        for name, expected, actual in mismatches:
+            print(f"   MISMATCH {name}: full {expected.get('debug_info')} reduced {actual.get('debug_info')}")
+
+
+def images_per_second(func, items: list, seconds: float) -> float:
+    done, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func(items[done % len(items)])
+        done += 1
+    return done / (time.perf_counter() - start)
+
+
+def throughput(sizes: List[Tuple[int, int]], seconds: float) -> None:
+    exact = LeafImageValidator(mode="exact")
+    fast = LeafImageValidator(mode="fast")
+    rng = np.random.default_rng(1)
+
+    print(f"   {'input':>10}  {'exact':>8}  {'fast':>8}  {'speedup':>7}   "
+          f"{'decode+exact':>12}  {'decode+fast':>11}")
+    for width, height in sizes:
+        blobs = [encode(synthetic_photo(rng, width, height, kind)) for kind in ("leaf", "other", "borderline")]
+        images = []
+        for blob in blobs:
+            image = ImageInput(blob)
+            image.level(VALIDATION_LEVEL)  # pyramid built, as after earlier stages
+            fast.validate_fast(image)  # and any full-decode re-check done once
+            images.append(image)
+
+        exact_rate = images_per_second(lambda image: exact.validate_image(image.level(VALIDATION_LEVEL)), images, seconds)
+        fast_rate = images_per_second(fast.validate_fast, images, seconds)
+        full_exact = images_per_second(lambda blob: exact.validate(ImageInput(blob)), blobs, seconds)
+        full_fast = images_per_second(lambda blob: fast.validate(ImageInput(blob)), blobs, seconds)
+        print(f"   {f'{width}x{height}':>10}  {exact_rate:8.0f}  {fast_rate:8.0f}  {fast_rate / exact_rate:6.1f}x   "
+              f"{full_exact:12.1f}  {full_fast:11.1f}")
+
+
+def batch_throughput(count: int, processes: int) -> None:
+    rng = np.random.default_rng(2)
+    blobs = [encode(synthetic_photo(rng, 2016, 1512, ("leaf", "other", "borderline")[i % 3])) for i in range(count)]
+    cores = os.cpu_count() or 1
+
+    print(f"   {'':<26} {'images/sec':>10}  {'per core':>8}")
+    for mode in ("exact", "fast"):
+        validator = LeafImageValidator(mode=mode)
+        runs = [
+            ("one by one", lambda: [validator.validate(ImageInput(blob)) for blob in blobs]),
+            ("threads", lambda: validator.validate_many([ImageInput(blob) for blob in blobs], processes=0)),
+        ]
+        if processes > 0:
+            runs.append((f"{processes} processes",
+                         lambda: validator.validate_many([ImageInput(blob) for blob in blobs], processes=processes)))
+            validator.validate_many([ImageInput(blobs[0])], processes=processes)  # start the workers
+
+        for name, run in runs:
+            start = time.perf_counter()
+            run()
+            rate = count / (time.perf_counter() - start)
+            print(f"   {mode + ', ' + name:<26} {rate:10.1f}  {rate / cores:8.1f}")
+    shutdown_validation_pools()
+
+
+def parse_size(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reference-dir", help="Folder of real photos (default: synthetic set)")
+    parser.add_argument("--synthetic-count", type=int, default=150)
+    parser.add_argument("--sizes", nargs="+", type=parse_size,
+                        default=[(640, 480), (1280, 960), (2016, 1512), (4032, 3024)])
+    parser.add_argument("--seconds", type=float, default=2.0, help="Measuring time per cell")
+    parser.add_argument("--batch", type=int, default=120, help="Photos for the validate_many run (0 = skip)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    # Per core: no OpenCV worker threads
+    cv2.setNumThreads(1)
+    get_green_lut()
+
+    print("=" * 72)
+    print("LEAF VALIDATOR: exact vs fast")
+    print("=" * 72)
+    print("Agreement" + (f" ({args.reference_dir})" if args.reference_dir else " (synthetic reference set)"))
+    photos = reference_set(args.reference_dir, args.synthetic_count)
+    check_agreement(photos)
+    print()
+    print("Reduced JPEG decode vs full decode (validator-only decode, >= 800px)")
+    check_decode_agreement(photos)
+    print()
+    print("Throughput, images/sec/core (validator only | decode + pyramid + validator)")
+    throughput(args.sizes, args.seconds)
+
+    if args.batch > 0:
+        print()
+        print(f"Batch validate_many, {args.batch} photos 2016x1512 (decode included, {os.cpu_count()} cores)")
+        batch_throughput(args.batch, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: near-duplicate lookup in the perceptual hash index
+=============================================================
+Fills a MultiIndexHashTable with random 64-bit hashes and measures
+lookup latency for queries that are near-duplicates (a few flipped bits)
+of indexed hashes, and for queries with no match.
+
+Usage:
+    python -m app.scripts.bench_phash_index --entries 1000000 --distance 6
+"""
+import argparse
+import random
+import time
+
+from app.ml.perceptual_hash import MultiIndexHashTable
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--distance", type=int, default=6)
+    parser.add_argument("--chunks", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    index = MultiIndexHashTable(chunks=args.chunks)
+
+    start = time.perf_counter()
+    hashes = [rng.getrandbits(64) for _ in range(args.entries)]
+    for i, value in enumerate(hashes):
+        index.add(str(i), value, 0.9)
+    build = time.perf_counter() - start
+
+    print("=" * 60)
+    print(f"PHASH INDEX BENCHMARK ({args.entries:,} entries, {args.chunks} chunks, r={args.distance})")
+    print("=" * 60)
+    print(f"   build time      : {build:.1f}s")
+
+    # Near-duplicates: flip up to `distance` random bits of an indexed hash
+    near = []
+    for _ in range(args.queries):
+        value = rng.choice(hashes)
+        for bit in rng.sample(range(64), rng.randint(0, args.distance)):
+            value ^= 1 << bit
+        near.append(value)
+    far = [rng.getrandbits(64) for _ in range(args.queries)]
+
+    for label, queries in (("near-duplicate", near), ("no match", far)):
+        found = 0
+        start = time.perf_counter()
+        for value in queries:
+            if index.nearest(value, args.distance) is not None:
+                found += 1
+        elapsed = time.perf_counter() - start
+        print(f"   {label:<15} : {elapsed / len(queries) * 1e6:8.1f} us/query  (found {found}/{len(queries)})")
+
+
+if __name__ == "__main__":
+    main()
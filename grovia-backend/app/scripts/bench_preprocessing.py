@@ -0,0 +1,157 @@
+"""
+Benchmark: image preprocessing for one detection
+================================================
+Compares, on a synthetic phone-sized JPEG (12MP by default), the work done
+per upload before one detection call:
+
+- legacy: validator decodes with cv2.imread + resizes to 800px, the
+  perceptual hash reuses that array, Gemini re-opens the file with PIL,
+  LANCZOS-resizes to 1024px and converts to RGB
+- shared: one full-size in-memory decode, one resize pyramid
+  (1024 -> 800 -> 256), every stage takes its level from ImageInput
+- reduced: same, but the JPEG is decoded at 1/2, 1/4 or 1/8 scale (DCT
+  scaling) when the result still covers 1024px (JPEG_REDUCED_DECODE)
+- validate: validator-only decode (800px level), full vs reduced
+
+Time is the median over --runs; peak memory is the max RSS of a fresh
+child process that runs the path once (so the two paths don't share heap).
+
+Usage:
+    python -m app.scripts.bench_preprocessing --runs 10
+    python -m app.scripts.bench_preprocessing --size 8000x6000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.ml.image_input import ImageInput
+from app.ml.perceptual_hash import dhash
+from app.ml.preprocessing import GEMINI_LEVEL, THUMBNAIL_LEVEL, VALIDATION_LEVEL
+
+WIDTH, HEIGHT = 4032, 3024
+
+
+def make_photo(path: str, seed: int = 0, width: int = WIDTH, height: int = HEIGHT) -> None:
+    """Leaf-ish JPEG: green gradient + noise (so it does not compress to nothing)"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[..., 0] = (40 + 30 * np.sin(x / 97.0)).astype(np.uint8)
+    image[..., 1] = (120 + 60 * np.cos(y / 131.0)).astype(np.uint8)
+    image[..., 2] = (50 + 20 * np.sin((x + y) / 211.0)).astype(np.uint8)
+    image = cv2.add(image, rng.integers(0, 40, image.shape, dtype=np.uint8))
+    cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+
+def legacy_path(path: str) -> None:
+    image_cv = cv2.imread(path)
+    height, width = image_cv.shape[:2]
+    scale = VALIDATION_LEVEL / max(height, width)
+    image_cv = cv2.resize(image_cv, (int(width * scale), int(height * scale)))
+    dhash(image_cv)
+
+    image = Image.open(path)
+    ratio = GEMINI_LEVEL / max(image.size)
+    image = image.resize((int(image.width * ratio), int(image.height * ratio)), Image.Resampling.LANCZOS)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+
+def shared_path(path: str, reduced: bool = False) -> None:
+    settings.JPEG_REDUCED_DECODE = reduced
+    upload = ImageInput.from_path(path)
+    upload.level(VALIDATION_LEVEL)
+    dhash(upload.level(THUMBNAIL_LEVEL))
+    upload.rgb_pil(GEMINI_LEVEL)
+
+
+def reduced_path(path: str) -> None:
+    shared_path(path, reduced=True)
+
+
+def validate_full_path(path: str) -> None:
+    settings.JPEG_REDUCED_DECODE = False
+    ImageInput.from_path(path, min_side=VALIDATION_LEVEL).level(VALIDATION_LEVEL)
+
+
+def validate_reduced_path(path: str) -> None:
+    settings.JPEG_REDUCED_DECODE = True
+    ImageInput.from_path(path, min_side=VALIDATION_LEVEL).level(VALIDATION_LEVEL)
+
+
+PATHS = {
+    "legacy": legacy_path,
+    "shared": shared_path,
+    "reduced": reduced_path,
+    "validate (full)": validate_full_path,
+    "validate (reduced)": validate_reduced_path,
+}
+
+
+def _peak_rss_child(name: str, path: str, queue) -> None:
+    if name in PATHS:
+        PATHS[name](path)
+    queue.put(_peak_rss_mb())
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM belongs to this address space; ru_maxrss would carry over the
+    # parent's peak through fork/exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def peak_rss_mb(name: str, path: str) -> float:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_peak_rss_child, args=(name, path, queue))
+    process.start()
+    process.join()
+    return queue.get()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--size", default=f"{WIDTH}x{HEIGHT}", help="Photo size, WIDTHxHEIGHT")
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.lower().split("x"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "photo.jpg")
+        make_photo(path, width=width, height=height)
+
+        print("=" * 72)
+        print(f"PREPROCESSING BENCHMARK ({width}x{height} JPEG, {os.path.getsize(path) / 1e6:.1f} MB)")
+        print("=" * 72)
+        print(f"   {'imports':<18} {'':>48} peak RSS {peak_rss_mb('imports', path):7.1f} MB")
+
+        for name, func in PATHS.items():
+            func(path)  # warm up
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                func(path)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            print(f"   {name:<18} median {statistics.median(timings):7.1f} ms   "
+                  f"min {min(timings):7.1f} ms   peak RSS {peak_rss_mb(name, path):7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
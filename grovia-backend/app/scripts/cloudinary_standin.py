@@ -0,0 +1,317 @@
+"""
+Local Cloudinary stand-in
+=========================
+Just enough of the Cloudinary upload API and CDN to run direct uploads
+(/detection/upload-signature + /detection/detect-cloud) and the upload
+outbox without a Cloudinary account:
+
+- POST /v1_1/<cloud>/image/upload   signed upload (signature, api_key,
+                                    timestamp window and allowed_formats
+                                    are checked like Cloudinary does)
+- POST /v1_1/<cloud>/image/destroy  delete an asset
+- GET  /image/upload/[<transformations>/][v<version>/]<public_id>[.<ext>]
+                                    delivery; c_limit, w_, h_, q_ and f_
+                                    are applied, everything else ignored
+
+Assets are kept under --dir. Point the backend at it with:
+
+    USE_CLOUDINARY=true
+    CLOUDINARY_STANDIN_URL=http://127.0.0.1:9100
+
+    python -m app.scripts.cloudinary_standin --port 9100
+"""
+import argparse
+import email.parser
+import email.policy
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import cv2
+import numpy as np
+from cloudinary.utils import api_sign_request
+
+from app.core.config import settings
+from app.utils.cloudinary_service import SIGNATURE_WINDOW_SECONDS
+from app.utils.upload_ingest import sniff_image_format
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_PATH = re.compile(r"^/v1_1/[^/]+/image/(upload|destroy)$")
+DELIVERY_PREFIX = "/image/upload/"
+TRANSFORMATION = re.compile(r"^([a-z]{1,2}_[^,/]+)(,[a-z]{1,2}_[^,/]+)*$")
+VERSION = re.compile(r"^v\d+$")
+# Form fields Cloudinary leaves out of the signature
+UNSIGNED_FIELDS = {"file", "api_key", "signature", "resource_type", "cloud_name"}
+ENCODINGS = {"jpg": ".jpg", "jpeg": ".jpg", "png": ".png", "webp": ".webp"}
+
+
+class AssetStore:
+    """Uploaded originals on disk, keyed by public_id"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, public_id: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, public_id))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Invalid public_id: {public_id}")
+        return path
+
+    def put(self, public_id: str, data: bytes, fmt: str) -> None:
+        path = self._path(public_id)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+            with open(path + ".format", "w") as f:
+                f.write(fmt)
+
+    def get(self, public_id: str) -> Optional[Tuple[bytes, str]]:
+        try:
+            path = self._path(public_id)
+            with open(path, "rb") as f:
+                data = f.read()
+            with open(path + ".format") as f:
+                return data, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, public_id: str) -> bool:
+        try:
+            path = self._path(public_id)
+            with self._lock:
+                os.remove(path)
+                os.remove(path + ".format")
+            return True
+        except (OSError, ValueError):
+            return False
+
+
+def parse_form(content_type: str, body: bytes) -> Dict[str, object]:
+    """multipart/form-data or urlencoded body -> {name: str | bytes (files)}"""
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return dict(parse_qsl(body.decode("utf-8"), keep_blank_values=True))
+
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name is None:
+            continue
+        payload = part.get_payload(decode=True) or b""
+        fields[name] = payload if part.get_filename() else payload.decode("utf-8")
+    return fields
+
+
+def parse_transformations(segment: str) -> Dict[str, str]:
+    return dict(part.split("_", 1) for part in segment.split(","))
+
+
+def render(data: bytes, transformations: Dict[str, str], fmt: str) -> Optional[bytes]:
+    """Apply c_limit / w / h / q to an original and encode it as `fmt`"""
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+
+    height, width = image.shape[:2]
+    max_width = int(transformations.get("w", width))
+    max_height = int(transformations.get("h", height))
+    scale = min(max_width / width, max_height / height)
+    if transformations.get("c") == "limit":
+        scale = min(scale, 1.0)
+    if scale != 1.0:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+
+    quality = transformations.get("q", "auto")
+    quality = 80 if not quality.isdigit() else int(quality)
+    params = []
+    if fmt == "jpg":
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    elif fmt == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+
+    ok, encoded = cv2.imencode(ENCODINGS[fmt], image, params)
+    return encoded.tobytes() if ok else None
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    store: AssetStore = None
+    api_key: str = ""
+    api_secret: str = ""
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, data: Dict) -> None:
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json")
+
+    def _error(self, status: int, message: str) -> None:
+        self._json(status, {"error": {"message": message}})
+
+    def _delivery_url(self, public_id: str, version: int, fmt: str) -> str:
+        return f"http://{self.headers.get('Host')}{DELIVERY_PREFIX}v{version}/{public_id}.{fmt}"
+
+    def _check_signature(self, fields: Dict[str, object]) -> Optional[str]:
+        """Error message, or None when the request is signed like Cloudinary expects"""
+        if fields.get("api_key") != self.api_key:
+            return "Invalid api_key"
+        params = {name: value for name, value in fields.items() if name not in UNSIGNED_FIELDS}
+        if api_sign_request(params, self.api_secret) != fields.get("signature"):
+            return "Invalid Signature"
+        try:
+            age = time.time() - int(fields.get("timestamp", ""))
+        except ValueError:
+            return "Missing timestamp"
+        if age > SIGNATURE_WINDOW_SECONDS:
+            return "Stale request - reported time is too old"
+        return None
+
+    def do_POST(self):
+        match = UPLOAD_PATH.match(urlsplit(self.path).path)
+        if not match:
+            self._error(404, "Not found")
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        fields = parse_form(self.headers.get("Content-Type", ""), body)
+        error = self._check_signature(fields)
+        if error:
+            self._error(401, error)
+            return
+
+        public_id = str(fields.get("public_id", ""))
+        if match.group(1) == "destroy":
+            self._json(200, {"result": "ok" if self.store.delete(public_id) else "not found"})
+            return
+
+        data = fields.get("file")
+        if not isinstance(data, bytes) or not data:
+            self._error(400, "Missing required parameter - file")
+            return
+        fmt = sniff_image_format(data)
+        allowed = str(fields.get("allowed_formats") or "jpg,jpeg,png,webp").split(",")
+        if fmt is None or fmt not in allowed:
+            self._error(400, f"Image format not allowed: {fmt}")
+            return
+
+        if not public_id:
+            public_id = os.urandom(10).hex()
+        if fields.get("folder"):
+            public_id = f"{str(fields['folder']).strip('/')}/{public_id}"
+
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            self._error(400, "Invalid image file")
+            return
+
+        self.store.put(public_id, data, fmt)
+        version = int(time.time())
+        url = self._delivery_url(public_id, version, fmt)
+        self._json(200, {
+            "public_id": public_id,
+            "version": version,
+            "format": fmt,
+            "resource_type": "image",
+            "width": image.shape[1],
+            "height": image.shape[0],
+            "bytes": len(data),
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "url": url,
+            "secure_url": url
+        })
+
+    def do_GET(self):
+        path = unquote(urlsplit(self.path).path)
+        if not path.startswith(DELIVERY_PREFIX):
+            self._error(404, "Not found")
+            return
+
+        segments = path[len(DELIVERY_PREFIX):].split("/")
+        transformations = {}
+        if segments and TRANSFORMATION.match(segments[0]) and len(segments) > 1:
+            transformations = parse_transformations(segments.pop(0))
+        if segments and VERSION.match(segments[0]) and len(segments) > 1:
+            segments.pop(0)
+        public_id = "/".join(segments)
+
+        asset = self.store.get(public_id)
+        extension = None
+        if asset is None and "." in segments[-1]:
+            public_id, extension = public_id.rsplit(".", 1)
+            asset = self.store.get(public_id)
+        if asset is None:
+            self._error(404, "Resource not found")
+            return
+
+        data, original_format = asset
+        fmt = transformations.get("f", extension or original_format)
+        fmt = original_format if fmt == "auto" else fmt
+        if fmt not in ENCODINGS:
+            self._error(400, f"Unsupported format: {fmt}")
+            return
+
+        rendered = render(data, transformations, "jpg" if fmt == "jpeg" else fmt)
+        if rendered is None:
+            self._error(500, "Failed to render image")
+            return
+        content_type = "image/jpeg" if fmt in ("jpg", "jpeg") else f"image/{fmt}"
+        self._send(200, rendered, content_type, {"Cache-Control": "public, max-age=2592000"})
+
+
+def make_server(host: str, port: int, root: str) -> ThreadingHTTPServer:
+    """Stand-in server (not started) - also used by tests in a background thread"""
+    handler = type("Handler", (StandinHandler,), {
+        "store": AssetStore(root),
+        "api_key": settings.CLOUDINARY_API_KEY,
+        "api_secret": settings.CLOUDINARY_API_SECRET
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--dir", default=None, help="Asset directory (default: a temporary directory)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    root = args.dir or tempfile.mkdtemp(prefix="cloudinary_standin_")
+    server = make_server(args.host, args.port, root)
+    logger.info(f"Cloudinary stand-in on http://{args.host}:{args.port} (assets in {root})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
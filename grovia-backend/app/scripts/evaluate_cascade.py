@@ -0,0 +1,213 @@
+"""
+Offline evaluation of the local classifier cascade
+==================================================
+Runs the local classifier over a labelled folder and reports, for a sweep
+of confidence thresholds, how many Gemini calls the cascade would save
+and what that costs in accuracy:
+
+- saved:     share of photos answered locally (no Gemini call)
+- local acc: accuracy of those local answers
+- cascade:   overall accuracy (local answers + Gemini for the rest) -
+             needs Gemini answers (--call-gemini, or a saved --gemini-results)
+
+The recommended LOCAL_CLASSIFIER_THRESHOLD is the lowest threshold whose
+local accuracy reaches --target-precision. Also reported: local latency
+and expected calibration error (ECE) of the local confidences.
+
+Dataset layout: DATA_DIR/<class>/<photo>, where <class> is a label from
+labels.json ("Early Blight"), its disease_id ("early_blight") or index.
+
+--fit-numpy fits the NumPy engine on part of the data first (--train-split)
+and evaluates it on the rest.
+
+Usage:
+    python -m app.scripts.evaluate_cascade ./dataset --model ml_models/leaf_classifier.onnx
+    python -m app.scripts.evaluate_cascade ./dataset --fit-numpy ml_models/leaf_classifier.npz
+    python -m app.scripts.evaluate_cascade ./dataset --call-gemini --gemini-results gemini.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.ml.image_input import ImageInput
+from app.ml.local_classifier import (
+    LocalClassifier,
+    disease_id_of,
+    evaluate_thresholds,
+    extract_features,
+    fit_softmax_regression,
+    load_label_details,
+    load_labels,
+)
+from app.ml.preprocessing import THUMBNAIL_LEVEL
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def normalize(name: str) -> str:
+    return name.strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def collect_samples(data_dir: str, labels: List[str], classifier_ids: Dict[str, int]) -> List[Tuple[str, int]]:
+    """(path, class index) for every photo in a class folder"""
+    samples = []
+    for folder in sorted(os.listdir(data_dir)):
+        folder_path = os.path.join(data_dir, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        key = normalize(folder)
+        if key.isdigit() and int(key) < len(labels):
+            class_index = int(key)
+        elif key in classifier_ids:
+            class_index = classifier_ids[key]
+        else:
+            print(f"Skipping folder {folder!r}: not a class of labels.json")
+            continue
+        for name in sorted(os.listdir(folder_path)):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                samples.append((os.path.join(folder_path, name), class_index))
+    return samples
+
+
+def fit_numpy_model(samples: List[Tuple[str, int]], num_classes: int, output: str) -> None:
+    features, targets = [], []
+    for path, class_index in samples:
+        thumbnail = ImageInput.from_path(path).level(THUMBNAIL_LEVEL)
+        if thumbnail is not None:
+            features.append(extract_features(thumbnail))
+            targets.append(class_index)
+    arrays = fit_softmax_regression(np.stack(features), np.array(targets), num_classes)
+    np.savez(output, **arrays)
+    print(f"NumPy model fitted on {len(features)} photos -> {output}")
+
+
+def expected_calibration_error(confidences: np.ndarray, correct: np.ndarray, bins: int = 10) -> float:
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    error = 0.0
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidences > low) & (confidences <= high)
+        if in_bin.any():
+            error += in_bin.mean() * abs(confidences[in_bin].mean() - correct[in_bin].mean())
+    return float(error)
+
+
+def gemini_answers(samples: List[Tuple[str, int]], args) -> Optional[Dict[str, str]]:
+    """disease_id answered by Gemini per photo path (loaded and/or fetched)"""
+    answers: Dict[str, str] = {}
+    if args.gemini_results and os.path.exists(args.gemini_results):
+        with open(args.gemini_results, "r", encoding="utf-8") as f:
+            answers = json.load(f)
+
+    missing = [path for path, _ in samples if path not in answers]
+    if args.call_gemini and missing:
+        from app.ml.gemini_model import get_gemini_model
+
+        print(f"Asking Gemini about {len(missing)} photos...")
+        report = asyncio.run(get_gemini_model().analyze_batch_async(missing))
+        for item in report.items:
+            if item.result:
+                answers[item.source] = item.result.get("disease_id", "unknown")
+        if args.gemini_results:
+            with open(args.gemini_results, "w", encoding="utf-8") as f:
+                json.dump(answers, f, ensure_ascii=False, indent=2)
+
+    return answers or None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_dir", help="Folder with one subfolder per class")
+    parser.add_argument("--model", default=settings.MODEL_PATH, help="Local model (.onnx / .npz)")
+    parser.add_argument("--labels", default=settings.LABELS_PATH)
+    parser.add_argument("--fit-numpy", metavar="OUTPUT.npz", help="Fit the NumPy engine first and evaluate it")
+    parser.add_argument("--train-split", type=float, default=0.7)
+    parser.add_argument("--gemini-results", help="JSON cache of Gemini answers ({path: disease_id})")
+    parser.add_argument("--call-gemini", action="store_true", help="Ask Gemini for photos not in --gemini-results")
+    parser.add_argument("--target-precision", type=float, default=0.95)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    labels = load_labels(args.labels)
+
+    details = load_label_details(args.labels)
+    disease_ids = [disease_id_of(label, details) for label in labels]
+
+    class_ids = {}
+    for index, label in enumerate(labels):
+        class_ids[normalize(label)] = index
+        class_ids[disease_ids[index]] = index
+
+    samples = collect_samples(args.data_dir, labels, class_ids)
+    if not samples:
+        raise SystemExit(f"No labelled photos found in {args.data_dir}")
+
+    if args.fit_numpy:
+        random.Random(0).shuffle(samples)
+        cut = int(len(samples) * args.train_split)
+        fit_numpy_model(samples[:cut], len(labels), args.fit_numpy)
+        samples = samples[cut:]
+        args.model = args.fit_numpy
+
+    classifier = LocalClassifier(args.model, args.labels)
+
+    confidences, local_correct, latencies, evaluated = [], [], [], []
+    for path, class_index in samples:
+        prediction = classifier.classify(path)
+        if prediction is None:
+            continue
+        confidences.append(prediction.confidence)
+        local_correct.append(prediction.class_index == class_index)
+        latencies.append(prediction.duration_ms)
+        evaluated.append((path, class_index))
+
+    confidences = np.array(confidences)
+    local_correct = np.array(local_correct, dtype=np.float32)
+
+    remote_correct = None
+    answers = gemini_answers(evaluated, args)
+    if answers:
+        remote_correct = np.array([
+            answers.get(path) == disease_ids[class_index] for path, class_index in evaluated
+        ], dtype=np.float32)
+
+    latencies.sort()
+    print("=" * 72)
+    print(f"CASCADE EVALUATION ({len(evaluated)} photos, {classifier.engine.name} engine, {classifier.model_version})")
+    print("=" * 72)
+    print(f"   Local top-1 accuracy: {local_correct.mean():.1%}")
+    print(f"   Local latency: p50 {statistics.median(latencies):.1f} ms, "
+          f"p95 {latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]:.1f} ms")
+    print(f"   Calibration error (ECE): {expected_calibration_error(confidences, local_correct):.3f}")
+    if remote_correct is not None:
+        print(f"   Gemini-only accuracy: {remote_correct.mean():.1%}")
+    print()
+    print(f"   {'threshold':>9}  {'saved':>7}  {'local acc':>9}  {'cascade':>8}")
+
+    thresholds = [round(t, 2) for t in np.arange(0.5, 1.0, 0.05)] + [0.97, 0.99]
+    rows = evaluate_thresholds(confidences, local_correct, remote_correct, thresholds)
+    recommended = None
+    for threshold, share, precision, accuracy in rows:
+        cascade = f"{accuracy:.1%}" if accuracy is not None else "n/a"
+        print(f"   {threshold:>9.2f}  {share:>7.1%}  {precision:>9.1%}  {cascade:>8}")
+        if recommended is None and share > 0 and precision >= args.target_precision:
+            recommended = (threshold, share)
+
+    print()
+    if recommended:
+        print(f"Recommended LOCAL_CLASSIFIER_THRESHOLD={recommended[0]:.2f} "
+              f"(local accuracy >= {args.target_precision:.0%}, saves {recommended[1]:.0%} of Gemini calls)")
+    else:
+        print(f"No threshold reaches {args.target_precision:.0%} local accuracy - keep CASCADE_MODE=gemini")
+
+
+if __name__ == "__main__":
+    main()
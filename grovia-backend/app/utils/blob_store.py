@@ -0,0 +1,143 @@
+"""
+Content-addressed local upload store
+====================================
+Photos kept locally (no Cloudinary, or waiting in the upload outbox) are
+stored once per content, named after their sha256 and sharded two levels
+deep so no directory grows into one huge listing:
+
+    UPLOAD_DIR/ab/cd/abcd...<64 hex>.jpg   ->   /uploads/ab/cd/abcd....jpg
+
+- writes are atomic: temp file in UPLOAD_DIR/.tmp, fsync, rename
+- identical photos share one file (dedup), so two uploads never overwrite
+  each other and the same photo is not stored twice
+- upload_blobs.ref_count counts the detection_history rows using a file;
+  it changes in the same transaction as those rows (acquire_blob /
+  release_blob), and app.workers.upload_blob_gc deletes files unreferenced
+  for longer than UPLOAD_BLOB_GC_GRACE_SECONDS
+
+Flat user_<id>_<timestamp> files written before the store existed stay
+where they are and keep being served from /uploads.
+"""
+import logging
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.crud import upload_blob as blob_crud
+from app.database import SessionLocal
+from app.models.upload_blob import blob_relative_path
+
+logger = logging.getLogger(__name__)
+
+TMP_DIR_NAME = ".tmp"
+
+
+class BlobStore:
+    """Sharded, hash-named files under one root directory"""
+
+    def __init__(self, root: str):
+        self.root = str(root)
+        self.tmp_dir = os.path.join(self.root, TMP_DIR_NAME)
+
+    def full_path(self, path: str) -> str:
+        return os.path.join(self.root, path)
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(self.full_path(path))
+
+    def write(self, path: str, data: bytes) -> bool:
+        """
+        Write a blob atomically (blocking)
+
+        Returns:
+            False if the blob was already there (nothing written)
+        """
+        full_path = self.full_path(path)
+        if os.path.exists(full_path):
+            return False
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # Readers see either no file or the whole file
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return True
+
+    def delete(self, path: str) -> bool:
+        try:
+            os.remove(self.full_path(path))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def detach(self, path: str) -> Optional[str]:
+        """
+        Move a blob out of its path into the temp directory (blocking)
+
+        Returns:
+            Temp file holding the blob, None if there was no file
+        """
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        detached = os.path.join(self.tmp_dir, f"gc-{os.path.basename(path)}")
+        try:
+            os.replace(self.full_path(path), detached)
+        except FileNotFoundError:
+            return None
+        return detached
+
+    def restore(self, detached: str, path: str) -> None:
+        """Put a detached blob back (a rewrite in the meantime has the same content)"""
+        os.replace(detached, self.full_path(path))
+
+
+def store_blob(data: bytes, content_hash: str, extension: str) -> str:
+    """
+    Store upload bytes in the blob store (blocking)
+
+    The upload_blobs row is registered before the file is written, so the
+    GC cannot remove the file before a history row references it.
+
+    Returns:
+        Blob path relative to UPLOAD_DIR
+    """
+    db = SessionLocal()
+    try:
+        path = blob_crud.register_blob(db, content_hash, blob_relative_path(content_hash, extension))
+    finally:
+        db.close()
+
+    if get_blob_store().write(path, data):
+        metrics.increment("uploads.blob_writes")
+    else:
+        metrics.increment("uploads.blob_dedup_hits")
+        logger.info(f"Upload already stored, reusing {path}")
+    return path
+
+
+# Singleton
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Get the blob store rooted at UPLOAD_DIR"""
+    global _blob_store
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = BlobStore(settings.UPLOAD_DIR)
+    return _blob_store
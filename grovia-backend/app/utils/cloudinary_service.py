@@ -4,15 +4,58 @@ Handles image uploads to Cloudinary cloud storage for production
 """
 import cloudinary
 import cloudinary.uploader
-from cloudinary.utils import cloudinary_url
-from typing import Dict, Optional
+from cloudinary.utils import api_sign_request, cloudinary_api_url, cloudinary_url
+from typing import Any, Dict, Optional
+from urllib.parse import unquote, urlsplit
+import io
 import logging
+import re
+import time
+import urllib.error
+import urllib.request
 from pathlib import Path
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Cloudinary rejects signed uploads whose timestamp is older than this
+SIGNATURE_WINDOW_SECONDS = 3600
+
+
+class DerivativeNotFoundError(Exception):
+    """Requested asset does not exist on Cloudinary (not uploaded yet)"""
+
+
+DELIVERY_PREFIX = "/image/upload/"
+# Segments of a delivery URL before the public_id: c_limit,w_480,... and v<version>
+TRANSFORMATION_SEGMENT = re.compile(r"^[a-z]{1,2}_[^/]+$")
+VERSION_SEGMENT = re.compile(r"^v\d+$")
+
+
+def public_id_from_url(url: str) -> Optional[str]:
+    """
+    public_id of a Cloudinary delivery URL (secure_url or a transformed URL)
+
+    Returns:
+        public_id, or None if `url` is not an image delivery URL
+    """
+    path = unquote(urlsplit(url).path)
+    if DELIVERY_PREFIX not in path:
+        return None
+    segments = path.split(DELIVERY_PREFIX, 1)[1].split("/")
+    versions = [i for i, segment in enumerate(segments[:-1]) if VERSION_SEGMENT.match(segment)]
+    if versions:
+        # Everything after the version is the public_id (folders may look like transformations)
+        segments = segments[versions[0] + 1:]
+    else:
+        while len(segments) > 1 and TRANSFORMATION_SEGMENT.match(segments[0]):
+            segments.pop(0)
+    # Extension = delivery format, not part of the public_id
+    segments[-1] = segments[-1].rsplit(".", 1)[0]
+    public_id = "/".join(segments)
+    return public_id or None
+
 
 class CloudinaryService:
     """Service for handling Cloudinary image uploads"""
@@ -26,15 +69,21 @@ class CloudinaryService:
                 api_secret=settings.CLOUDINARY_API_SECRET,
                 secure=True
             )
+            if settings.CLOUDINARY_STANDIN_URL:
+                # Local stand-in (app.scripts.cloudinary_standin) for API and delivery
+                cloudinary.config(upload_prefix=settings.CLOUDINARY_STANDIN_URL)
+                logger.warning(f"Cloudinary stand-in in use: {settings.CLOUDINARY_STANDIN_URL}")
             logger.debug("Cloudinary configured for production use")
         else:
             logger.debug("Using local storage (development mode)")
 
     def upload_image(
         self,
-        file_path: str,
+        file_path: Optional[str] = None,
         folder: str = "grovia/detections",
-        public_id: Optional[str] = None
+        public_id: Optional[str] = None,
+        file_bytes: Optional[bytes] = None,
+        timeout: Optional[float] = None
     ) -> Dict[str, str]:
         """
         Upload image to Cloudinary
@@ -43,6 +92,8 @@ class CloudinaryService:
             file_path: Path to local image file
             folder: Cloudinary folder name
             public_id: Optional custom public ID
+            file_bytes: Image bytes already in memory (instead of file_path)
+            timeout: HTTP timeout in seconds (None = library default)
 
         Returns:
             Dict with upload result (url, public_id, etc.)
@@ -53,13 +104,14 @@ class CloudinaryService:
         try:
             # Upload to Cloudinary
             upload_result = cloudinary.uploader.upload(
-                file_path,
+                file_path if file_path is not None else io.BytesIO(file_bytes),
                 folder=folder,
                 public_id=public_id,
                 resource_type="image",
                 overwrite=True,
                 quality="auto",  # Auto optimize quality
-                fetch_format="auto"  # Auto format (WebP when supported)
+                fetch_format="auto",  # Auto format (WebP when supported)
+                **({"timeout": timeout} if timeout is not None else {})
             )
 
             logger.info(f"Image uploaded to Cloudinary: {upload_result['public_id']}")
@@ -103,7 +155,9 @@ class CloudinaryService:
         public_id: str,
         width: Optional[int] = None,
         height: Optional[int] = None,
-        quality: str = "auto"
+        quality: str = "auto",
+        crop: Optional[str] = None,
+        fetch_format: str = "auto"
     ) -> str:
         """
         Get optimized image URL with transformations
@@ -113,23 +167,101 @@ class CloudinaryService:
             width: Target width
             height: Target height
             quality: Quality setting (auto, best, good, eco, low)
+            crop: Crop mode, e.g. "limit" (fit inside width x height, never upscale)
+            fetch_format: Delivery format (auto = WebP/AVIF when the client accepts it)
 
         Returns:
             Optimized image URL
         """
         transformations = {
             "quality": quality,
-            "fetch_format": "auto"
+            "fetch_format": fetch_format
         }
 
         if width:
             transformations["width"] = width
         if height:
             transformations["height"] = height
+        if crop:
+            transformations["crop"] = crop
 
-        url, _ = cloudinary_url(public_id, **transformations)
+        url, _ = cloudinary_url(public_id, **transformations, **self._delivery_options())
         return url
 
+    def _delivery_options(self) -> Dict[str, Any]:
+        if not settings.CLOUDINARY_STANDIN_URL:
+            return {}
+        # http://<stand-in host>/image/upload/... instead of res.cloudinary.com
+        return {"secure": False, "cname": urlsplit(settings.CLOUDINARY_STANDIN_URL).netloc, "private_cdn": True}
+
+    def sign_upload(self, folder: str, public_id: str, ttl_seconds: int) -> Dict[str, Any]:
+        """
+        Signed parameters for a direct (browser -> Cloudinary) upload
+
+        The client posts them with the file to `upload_url`. Everything that
+        matters is signed (folder, public_id, allowed formats), so the upload
+        can only create this one asset. Cloudinary accepts a signature for
+        an hour after its timestamp; the timestamp is backdated so the
+        signature expires after `ttl_seconds` instead.
+
+        Returns:
+            Dict with upload_url, params (form fields) and expires_at (unix time)
+        """
+        if not settings.USE_CLOUDINARY:
+            raise ValueError("Cloudinary is not enabled. Set USE_CLOUDINARY=true in .env")
+
+        ttl_seconds = max(60, min(ttl_seconds, SIGNATURE_WINDOW_SECONDS))
+        now = int(time.time())
+        timestamp = now - (SIGNATURE_WINDOW_SECONDS - ttl_seconds)
+
+        params = {
+            "timestamp": timestamp,
+            "folder": folder,
+            "public_id": public_id,
+            "allowed_formats": "jpg,jpeg,png,webp"
+        }
+        params["signature"] = api_sign_request(params, settings.CLOUDINARY_API_SECRET)
+        params["api_key"] = settings.CLOUDINARY_API_KEY
+
+        return {
+            "upload_url": cloudinary_api_url("upload", resource_type="image"),
+            "params": params,
+            "expires_at": now + ttl_seconds
+        }
+
+    def fetch_derivative(self, public_id: str, max_side: int, max_bytes: int, timeout: Optional[float] = None) -> bytes:
+        """
+        Download a JPEG of an uploaded image, resized by Cloudinary to fit max_side
+
+        Args:
+            public_id: Full Cloudinary public ID (with folder)
+            max_side: Longest side of the derivative (never upscaled)
+            max_bytes: Refuse larger responses
+            timeout: HTTP timeout in seconds
+
+        Returns:
+            Image bytes
+
+        Raises:
+            DerivativeNotFoundError: No such asset (yet)
+        """
+        url = self.get_optimized_url(
+            public_id, width=max_side, height=max_side, crop="limit", fetch_format="jpg"
+        )
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                data = response.read(max_bytes + 1)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise DerivativeNotFoundError(public_id) from e
+            raise Exception(f"Failed to fetch image from Cloudinary: HTTP {e.code}") from e
+
+        if len(data) > max_bytes:
+            raise Exception(f"Cloudinary derivative larger than {max_bytes} bytes")
+
+        logger.debug(f"Fetched Cloudinary derivative {public_id} ({len(data)} bytes)")
+        return data
+
 
 # Global instance
 _cloudinary_service = None
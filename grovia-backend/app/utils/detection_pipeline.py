@@ -0,0 +1,544 @@
+"""
+Detection pipeline stages shared by the detection endpoints
+===========================================================
+Every detection endpoint runs the same stages; /detect/stream also reports
+progress between them. Every blocking call is dispatched to the CPU or
+I/O executor.
+
+Stages:
+1. lookup_cached         - exact content-hash cache hit?
+2. validate_leaf         - OpenCV leaf check (no API quota)
+3. lookup_near_duplicate - perceptual-hash reuse of a confident diagnosis
+4. (model call)          - Gemini (predict_async, or predict_stream for
+                           /detect/stream), or a model call of the caller
+5. remember_prediction   - store in result cache + phash index
+6. store_image           - Cloudinary, or the local blob store as fallback;
+                           with the upload outbox always the blob store
+                           (Cloudinary later)
+7. build_detection_data / save_history(ies) - response + detection_history
+                           rows (+ blob references and image_upload_outbox
+                           rows, same transaction)
+
+detection_stages runs stages 1-5 as an async generator of progress events
+(/detect/stream turns them into Server-Sent Events); detect_upload runs
+them in one call for everything else (/detect, /detect-batch,
+/detect-cloud, the detection job worker).
+
+Direct uploads (/detect-cloud) replace stage 6: the client uploads the
+photo to Cloudinary itself with signed parameters (make_direct_upload_id),
+and fetch_direct_upload downloads a resized derivative for stages 1-5.
+"""
+import logging
+import os
+import re
+import secrets
+import time
+from datetime import datetime, timezone, tzinfo
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.core.exceptions import DetectionError, GroviaException
+from app.core.executors import run_cpu, run_io
+from app.core.metrics import metrics
+from app.crud import detection as detection_crud
+from app.crud import image_upload_outbox as outbox_crud
+from app.crud import upload_blob as blob_crud
+from app.ml.cascade import ENGINE_LOCAL_FALLBACK, get_detection_model
+from app.ml.image_input import ImageInput
+from app.ml.leaf_validator import get_leaf_validator
+from app.ml.perceptual_hash import dhash, get_phash_index, hash_to_hex
+from app.ml.preprocessing import PYRAMID_LEVELS, THUMBNAIL_LEVEL
+from app.ml.result_cache import get_result_cache, make_cache_key
+from app.models.upload_blob import blob_hash, blob_path_of
+from app.utils.blob_store import store_blob
+from app.utils.cloudinary_service import DerivativeNotFoundError, get_cloudinary_service
+from app.utils.image_derivatives import write_derivatives
+from app.workers.upload_outbox_worker import local_image_url, notify_new_upload, outbox_enabled
+
+logger = logging.getLogger(__name__)
+
+# Cloudinary folder of detection photos
+CLOUDINARY_DETECTIONS_FOLDER = "grovia/detections"
+
+# Shown to the user when the photo is not a leaf
+LEAF_REJECTED_DETAIL = "Pastikan Anda mengupload foto daun tanaman"
+
+
+class LeafRejectedError(GroviaException):
+    """Photo failed leaf validation (not worth retrying)"""
+
+    def __init__(self, details=None):
+        super().__init__(
+            message=LEAF_REJECTED_DETAIL,
+            status_code=400,
+            error_code="NOT_A_LEAF",
+            details=details
+        )
+
+
+def make_upload_filename(user_id: int, original_filename: str, timestamp: str) -> str:
+    """user_<id>_<timestamp><ext> - also used as the Cloudinary public_id (without ext)"""
+    file_extension = os.path.splitext(original_filename or "")[1]
+    return f"user_{user_id}_{timestamp}{file_extension}"
+
+
+def make_direct_upload_id(user_id: int, timestamp: str) -> str:
+    """user_<id>_<timestamp>_<nonce> - public_id (without folder) of a direct upload"""
+    return f"user_{user_id}_{timestamp}_{secrets.token_hex(4)}"
+
+
+def owns_direct_upload(user_id: int, public_id: str) -> bool:
+    """public_id is a direct upload issued to this user (folder included)"""
+    pattern = rf"{re.escape(CLOUDINARY_DETECTIONS_FOLDER)}/user_{user_id}_[0-9A-Za-z_]+"
+    return re.fullmatch(pattern, public_id) is not None
+
+
+async def fetch_direct_upload(public_id: str, timeout: Optional[float] = None) -> Optional[ImageInput]:
+    """
+    Download a direct upload as a Cloudinary derivative just large enough
+    for the pyramid and the Gemini payload (instead of the original photo)
+
+    Returns:
+        ImageInput of the derivative, or None if nothing was uploaded under public_id
+    """
+    max_side = max(max(PYRAMID_LEVELS), settings.GEMINI_IMAGE_MAX_SIDE)
+    fetch_timeout = settings.CLOUDINARY_FETCH_TIMEOUT_SECONDS
+    if timeout is not None:
+        fetch_timeout = min(fetch_timeout, timeout)
+
+    try:
+        data = await run_io(
+            get_cloudinary_service().fetch_derivative,
+            public_id,
+            max_side,
+            settings.MAX_IMAGE_SIZE,
+            fetch_timeout
+        )
+    except DerivativeNotFoundError:
+        return None
+
+    metrics.increment("uploads.direct_fetched")
+    metrics.increment("uploads.direct_fetched_bytes", len(data))
+    return ImageInput(data, filename=f"{public_id.rsplit('/', 1)[-1]}.jpg")
+
+
+async def lookup_cached(upload: ImageInput, model_version: str, db: Session) -> Tuple[Optional[Dict], str]:
+    """
+    Stage 1: exact cache lookup
+
+    Returns:
+        (cached prediction or None, cache key for this upload)
+    """
+    cache_key = make_cache_key(upload.content_hash, model_version)
+    if not settings.DETECTION_CACHE_ENABLED:
+        return None, cache_key
+
+    prediction = await run_io(get_result_cache().get, cache_key, db)
+    if prediction:
+        logger.info(f"[CACHE] Detection cache hit: {prediction.get('disease_name', 'Unknown')}")
+    return prediction, cache_key
+
+
+async def validate_leaf(upload: ImageInput) -> Dict:
+    """Stage 2: OpenCV leaf validation on the shared pyramid (result dict of LeafImageValidator)"""
+    logger.info("Validating if image is a leaf (OpenCV)...")
+    leaf_validator = get_leaf_validator()
+
+    # Exact or fast mode (LEAF_VALIDATOR_MODE), both on the shared pyramid
+    validation_result = await run_cpu(leaf_validator.validate, upload)
+
+    if validation_result.get("is_valid", False):
+        logger.info(f"[SUCCESS] Image validated as leaf (confidence: {validation_result.get('confidence')}%)")
+    else:
+        logger.warning(f"Invalid image rejected: {validation_result.get('detected_content')}")
+    return validation_result
+
+
+async def lookup_near_duplicate(upload: ImageInput, db: Session) -> Tuple[Optional[Dict], Optional[int]]:
+    """
+    Stage 3: reuse the diagnosis of a near-duplicate photo
+
+    Returns:
+        (reused prediction or None, dHash of the upload or None if disabled)
+    """
+    if not (settings.DETECTION_CACHE_ENABLED and settings.PHASH_REUSE_ENABLED):
+        return None, None
+
+    phash = await run_cpu(dhash, upload.level(THUMBNAIL_LEVEL))
+    index = get_phash_index()
+    # Closest first; a match whose result is no longer cached is dropped and
+    # the next one tried
+    for match in index.search(phash, max_distance=settings.PHASH_MAX_DISTANCE):
+        if match.confidence < settings.PHASH_MIN_CONFIDENCE:
+            continue
+        prediction = await run_io(get_result_cache().get, match.key, db)
+        if prediction:
+            metrics.increment("phash.reuse_hits")
+            logger.info(
+                f"[CACHE] Near-duplicate reuse (distance {match.distance}): "
+                f"{prediction.get('disease_name', 'Unknown')}"
+            )
+            return prediction, phash
+        index.remove(match.key)
+        metrics.increment("phash.stale_matches")
+    return None, phash
+
+
+async def remember_prediction(
+    cache_key: str,
+    model_version: str,
+    prediction: Dict,
+    phash: Optional[int],
+    db: Session
+) -> None:
+    """Stage 5: store a fresh model prediction in the result cache and phash index"""
+    if not settings.DETECTION_CACHE_ENABLED:
+        return
+    if prediction.get("engine") == ENGINE_LOCAL_FALLBACK:
+        # Stand-in while Gemini was unavailable - ask again next time
+        return
+
+    await run_io(
+        get_result_cache().put,
+        cache_key,
+        model_version,
+        prediction,
+        db,
+        phash=hash_to_hex(phash) if phash is not None else None
+    )
+    if phash is not None and float(prediction.get("confidence", 0)) >= settings.PHASH_MIN_CONFIDENCE:
+        get_phash_index().add(
+            cache_key,
+            phash,
+            float(prediction["confidence"]),
+            expires_at=time.time() + settings.DETECTION_CACHE_TTL_SECONDS
+        )
+
+
+async def detection_stages(
+    upload: ImageInput,
+    db: Session,
+    deadline: Deadline,
+    predict: Optional[Callable[[ImageInput], Awaitable[Optional[Dict]]]] = None,
+    stream: bool = False
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Stages 1-5 as progress events: cached diagnosis, or leaf validation +
+    model call. Events, in order:
+
+    - validation:    {is_valid, confidence, cached}
+    - cache_hit:     {source: exact | near_duplicate}, or
+    - model_started: {model_version}, followed by
+    - partial:       {field, value} per diagnosis field (only with `stream`)
+    - prediction:    the prediction dict - always the last event
+
+    Args:
+        db: Session for the cache stages (not shared with concurrent callers)
+        predict: Model call (default: Gemini predict_async within `deadline`)
+        stream: Stream the Gemini call (predict_stream) instead
+
+    Raises:
+        LeafRejectedError: Photo is not a leaf (after the validation event)
+        DetectionError: Model returned no prediction
+        DeadlineExceededError: `deadline` ran out
+    """
+    ml_model = get_detection_model()
+    prediction, cache_key = await deadline.run(lookup_cached(upload, ml_model.model_version, db), "cache")
+    if prediction:
+        yield "validation", {"is_valid": True, "confidence": None, "cached": True}
+        yield "cache_hit", {"source": "exact"}
+        yield "prediction", prediction
+        return
+
+    validation_result = await deadline.run(validate_leaf(upload), "validation")
+    is_valid = validation_result.get("is_valid", False)
+    yield "validation", {"is_valid": is_valid, "confidence": validation_result.get("confidence"), "cached": False}
+    if not is_valid:
+        raise LeafRejectedError(details=validation_result.get("detected_content"))
+
+    prediction, phash = await deadline.run(lookup_near_duplicate(upload, db), "cache")
+    if prediction:
+        yield "cache_hit", {"source": "near_duplicate"}
+        yield "prediction", prediction
+        return
+
+    yield "model_started", {"model_version": ml_model.model_version}
+    if predict is not None:
+        prediction = await predict(upload)
+    elif stream:
+        async for kind, payload in ml_model.predict_stream(upload, deadline=deadline):
+            if kind == "field":
+                field, value = payload
+                yield "partial", {"field": field, "value": value}
+            else:
+                prediction = payload
+    else:
+        prediction = await ml_model.predict_async(upload, deadline=deadline)
+    if not prediction:
+        raise DetectionError("Failed to detect disease - model returned no prediction")
+
+    await remember_prediction(cache_key, ml_model.model_version, prediction, phash, db)
+    yield "prediction", prediction
+
+
+async def detect_upload(
+    upload: ImageInput,
+    db: Session,
+    deadline: Deadline,
+    predict: Optional[Callable[[ImageInput], Awaitable[Optional[Dict]]]] = None
+) -> Dict:
+    """
+    Stages 1-5 without the progress events (see detection_stages)
+
+    Returns:
+        Prediction dict
+
+    Raises:
+        LeafRejectedError: Photo is not a leaf
+        DetectionError: Model returned no prediction
+        DeadlineExceededError: `deadline` ran out
+    """
+    async for event, payload in detection_stages(upload, db, deadline, predict=predict):
+        if event == "prediction":
+            return payload
+    raise DetectionError("Failed to detect disease - model returned no prediction")
+
+
+async def store_image(upload: ImageInput, filename: str, timeout: Optional[float] = None) -> Tuple[str, Optional[str]]:
+    """
+    Stage 6: upload to Cloudinary (if enabled), falling back to the local
+    blob store (app.utils.blob_store)
+
+    With the upload outbox the photo always goes to the blob store here;
+    add_history queues the Cloudinary upload for after the response.
+
+    Args:
+        timeout: Upper bound for the Cloudinary request (seconds)
+
+    Returns:
+        (image_url, cloudinary public_id or None when stored locally)
+    """
+    image_url = None
+    cloudinary_public_id = None
+
+    upload_timeout = settings.CLOUDINARY_UPLOAD_TIMEOUT_SECONDS
+    if timeout is not None:
+        upload_timeout = min(upload_timeout, timeout)
+
+    if settings.USE_CLOUDINARY and not outbox_enabled():
+        try:
+            logger.debug("Uploading image to Cloudinary...")
+            cloudinary = get_cloudinary_service()
+            upload_result = await run_io(
+                cloudinary.upload_image,
+                folder=CLOUDINARY_DETECTIONS_FOLDER,
+                public_id=os.path.splitext(filename)[0],
+                file_bytes=upload.data,
+                timeout=upload_timeout
+            )
+            image_url = upload_result["url"]
+            cloudinary_public_id = upload_result["public_id"]
+            logger.info(f"[SUCCESS] Image uploaded to Cloudinary: {image_url}")
+        except Exception as e:
+            logger.warning(f"Cloudinary upload failed, using local storage: {e}")
+            # Fallback to local storage if cloud upload fails
+
+    if cloudinary_public_id is None:
+        # Local storage is the final destination - one file per distinct photo
+        blob_path = await run_io(store_blob, upload.data, upload.content_hash, os.path.splitext(filename)[1])
+        image_url = f"/uploads/{blob_path}"
+        logger.info(f"Image stored locally: {blob_path}")
+
+        # History thumbnails from the pyramid already decoded; photos going
+        # to Cloudinary through the outbox get theirs from the CDN instead
+        if settings.IMAGE_DERIVATIVES_AT_INGEST and not (settings.USE_CLOUDINARY and outbox_enabled()):
+            try:
+                await run_cpu(write_derivatives, upload, blob_path)
+            except Exception as e:
+                logger.warning(f"Derivatives not written, rendered on first request instead: {e}")
+
+    return image_url, cloudinary_public_id
+
+
+def format_prediction(prediction: Dict) -> Dict:
+    """Round confidence (0-1, 4 decimals) and confidence_percent (2 decimals) in place"""
+    # Ensure confidence is properly formatted (0-1 range)
+    if "confidence" in prediction:
+        prediction["confidence"] = round(float(prediction["confidence"]), 4)
+
+    # Add confidence_percent with max 2 decimal places (clean display)
+    if "confidence_percent" not in prediction and "confidence" in prediction:
+        prediction["confidence_percent"] = round(prediction["confidence"] * 100, 2)
+    else:
+        # If confidence_percent already exists, ensure it's rounded to 2 decimals
+        prediction["confidence_percent"] = round(float(prediction["confidence_percent"]), 2)
+
+    logger.info(f"Prediction: {prediction['disease_name']} ({prediction['confidence_percent']}%)")
+    return prediction
+
+
+def build_detection_data(prediction: Dict, image_url: str, detected_at: datetime) -> Dict:
+    """`data` object of the detection response (detection_id filled in by save_history)"""
+    return {
+        "detection_id": None,  # Will be updated if history saved
+        "disease_id": prediction["disease_id"],
+        "disease_name": prediction["disease_name"],
+        "scientific_name": prediction.get("scientific_name", ""),
+        "confidence": prediction["confidence"],
+        "confidence_percent": prediction["confidence_percent"],
+        "is_healthy": prediction.get("is_healthy", False),
+        "image_url": image_url,
+        "description": prediction.get("analysis_notes", ""),
+        "symptoms": prediction.get("symptoms", []),
+        "recommendations": prediction.get("recommendations", []),
+        "all_predictions": prediction.get("all_predictions", []),
+        "detected_at": detected_at.isoformat(),
+        # Gemini token counts for this request (null when served from cache)
+        "token_usage": prediction.get("token_usage"),
+        # Which engine answered: gemini | local | local_fallback
+        "engine": prediction.get("engine", "gemini")
+    }
+
+
+def commit_histories(db: Session, user_id: int, entries: List[Tuple[Dict, str, str]]) -> List:
+    """
+    add_history for every (prediction, image_url, filename), then commit
+    and refresh the rows in one transaction (blocking, run on the I/O executor)
+
+    Returns:
+        The committed detection_history rows, in entry order
+    """
+    histories = [
+        add_history(db, user_id, prediction, image_url, filename)
+        for prediction, image_url, filename in entries
+    ]
+    db.commit()
+    for history in histories:
+        db.refresh(history)
+    return histories
+
+
+def add_history(db: Session, user_id: int, prediction: Dict, image_url: str, filename: str):
+    """
+    Add a pending detection_history row for a prediction, with a reference
+    to its local blob and its pending Cloudinary upload when the photo is
+    still only stored locally and the upload outbox is enabled
+
+    Blocking (SQL for the blob reference and the outbox entry): run it on
+    the I/O executor, in the same call that commits the row.
+
+    Args:
+        image_url: From store_image (CDN URL or /uploads/<blob path>)
+        filename: Upload name (user_<id>_<timestamp><ext>), the Cloudinary public_id
+    """
+    # Store the appropriate path based on storage type
+    stored_in_cloud = image_url.startswith(("http://", "https://"))
+    local_path = None if stored_in_cloud else (blob_path_of(image_url) or filename)
+    stored_image_path = image_url if stored_in_cloud else local_image_url(local_path)
+
+    history = detection_crud.create_detection_history(
+        db=db,
+        user_id=user_id,
+        disease_id=prediction["disease_id"],
+        disease_name=prediction["disease_name"],
+        scientific_name=prediction.get("scientific_name", ""),
+        confidence=prediction["confidence"],
+        image_url=stored_image_path,
+        description=prediction.get("analysis_notes", ""),
+        symptoms=None
+    )
+    if not stored_in_cloud and blob_path_of(image_url):
+        blob_crud.acquire_blob(db, blob_hash(local_path), local_path)
+    if not stored_in_cloud and outbox_enabled():
+        outbox_crud.enqueue_upload(
+            db,
+            history,
+            filename=local_path,
+            folder=CLOUDINARY_DETECTIONS_FOLDER,
+            public_id=os.path.splitext(filename)[0],
+            max_attempts=settings.CLOUDINARY_OUTBOX_MAX_ATTEMPTS
+        )
+    return history
+
+
+def _fill_history_fields(history, local_tz: tzinfo, data: Dict) -> None:
+    """Put detection_id and detected_at (user's timezone) of a saved row into `data`"""
+    data["detection_id"] = history.id
+    if hasattr(history, "detected_at") and history.detected_at is not None:
+        try:
+            # Convert UTC to local timezone
+            utc_time = history.detected_at.replace(tzinfo=timezone.utc)
+            data["detected_at"] = utc_time.astimezone(local_tz).isoformat()
+        except Exception as e:
+            logger.warning(f"Timezone conversion error: {e}")
+            # fallback to UTC string
+            data["detected_at"] = history.detected_at.replace(tzinfo=timezone.utc).isoformat()
+
+
+async def save_history(
+    db: Session,
+    user_id: int,
+    prediction: Dict,
+    image_url: str,
+    filename: str,
+    local_tz: tzinfo,
+    data: Dict
+) -> None:
+    """
+    Stage 7: write the detection_history row and fill detection_id /
+    detected_at (user's timezone) into `data`. Failures are logged and
+    rolled back - the detection itself is still returned.
+    """
+    try:
+        # Add and commit to database
+        history, = await run_io(commit_histories, db, user_id, [(prediction, image_url, filename)])
+        notify_new_upload()
+
+        _fill_history_fields(history, local_tz, data)
+        logger.info(f"[SUCCESS] History saved: ID {history.id}")
+    except Exception as e:
+        logger.error(f"Failed to save history: {e}")
+        await run_io(db.rollback)
+        # Don't fail the whole request if history saving fails; the stored
+        # blob stays unreferenced and the blob GC deletes it after the grace period
+
+
+async def save_histories(
+    db: Session,
+    user_id: int,
+    entries: List[Tuple[Dict, str, str, Dict]],
+    local_tz: tzinfo
+) -> bool:
+    """
+    Stage 7 for a batch: write every detection_history row in one transaction
+
+    Args:
+        entries: (prediction, image_url, filename, data) per detection;
+            detection_id / detected_at are filled into each `data`
+
+    Returns:
+        True if the transaction was committed (all rows or none)
+    """
+    if not entries:
+        return True
+
+    try:
+        histories = await run_io(
+            commit_histories,
+            db,
+            user_id,
+            [(prediction, image_url, filename) for prediction, image_url, filename, _ in entries]
+        )
+        notify_new_upload()
+
+        for history, (_, _, _, data) in zip(histories, entries):
+            _fill_history_fields(history, local_tz, data)
+        logger.info(f"[SUCCESS] {len(histories)} history rows saved in one transaction")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save batch history: {e}")
+        await run_io(db.rollback)
+        return False
@@ -0,0 +1,180 @@
+"""
+Image derivatives
+=================
+History lists only need thumbnails, not the full-resolution original of
+every photo. Each photo gets WebP variants at IMAGE_DERIVATIVE_WIDTHS
+(longest side, never upscaled):
+
+- Cloudinary photos: transformed delivery URLs from
+  CloudinaryService.get_optimized_url (rendered and cached by the CDN)
+- local photos: files next to the blob store, rendered once and cached
+
+      UPLOAD_DIR/ab/cd/<sha256>.jpg
+      UPLOAD_DIR/derivatives/160/ab/cd/<sha256>.webp   ->   /uploads/derivatives/160/ab/cd/<sha256>.webp
+
+  written at ingest from the already decoded pyramid when local storage is
+  final (IMAGE_DERIVATIVES_AT_INGEST), otherwise rendered on the first
+  request (app/api/uploads.py). The blob GC deletes them with their blob.
+
+image_variants() turns a detection_history.image_url into the
+thumbnail_url / srcset returned by the history endpoints.
+"""
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.ml.image_input import ImageInput
+from app.ml.preprocessing import ImageEncoding, encode_image, to_rgb_pil
+from app.models.upload_blob import BLOB_PATH
+from app.utils.blob_store import get_blob_store
+from app.utils.cloudinary_service import get_cloudinary_service, public_id_from_url
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "derivatives"
+DERIVATIVE_EXTENSION = ".webp"
+# Flat user_<id>_<timestamp>.<ext> files stored before the blob store
+FLAT_UPLOAD = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+# derivatives/<width>/ab/cd/<sha256>.webp - derivative of a blob
+BLOB_DERIVATIVE_PATH = re.compile(r"^derivatives/(\d+)/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.webp$")
+
+
+def derivative_widths() -> List[int]:
+    return sorted(set(settings.IMAGE_DERIVATIVE_WIDTHS))
+
+
+def is_local_source(path: str) -> bool:
+    """True for a photo path inside UPLOAD_DIR (blob path or flat file name)"""
+    if BLOB_PATH.match(path):
+        return True
+    return bool(FLAT_UPLOAD.match(path)) and os.path.splitext(path)[1].lower() in settings.ALLOWED_EXTENSIONS
+
+
+def derivative_path(source_path: str, width: int) -> str:
+    """derivatives/<width>/<source path without extension>.webp (relative to UPLOAD_DIR)"""
+    return f"{DERIVATIVES_DIR}/{width}/{os.path.splitext(source_path)[0]}{DERIVATIVE_EXTENSION}"
+
+
+def source_of_derivative(stem: str) -> Optional[str]:
+    """
+    Photo a derivative is rendered from, given its path without width and
+    extension (ab/cd/<sha256> or a flat file stem)
+
+    Returns:
+        Source path relative to UPLOAD_DIR, or None if there is no such photo
+    """
+    store = get_blob_store()
+    for extension in settings.ALLOWED_EXTENSIONS:
+        path = stem + extension
+        if is_local_source(path) and store.exists(path):
+            return path
+    return None
+
+
+def render_derivative(upload: ImageInput, width: int) -> Optional[bytes]:
+    """WebP bytes of `upload` scaled to `width` on its longest side (None if not decodable)"""
+    image = upload.level(width)
+    if image is None:
+        return None
+    encoding = ImageEncoding(max_side=width, format="webp", quality=settings.IMAGE_DERIVATIVE_QUALITY)
+    return encode_image(to_rgb_pil(image), encoding)
+
+
+def write_derivatives(upload: ImageInput, source_path: str) -> int:
+    """
+    Write every missing derivative of a stored photo (blocking)
+
+    Uses the pyramid the detection already decoded, so this is only a
+    small resize and a WebP encode per width.
+
+    Returns:
+        Number of derivatives written
+    """
+    store = get_blob_store()
+    written = 0
+    for width in derivative_widths():
+        path = derivative_path(source_path, width)
+        if store.exists(path):
+            continue
+        data = render_derivative(upload, width)
+        if data is not None and store.write(path, data):
+            written += 1
+    if written:
+        metrics.increment("uploads.derivatives_written", written)
+    return written
+
+
+def ensure_derivative(source_path: str, width: int) -> Optional[str]:
+    """
+    Full path of a derivative, rendered from its photo if not cached yet (blocking)
+
+    Returns:
+        File path, or None if the photo cannot be decoded
+    """
+    store = get_blob_store()
+    path = derivative_path(source_path, width)
+    if store.exists(path):
+        return store.full_path(path)
+
+    # Reduced JPEG decode: nothing larger than the widest derivative is needed
+    upload = ImageInput.from_path(store.full_path(source_path), min_side=max(derivative_widths()))
+    data = render_derivative(upload, width)
+    if data is None:
+        logger.warning(f"Cannot render derivative of {source_path}: not a decodable image")
+        return None
+    store.write(path, data)
+    metrics.increment("uploads.derivatives_rendered")
+    return store.full_path(path)
+
+
+def delete_derivatives(source_path: str) -> int:
+    """Remove the cached derivatives of a local photo (blocking)"""
+    store = get_blob_store()
+    return sum(1 for width in derivative_widths() if store.delete(derivative_path(source_path, width)))
+
+
+def _variant_urls(image_url: str) -> List[Tuple[int, str]]:
+    """(width, URL) per derivative of a detection_history.image_url, [] if there are none"""
+    if image_url.startswith("http://") or image_url.startswith("https://"):
+        public_id = public_id_from_url(image_url)
+        if public_id is None:
+            return []
+        cloudinary = get_cloudinary_service()
+        try:
+            return [
+                (width, cloudinary.get_optimized_url(public_id, width=width, crop="limit", fetch_format="webp"))
+                for width in derivative_widths()
+            ]
+        except Exception as e:
+            # e.g. Cloudinary no longer configured for an old history row
+            logger.debug(f"No Cloudinary variants for {image_url}: {e}")
+            return []
+
+    source_path = image_url.replace("\\", "/")
+    for prefix in ("/uploads/", "uploads/"):
+        if source_path.startswith(prefix):
+            source_path = source_path[len(prefix):]
+            break
+    if not is_local_source(source_path):
+        return []
+    return [(width, f"uploads/{derivative_path(source_path, width)}") for width in derivative_widths()]
+
+
+def image_variants(image_url: str) -> Dict[str, object]:
+    """
+    Thumbnail and srcset-style variants of a detection_history.image_url
+
+    Local variants are returned as uploads/... paths, like image_url itself.
+
+    Returns:
+        {"thumbnail_url": smallest variant (image_url if none),
+         "variants": [{"width", "url"}, ...]}
+    """
+    variants = [{"width": width, "url": url} for width, url in _variant_urls(image_url)]
+    return {
+        "thumbnail_url": variants[0]["url"] if variants else image_url,
+        "variants": variants
+    }
@@ -0,0 +1,205 @@
+"""
+Upload ingestion
+================
+Caps and checks image uploads while they stream in, instead of after the
+whole body sits in a spooled temp file:
+
+1. UploadSizeLimitMiddleware - multipart requests with a Content-Length
+   over the limit get 413 before any parsing; bodies without one (chunked)
+   are counted as they arrive and cut off at the limit, so the rest is
+   never read, parsed or spooled to disk
+2. check_upload - format sniffed from the first bytes (magic numbers, not
+   the extension or the client's content_type), size as counted by the
+   multipart parser
+3. read_upload - chunked read into an ImageInput, hashed in the same pass
+   and aborted at MAX_UPLOAD_SIZE
+"""
+import json
+import logging
+import os
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.ml.image_input import ImageInput, ImageTooLargeError
+
+logger = logging.getLogger(__name__)
+
+INVALID_IMAGE_DETAIL = "Pastikan Anda mengupload foto daun tanaman"
+
+# Bytes needed to tell the formats apart (RIFF....WEBP)
+SNIFF_BYTES = 12
+FORMAT_MIME_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+FORMAT_EXTENSIONS = {"jpg": ".jpg", "png": ".png", "webp": ".webp"}
+
+# Multipart boundaries, part headers and small form fields on top of the files
+MULTIPART_OVERHEAD = 64 * 1024
+BATCH_UPLOAD_PATH = f"{settings.API_V1_PREFIX}/detection/detect-batch"
+
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """jpg / png / webp from the first bytes of a file, None for anything else"""
+    if head[:3] == b"\xff\xd8\xff":
+        return "jpg"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def too_large_detail(max_size: int) -> str:
+    return f"Ukuran file terlalu besar. Maksimal {max_size / (1024 * 1024)}MB"
+
+
+def _reject_too_large(max_size: int) -> HTTPException:
+    metrics.increment("uploads.rejected_too_large")
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=too_large_detail(max_size))
+
+
+def check_upload(file: UploadFile) -> str:
+    """
+    Cheap checks on a parsed upload: size and sniffed format
+
+    file.filename gets the extension of the sniffed format, so a stored
+    file is named after what it contains.
+
+    Returns:
+        Sniffed format (jpg / png / webp)
+
+    Raises:
+        HTTPException: too large, or not an allowed image format
+    """
+    if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+        raise _reject_too_large(settings.MAX_UPLOAD_SIZE)
+
+    head = file.file.read(SNIFF_BYTES)
+    file.file.seek(0)
+
+    image_format = sniff_image_format(head)
+    if image_format is None or FORMAT_MIME_TYPES[image_format] not in settings.ALLOWED_IMAGE_TYPES:
+        metrics.increment("uploads.rejected_format")
+        logger.warning(f"Upload rejected: not an allowed image ({file.filename!r}, {file.content_type!r})")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=INVALID_IMAGE_DETAIL)
+
+    stem = os.path.splitext(os.path.basename(file.filename or ""))[0] or "image"
+    file.filename = stem + FORMAT_EXTENSIONS[image_format]
+    return image_format
+
+
+def read_upload(file: UploadFile, min_side: Optional[int] = None) -> ImageInput:
+    """
+    Read a checked upload into an ImageInput, hashed in the same pass (blocking)
+
+    Raises:
+        HTTPException: more than MAX_UPLOAD_SIZE (reading stops right there)
+    """
+    try:
+        return ImageInput.from_file(
+            file.file, file.filename, min_side=min_side, max_bytes=settings.MAX_UPLOAD_SIZE
+        )
+    except ImageTooLargeError as e:
+        raise _reject_too_large(e.max_bytes)
+
+
+def request_body_limit(path: str) -> int:
+    """Largest multipart body accepted for a path"""
+    per_file = settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+    if path.rstrip("/") == BATCH_UPLOAD_PATH:
+        return per_file * settings.MAX_BATCH_IMAGES
+    return per_file
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Pure ASGI middleware capping multipart request bodies (see module docstring)
+
+    Runs inside CORSMiddleware, so the 413 still carries CORS headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+
+        limit = request_body_limit(scope["path"])
+        content_length = self._content_length(scope)
+        if content_length is not None and content_length > limit:
+            metrics.increment("uploads.rejected_too_large")
+            logger.warning(f"Upload rejected before parsing: Content-Length {content_length} > {limit}")
+            await self._send_too_large(send)
+            return
+
+        received = 0
+        cut_off = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, cut_off
+            if cut_off:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    cut_off = True
+                    metrics.increment("uploads.rejected_too_large")
+                    logger.warning(f"Upload cut off after {received} bytes (limit {limit})")
+                    if not response_started:
+                        await self._send_too_large(send)
+                    # The app sees a client that went away and stops parsing
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if cut_off:
+                # 413 already sent - drop whatever the app answers
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not cut_off:
+                raise
+            # ClientDisconnect (or a parse error) caused by the cut-off
+
+    @staticmethod
+    def _is_multipart(scope) -> bool:
+        for name, value in scope.get("headers", ()):
+            if name == b"content-type":
+                return value.lower().startswith(b"multipart/form-data")
+        return False
+
+    @staticmethod
+    def _content_length(scope) -> Optional[int]:
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    @staticmethod
+    async def _send_too_large(send) -> None:
+        body = json.dumps({"detail": too_large_detail(settings.MAX_UPLOAD_SIZE)}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                # The rest of the body is not read - do not reuse the connection
+                (b"connection", b"close"),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
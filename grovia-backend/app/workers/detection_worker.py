@@ -0,0 +1,178 @@
+"""
+Detection job worker
+====================
+Consumes the detection_jobs queue filled by POST /detection/jobs:
+
+1. claim runnable jobs with a lease (crud.detection_job.claim_jobs)
+2. run the /detect pipeline on the stored image within the NF06 deadline
+3. complete the job and write its detection_history row in one
+   transaction - only while still holding the lease, so a job that was
+   picked up twice is completed once
+4. on failure, requeue with exponential backoff until max_attempts
+   (non-leaf photos fail straight away)
+
+Runs inside the API process (DETECTION_JOB_WORKER_IN_PROCESS, started
+from the lifespan) or on its own:
+
+    python -m app.workers.detection_worker --concurrency 4
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.core.executors import run_io, shutdown_executors
+from app.core.metrics import metrics
+from app.crud import detection_job as job_crud
+from app.database import SessionLocal
+from app.ml.cascade import get_detection_model
+from app.ml.image_input import ImageInput
+from app.ml.perceptual_hash import load_phash_index
+from app.models.detection_job import JOB_FAILED, DetectionJob
+from app.utils.detection_pipeline import (
+    LeafRejectedError,
+    add_history,
+    build_detection_data,
+    detect_upload,
+    format_prediction,
+    store_image,
+)
+from app.workers.lease_worker import InProcessWorker, LeaseWorker, run_worker
+from app.workers.upload_outbox_worker import notify_new_upload
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionWorker(LeaseWorker):
+    """Polls the job table and processes up to `concurrency` jobs at once"""
+
+    name = "Detection worker"
+    in_flight_gauge = "jobs.in_flight"
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None
+    ):
+        super().__init__(
+            concurrency or settings.DETECTION_JOB_WORKER_CONCURRENCY,
+            poll_interval or settings.DETECTION_JOB_POLL_INTERVAL_SECONDS,
+            worker_id=worker_id
+        )
+
+    def claim(self, db, limit: int) -> List[str]:
+        if limit <= 0:
+            return []
+        return job_crud.claim_jobs(db, self.worker_id, limit, settings.DETECTION_JOB_LEASE_SECONDS)
+
+    async def process(self, job_id: str) -> None:
+        """Run one claimed job to completion or a recorded failure"""
+        db = SessionLocal()
+        try:
+            job = await run_io(db.get, DetectionJob, job_id)
+            if job is None or job.image_data is None:
+                return
+            attempts = job.attempts
+            logger.info(f"Processing detection job {job_id} (attempt {attempts}/{job.max_attempts})")
+
+            try:
+                upload = ImageInput(bytes(job.image_data), filename=job.original_filename)
+                deadline = Deadline(settings.DETECTION_DEADLINE_SECONDS)
+                prediction = await detect_upload(upload, db, deadline)
+
+                deadline.check("storage")
+                image_url, _ = await store_image(upload, job.filename, timeout=deadline.remaining())
+                format_prediction(prediction)
+                data = build_detection_data(prediction, image_url, datetime.now(timezone.utc))
+
+                completed = await run_io(self._complete_job, db, job, prediction, image_url, data)
+            except Exception as e:
+                await run_io(db.rollback)
+                await self._fail(db, job_id, attempts, e)
+                return
+
+            if completed:
+                notify_new_upload()
+                metrics.increment("jobs.succeeded")
+                logger.info(f"[SUCCESS] Detection job {job_id} completed: history ID {data['detection_id']}")
+            else:
+                # Lease expired and another worker took over - its result wins
+                metrics.increment("jobs.lost_lease")
+                logger.warning(f"Detection job {job_id} lost its lease, result discarded")
+        finally:
+            await run_io(db.close)
+
+    def _complete_job(self, db, job: DetectionJob, prediction: Dict, image_url: str, data: Dict) -> bool:
+        """Add the history row and complete the job in one transaction (blocking, run on the I/O executor)"""
+        history = add_history(db, job.user_id, prediction, image_url, job.filename)
+        return job_crud.complete_job(db, job.id, self.worker_id, history, data)
+
+    async def _fail(self, db, job_id: str, attempts: int, error: Exception) -> None:
+        if isinstance(error, LeafRejectedError):
+            # Same photo will never become a leaf - do not retry
+            retry_after = None
+        else:
+            retry_after = settings.DETECTION_JOB_RETRY_BACKOFF_SECONDS * (2 ** max(0, attempts - 1))
+
+        message = getattr(error, "message", None) or str(error) or type(error).__name__
+        status = await run_io(job_crud.fail_job, db, job_id, self.worker_id, message, retry_after)
+
+        if status == JOB_FAILED:
+            metrics.increment("jobs.failed")
+            logger.warning(f"Detection job {job_id} failed: {message}")
+        elif status is not None:
+            metrics.increment("jobs.retried")
+            logger.warning(f"Detection job {job_id} attempt {attempts} failed, retrying in {retry_after:.0f}s: {message}")
+
+
+# In-process worker (started from the API lifespan)
+_in_process: InProcessWorker[DetectionWorker] = InProcessWorker(DetectionWorker)
+
+
+def start_in_process_worker() -> DetectionWorker:
+    """Run a worker as a background task on the current event loop"""
+    return _in_process.start()
+
+
+async def stop_in_process_worker() -> None:
+    """Stop the in-process worker after its jobs in flight finish"""
+    await _in_process.stop()
+
+
+def notify_new_job() -> None:
+    """Wake the in-process worker (if any) after a job was queued"""
+    _in_process.notify()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=None, help="Default: DETECTION_JOB_WORKER_CONCURRENCY")
+    parser.add_argument("--once", action="store_true", help="Process one round of jobs and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    worker = DetectionWorker(concurrency=args.concurrency)
+    try:
+        if settings.DETECTION_CACHE_ENABLED and settings.PHASH_REUSE_ENABLED:
+            try:
+                await run_io(load_phash_index, get_detection_model().model_version)
+            except Exception as e:
+                logger.warning(f"Perceptual hash index not loaded: {e}")
+
+        count = await run_worker(worker, args.once)
+        if args.once:
+            logger.info(f"Processed {count} job(s)")
+    finally:
+        shutdown_executors()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""
+Lease-queue worker loop
+=======================
+Shared by the workers draining a LeaseQueue table (app/crud/lease_queue.py):
+the detection job worker and the Cloudinary upload outbox worker.
+
+- LeaseWorker: claim up to `concurrency` rows, process them as tasks,
+  sleep until a slot frees up, new work is announced (wake), stop, or the
+  next poll. Subclasses implement claim() and process()
+- InProcessWorker: the one worker of the API process (started and
+  stopped from the lifespan, woken when work is queued)
+- run_worker(): --once or run-until-SIGTERM for the command line entry points
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from typing import Callable, Generic, List, Optional, Set, TypeVar
+
+from sqlalchemy.orm import Session
+
+from app.core.executors import run_io
+from app.core.metrics import metrics
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseWorker:
+    """Polls a lease queue and processes up to `concurrency` rows at once"""
+
+    # For log messages, e.g. "Detection worker"
+    name = "Worker"
+    # Gauge of rows being processed (None: not published)
+    in_flight_gauge: Optional[str] = None
+
+    def __init__(self, concurrency: int, poll_interval: float, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._wake: Optional[asyncio.Event] = None
+
+    def claim(self, db: Session, limit: int) -> List:
+        """Lease up to `limit` rows, returns their ids (blocking, run on the I/O executor)"""
+        raise NotImplementedError
+
+    async def process(self, row_id) -> None:
+        """Run one claimed row to completion or a recorded failure"""
+        raise NotImplementedError
+
+    def wake(self) -> None:
+        """Check the queue now instead of at the next poll (same event loop only)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        """Process rows until `stop` is set; rows in flight are finished first"""
+        self._wake = asyncio.Event()
+        in_flight: Set[asyncio.Task] = set()
+        logger.info(f"{self.name} {self.worker_id} started (concurrency={self.concurrency})")
+
+        try:
+            while stop is None or not stop.is_set():
+                self._wake.clear()
+                claimed = await self._claim(self.concurrency - len(in_flight))
+                for row_id in claimed:
+                    task = asyncio.create_task(self.process(row_id))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                if self.in_flight_gauge:
+                    metrics.set_gauge(self.in_flight_gauge, len(in_flight))
+
+                if claimed and len(in_flight) < self.concurrency:
+                    # There may be more waiting
+                    continue
+
+                # Sleep until a slot frees up, work is queued, stop, or the next poll
+                waiters = {asyncio.ensure_future(self._wake.wait())}
+                if stop is not None:
+                    waiters.add(asyncio.ensure_future(stop.wait()))
+                await asyncio.wait(waiters | in_flight, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in waiters:
+                    waiter.cancel()
+        finally:
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            self._wake = None
+            logger.info(f"{self.name} {self.worker_id} stopped")
+
+    async def run_once(self) -> int:
+        """Claim and process one round of rows (returns the number claimed)"""
+        claimed = await self._claim(self.concurrency)
+        await asyncio.gather(*(self.process(row_id) for row_id in claimed))
+        return len(claimed)
+
+    async def _claim(self, limit: int) -> List:
+        db = SessionLocal()
+        try:
+            return await run_io(self.claim, db, max(0, limit))
+        except Exception as e:
+            logger.error(f"{self.name} failed to claim work: {e}")
+            await run_io(db.rollback)
+            return []
+        finally:
+            await run_io(db.close)
+
+
+W = TypeVar("W", bound=LeaseWorker)
+
+
+class InProcessWorker(Generic[W]):
+    """One worker running as a background task on the API's event loop"""
+
+    def __init__(self, factory: Callable[[], W]):
+        self.factory = factory
+        self.worker: Optional[W] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def start(self) -> W:
+        """Start the worker on the current event loop (once)"""
+        if self.worker is None:
+            self.worker = self.factory()
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self.worker.run(self._stop))
+        return self.worker
+
+    async def stop(self) -> None:
+        """Stop the worker after the rows in flight finish"""
+        if self._task is not None:
+            self._stop.set()
+            await self._task
+        self.worker, self._task, self._stop = None, None, None
+
+    def notify(self) -> None:
+        """Wake the worker (if running) after work was queued"""
+        if self.worker is not None:
+            self.worker.wake()
+
+
+async def run_worker(worker: LeaseWorker, once: bool) -> int:
+    """
+    Command line mode: one round with `once`, otherwise until SIGINT/SIGTERM
+
+    Returns:
+        Number of rows claimed by the round (0 when run until stopped)
+    """
+    if once:
+        return await worker.run_once()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await worker.run(stop)
+    return 0
@@ -0,0 +1,163 @@
+"""
+Upload blob garbage collector
+=============================
+Deletes local blobs (app/utils/blob_store.py) that no detection_history row
+has used for UPLOAD_BLOB_GC_GRACE_SECONDS: photos of deleted detections,
+photos moved to Cloudinary by the upload outbox, and photos of requests
+that failed before their history row was saved. Cached derivatives
+(app/utils/image_derivatives.py) go with their blob.
+
+Each file is first moved out of its path, then its row is deleted with a
+conditional DELETE (still unreferenced, still past the grace period). If
+the DELETE finds the row in use again the file is put back; otherwise it
+is removed. A store_blob racing with the GC therefore never counts a dedup
+hit on a file about to be deleted - it finds no file and writes it again.
+
+Runs inside the API process every UPLOAD_BLOB_GC_INTERVAL_SECONDS, or on
+its own (e.g. from cron):
+
+    python -m app.workers.upload_blob_gc --once
+    python -m app.workers.upload_blob_gc --recount   # rebuild ref counts first
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+from typing import Optional
+
+from app.core.config import settings
+from app.core.executors import run_io, shutdown_executors
+from app.core.metrics import metrics
+from app.crud import upload_blob as blob_crud
+from app.database import SessionLocal
+from app.utils.blob_store import get_blob_store
+from app.utils.image_derivatives import delete_derivatives
+
+logger = logging.getLogger(__name__)
+
+# Blobs per database round trip
+GC_BATCH_SIZE = 500
+
+
+def collect_blobs(grace_seconds: Optional[float] = None) -> int:
+    """
+    Delete every blob unreferenced for longer than grace_seconds (blocking)
+
+    Returns:
+        Number of files deleted
+    """
+    grace = settings.UPLOAD_BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    store = get_blob_store()
+    deleted = 0
+
+    db = SessionLocal()
+    try:
+        while True:
+            candidates = blob_crud.find_unreferenced(db, grace, GC_BATCH_SIZE)
+            db.commit()
+            if not candidates:
+                break
+
+            collected = 0
+            for content_hash, path in candidates:
+                detached = store.detach(path)
+                if blob_crud.delete_unreferenced(db, content_hash, grace):
+                    collected += 1
+                    if detached is not None:
+                        os.remove(detached)
+                        deleted += 1
+                    delete_derivatives(path)
+                elif detached is not None:
+                    # Uploaded again in the meantime
+                    store.restore(detached, path)
+            if collected == 0:
+                # Everything re-referenced in the meantime
+                break
+    finally:
+        db.close()
+
+    if deleted:
+        metrics.increment("uploads.blobs_collected", deleted)
+        logger.info(f"Blob GC deleted {deleted} unreferenced file(s)")
+    return deleted
+
+
+def recount_blob_refs() -> int:
+    """Rebuild upload_blobs.ref_count from detection_history (blocking)"""
+    db = SessionLocal()
+    try:
+        return blob_crud.recount_refs(db)
+    finally:
+        db.close()
+
+
+async def run_blob_gc(stop: asyncio.Event, interval: float) -> None:
+    """Collect blobs every `interval` seconds until `stop` is set"""
+    while not stop.is_set():
+        try:
+            await run_io(collect_blobs)
+        except Exception as e:
+            logger.error(f"Blob GC failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+# In-process collector (started from the API lifespan)
+_gc_task: Optional[asyncio.Task] = None
+_gc_stop: Optional[asyncio.Event] = None
+
+
+def start_in_process_blob_gc() -> None:
+    """Run the blob GC as a background task on the current event loop"""
+    global _gc_task, _gc_stop
+    if _gc_task is None:
+        _gc_stop = asyncio.Event()
+        _gc_task = asyncio.create_task(run_blob_gc(_gc_stop, settings.UPLOAD_BLOB_GC_INTERVAL_SECONDS))
+
+
+async def stop_in_process_blob_gc() -> None:
+    """Stop the in-process blob GC (a pass in progress finishes first)"""
+    global _gc_task, _gc_stop
+    if _gc_task is not None:
+        _gc_stop.set()
+        await _gc_task
+    _gc_task, _gc_stop = None, None
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="Collect once and exit")
+    parser.add_argument("--recount", action="store_true", help="Rebuild ref counts from detection_history first")
+    parser.add_argument("--grace", type=float, default=None, help="Default: UPLOAD_BLOB_GC_GRACE_SECONDS")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    try:
+        if args.recount:
+            changed = await run_io(recount_blob_refs)
+            logger.info(f"Ref counts rebuilt, {changed} blob(s) corrected")
+
+        if args.once:
+            deleted = await run_io(collect_blobs, args.grace)
+            logger.info(f"Deleted {deleted} unreferenced blob(s)")
+            return
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        # An interval of 0 only turns off the in-process GC
+        await run_blob_gc(stop, settings.UPLOAD_BLOB_GC_INTERVAL_SECONDS or 900)
+    finally:
+        shutdown_executors()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,207 @@
+"""
+Cloudinary upload outbox worker
+===============================
+With USE_CLOUDINARY and CLOUDINARY_OUTBOX_ENABLED, /detect answers with
+the local /uploads URL as soon as inference is done; the Cloudinary upload
+is queued in image_upload_outbox in the same transaction as the
+detection_history row. This worker drains the outbox:
+
+1. claim runnable uploads with a lease (crud.image_upload_outbox.claim_uploads)
+2. upload the file from UPLOAD_DIR
+3. swap detection_history.image_url to the CDN URL, release its local
+   blob reference and mark the upload done in one transaction (only while
+   still holding the lease)
+4. the local file goes once no history row uses it any more: blobs via
+   app.workers.upload_blob_gc, flat files from before the blob store here
+5. on failure, retry with exponential backoff until max_attempts - the
+   local file keeps serving the image meanwhile (and for good, if all
+   attempts fail)
+
+Uploads left over by a stopped or crashed process are picked up on the
+next start: pending rows stay pending, running rows come back once their
+lease expires. The backlog (pending + running) is published as the
+uploads.outbox_backlog gauge.
+
+Runs inside the API process (started from the lifespan) or on its own:
+
+    python -m app.workers.upload_outbox_worker --once
+"""
+import argparse
+import asyncio
+import logging
+import os
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.executors import run_io, shutdown_executors
+from app.core.metrics import metrics
+from app.crud import image_upload_outbox as outbox_crud
+from app.database import SessionLocal
+from app.models.image_upload_outbox import UPLOAD_FAILED, ImageUploadOutbox
+from app.models.upload_blob import BLOB_PATH
+from app.utils.cloudinary_service import get_cloudinary_service
+from app.utils.image_derivatives import delete_derivatives
+from app.workers.lease_worker import InProcessWorker, LeaseWorker, run_worker
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_enabled() -> bool:
+    """Cloudinary uploads go through the outbox instead of the request"""
+    return settings.USE_CLOUDINARY and settings.CLOUDINARY_OUTBOX_ENABLED
+
+
+def local_image_url(filename: str) -> str:
+    """detection_history.image_url of a file kept in UPLOAD_DIR (blob path or flat name)"""
+    return f"uploads/{filename}"
+
+
+def _remove_local_file(filename: str) -> None:
+    if BLOB_PATH.match(filename):
+        # Shared by identical photos - reference released in complete_upload
+        return
+    try:
+        os.remove(os.path.join(settings.UPLOAD_DIR, filename))
+    except FileNotFoundError:
+        pass
+    delete_derivatives(filename)
+
+
+class UploadOutboxWorker(LeaseWorker):
+    """Polls the outbox table and runs up to `concurrency` uploads at once"""
+
+    name = "Upload outbox worker"
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None
+    ):
+        super().__init__(
+            concurrency or settings.CLOUDINARY_OUTBOX_CONCURRENCY,
+            poll_interval or settings.CLOUDINARY_OUTBOX_POLL_INTERVAL_SECONDS,
+            worker_id=worker_id
+        )
+
+    def claim(self, db, limit: int) -> List[int]:
+        claimed = []
+        if limit > 0:
+            claimed = outbox_crud.claim_uploads(db, self.worker_id, limit, settings.CLOUDINARY_OUTBOX_LEASE_SECONDS)
+        metrics.set_gauge("uploads.outbox_backlog", outbox_crud.count_backlog(db))
+        return claimed
+
+    async def run_once(self) -> int:
+        count = await super().run_once()
+        await self._claim(0)  # refresh the backlog gauge
+        return count
+
+    async def process(self, upload_id: int) -> None:
+        """Run one claimed upload to completion or a recorded failure"""
+        db = SessionLocal()
+        try:
+            entry = await run_io(db.get, ImageUploadOutbox, upload_id)
+            if entry is None:
+                return
+            attempts, filename = entry.attempts, entry.filename
+            file_path = os.path.join(settings.UPLOAD_DIR, filename)
+
+            try:
+                cloud_url = None
+                if entry.detection_id is None:
+                    # History deleted before the upload - nothing to point at the CDN
+                    logger.info(f"Outbox upload {upload_id} skipped: detection history deleted")
+                elif not os.path.exists(file_path):
+                    await self._fail(db, upload_id, attempts, FileNotFoundError(f"Local file missing: {filename}"),
+                                     retry=False)
+                    return
+                else:
+                    upload_result = await run_io(
+                        get_cloudinary_service().upload_image,
+                        file_path=file_path,
+                        folder=entry.folder,
+                        public_id=entry.public_id,
+                        timeout=settings.CLOUDINARY_UPLOAD_TIMEOUT_SECONDS
+                    )
+                    cloud_url = upload_result["url"]
+
+                swapped = await run_io(
+                    outbox_crud.complete_upload, db, upload_id, self.worker_id, local_image_url(filename), cloud_url
+                )
+            except Exception as e:
+                await run_io(db.rollback)
+                await self._fail(db, upload_id, attempts, e)
+                return
+
+            if swapped is None:
+                # Lease expired and another worker took over - it owns the file now
+                metrics.increment("uploads.lost_lease")
+                logger.warning(f"Outbox upload {upload_id} lost its lease, result discarded")
+                return
+
+            if cloud_url is not None and not swapped:
+                # History row deleted while uploading - do not leave an orphan on the CDN
+                await run_io(get_cloudinary_service().delete_image, upload_result["public_id"])
+            await run_io(_remove_local_file, filename)
+            metrics.increment("uploads.succeeded" if swapped else "uploads.skipped")
+            logger.info(f"[SUCCESS] Outbox upload {upload_id} done: {cloud_url or 'skipped'}")
+        finally:
+            await run_io(db.close)
+
+    async def _fail(self, db, upload_id: int, attempts: int, error: Exception, retry: bool = True) -> None:
+        retry_after = None
+        if retry:
+            retry_after = settings.CLOUDINARY_OUTBOX_RETRY_BACKOFF_SECONDS * (2 ** max(0, attempts - 1))
+
+        message = str(error) or type(error).__name__
+        status = await run_io(outbox_crud.fail_upload, db, upload_id, self.worker_id, message, retry_after)
+
+        if status == UPLOAD_FAILED:
+            metrics.increment("uploads.failed")
+            logger.warning(f"Outbox upload {upload_id} failed, keeping the local file: {message}")
+        elif status is not None:
+            metrics.increment("uploads.retried")
+            logger.warning(f"Outbox upload {upload_id} attempt {attempts} failed, retrying in {retry_after:.0f}s: {message}")
+
+
+# In-process worker (started from the API lifespan)
+_in_process: InProcessWorker[UploadOutboxWorker] = InProcessWorker(UploadOutboxWorker)
+
+
+def start_in_process_outbox_worker() -> UploadOutboxWorker:
+    """Run an outbox worker as a background task on the current event loop"""
+    return _in_process.start()
+
+
+async def stop_in_process_outbox_worker() -> None:
+    """Stop the in-process outbox worker after its uploads in flight finish"""
+    await _in_process.stop()
+
+
+def notify_new_upload() -> None:
+    """Wake the in-process outbox worker (if any) after an upload was queued"""
+    _in_process.notify()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=None, help="Default: CLOUDINARY_OUTBOX_CONCURRENCY")
+    parser.add_argument("--once", action="store_true", help="Process one round of uploads and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    worker = UploadOutboxWorker(concurrency=args.concurrency)
+    try:
+        count = await run_worker(worker, args.once)
+        if args.once:
+            logger.info(f"Processed {count} upload(s), backlog {metrics.get('uploads.outbox_backlog')}")
+    finally:
+        shutdown_executors()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""
+Test setup: throwaway sqlite database and upload directory, no background
+workers. The environment is set before `app` is imported, so nothing
+touches a real database, UPLOAD_DIR or Gemini; the directory is removed
+when the session ends.
+"""
+import io
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+_tmp_dir = tempfile.mkdtemp(prefix="grovia_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'grovia.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp_dir, "uploads")
+os.environ["DETECTION_JOB_WORKER_IN_PROCESS"] = "false"
+os.environ["UPLOAD_BLOB_GC_INTERVAL_SECONDS"] = "0"
+for name in ("SECRET_KEY", "ENCRYPTION_KEY", "MYSQL_USER", "MYSQL_PASSWORD", "GEMINI_API_KEY"):
+    os.environ.setdefault(name, "test")
+os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.core.config import settings  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.utils import detection_pipeline  # noqa: E402
+
+Base.metadata.create_all(engine)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _remove_tmp_dir():
+    yield
+    engine.dispose()
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+
+PREDICTION = {
+    "disease_id": "early_blight",
+    "disease_name": "Hawar Daun",
+    "scientific_name": "Alternaria solani",
+    "confidence": 0.91,
+    "symptoms": ["bercak coklat"],
+    "recommendations": ["buang daun terinfeksi"]
+}
+
+
+class StubModel:
+    """Detection model stand-in recording the images it was given"""
+
+    model_version = "stub-1"
+
+    def __init__(self):
+        self.images = []
+
+    async def predict_async(self, upload, deadline=None):
+        self.images.append(upload)
+        return dict(PREDICTION)
+
+    async def predict_stream(self, upload, deadline=None):
+        self.images.append(upload)
+        for field in ("disease_name", "confidence"):
+            yield "field", (field, PREDICTION[field])
+        yield "result", dict(PREDICTION)
+
+
+def make_jpeg(width: int, height: int, leaf: bool = True, seed: int = 0) -> bytes:
+    """Noisy green "leaf" photo, or a flat grey one that fails leaf validation"""
+    if leaf:
+        rng = np.random.default_rng(seed)
+        pixels = np.zeros((height, width, 3), np.uint8)
+        pixels[..., 0] = 40
+        pixels[..., 1] = 150 + rng.integers(0, 80, (height, width))
+        pixels[..., 2] = 30
+    else:
+        pixels = np.full((height, width, 3), 200, np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def user():
+    db = SessionLocal()
+    try:
+        count = db.query(User).count()
+        user = User(
+            email=f"user{count}@grovia.test",
+            name="Test User",
+            hashed_password="x",
+            is_active=True,
+            is_verified=True
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def auth_headers(user):
+    return {"Authorization": f"Bearer {create_access_token(str(user.id))}"}
+
+
+@pytest.fixture
+def client():
+    # No lifespan: models and workers are not started, executors start lazily
+    return TestClient(app)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """StubModel in place of Gemini, result cache off (every test reaches the model)"""
+    stub = StubModel()
+    monkeypatch.setattr(detection_pipeline, "get_detection_model", lambda: stub)
+    monkeypatch.setattr(settings, "DETECTION_CACHE_ENABLED", False)
+    return stub
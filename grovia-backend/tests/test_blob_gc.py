@@ -0,0 +1,83 @@
+"""
+Blob GC (app/workers/upload_blob_gc.py) racing with store_blob
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.crud import upload_blob as blob_crud
+from app.database import SessionLocal
+from app.models.upload_blob import UploadBlob
+from app.utils.blob_store import get_blob_store, store_blob
+from app.workers import upload_blob_gc
+from app.workers.upload_blob_gc import collect_blobs
+
+GRACE_SECONDS = 60
+
+
+@pytest.fixture
+def unreferenced_blob():
+    """A stored photo no history row has used for longer than GRACE_SECONDS"""
+    data = os.urandom(256)
+    content_hash = hashlib.sha256(data).hexdigest()
+    path = store_blob(data, content_hash, ".jpg")
+
+    db = SessionLocal()
+    try:
+        entry = db.get(UploadBlob, content_hash)
+        entry.released_at = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=2 * GRACE_SECONDS)
+        db.commit()
+    finally:
+        db.close()
+    return data, content_hash, path
+
+
+def is_registered(content_hash: str) -> bool:
+    db = SessionLocal()
+    try:
+        return db.get(UploadBlob, content_hash) is not None
+    finally:
+        db.close()
+
+
+def test_collects_unreferenced_blob(unreferenced_blob):
+    _, content_hash, path = unreferenced_blob
+
+    assert collect_blobs(GRACE_SECONDS) == 1
+    assert not get_blob_store().exists(path)
+    assert not is_registered(content_hash)
+
+
+def test_upload_after_row_delete_keeps_its_file(unreferenced_blob, monkeypatch):
+    data, content_hash, path = unreferenced_blob
+    delete_unreferenced = blob_crud.delete_unreferenced
+
+    def upload_right_after_delete(db, *args):
+        deleted = delete_unreferenced(db, *args)
+        store_blob(data, content_hash, ".jpg")
+        return deleted
+
+    monkeypatch.setattr(upload_blob_gc.blob_crud, "delete_unreferenced", upload_right_after_delete)
+    collect_blobs(GRACE_SECONDS)
+
+    assert is_registered(content_hash)
+    with open(get_blob_store().full_path(path), "rb") as f:
+        assert f.read() == data
+
+
+def test_upload_before_row_delete_keeps_its_file(unreferenced_blob, monkeypatch):
+    data, content_hash, path = unreferenced_blob
+    delete_unreferenced = blob_crud.delete_unreferenced
+
+    def upload_right_before_delete(db, *args):
+        store_blob(data, content_hash, ".jpg")
+        return delete_unreferenced(db, *args)
+
+    monkeypatch.setattr(upload_blob_gc.blob_crud, "delete_unreferenced", upload_right_before_delete)
+
+    assert collect_blobs(GRACE_SECONDS) == 0
+    assert is_registered(content_hash)
+    with open(get_blob_store().full_path(path), "rb") as f:
+        assert f.read() == data
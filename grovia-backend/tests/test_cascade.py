@@ -0,0 +1,68 @@
+"""
+CascadeRouter.predict_stream (app/ml/cascade.py) with a local fallback
+"""
+import asyncio
+
+import numpy as np
+
+from app.ml.cascade import ENGINE_GEMINI, ENGINE_LOCAL_FALLBACK, CascadeRouter
+from app.ml.image_input import ImageInput
+from app.ml.local_classifier import LocalPrediction
+from tests.conftest import make_jpeg
+
+
+class FakeLocal:
+    """Unsure local classifier (below the cascade threshold)"""
+
+    model_version = "local-1"
+
+    def classify(self, image):
+        return LocalPrediction(0, "Sehat", 0.5, np.array([0.5, 0.5]), 1.0)
+
+    def to_result(self, prediction):
+        return {
+            "disease_id": "healthy", "disease_name": "Sehat", "scientific_name": "N/A",
+            "confidence": prediction.confidence, "symptoms": [], "recommendations": [], "analysis_notes": ""
+        }
+
+
+class FakeGemini:
+    """Streams two fields, then a result (None: the call failed)"""
+
+    model_version = "gemini-1"
+
+    def __init__(self, result):
+        self.result = result
+
+    async def predict_stream(self, image, deadline=None):
+        yield "field", ("disease_name", "Hawar Daun")
+        yield "field", ("confidence", 0.91)
+        yield "result", self.result
+
+
+def stream_events(router: CascadeRouter) -> list:
+    async def collect():
+        upload = ImageInput(make_jpeg(320, 240), filename="leaf.jpg")
+        return [event async for event in router.predict_stream(upload)]
+    return asyncio.run(collect())
+
+
+def test_failed_gemini_fields_never_reach_the_client():
+    router = CascadeRouter(FakeGemini(None), FakeLocal(), threshold=0.9)
+    events = stream_events(router)
+
+    fields = [payload for kind, payload in events if kind == "field"]
+    assert ("disease_name", "Hawar Daun") not in fields
+    assert ("disease_name", "Sehat") in fields
+    assert events[-1][1]["engine"] == ENGINE_LOCAL_FALLBACK
+
+
+def test_gemini_fields_sent_with_its_result():
+    router = CascadeRouter(FakeGemini({"disease_name": "Hawar Daun", "confidence": 0.91}), FakeLocal(), threshold=0.9)
+    events = stream_events(router)
+
+    assert events == [
+        ("field", ("disease_name", "Hawar Daun")),
+        ("field", ("confidence", 0.91)),
+        ("result", {"disease_name": "Hawar Daun", "confidence": 0.91, "engine": ENGINE_GEMINI})
+    ]
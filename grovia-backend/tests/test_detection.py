@@ -0,0 +1,77 @@
+"""
+/detection/detect and /detection/detect/stream
+"""
+import json
+
+from app.core.config import settings
+from app.utils.detection_pipeline import LEAF_REJECTED_DETAIL
+from tests.conftest import PREDICTION, make_jpeg
+
+
+def test_stream_upload_deadline_is_a_timeout(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "DETECTION_DEADLINE_SECONDS", 0)
+    response = client.post(
+        "/api/v1/detection/detect/stream",
+        headers=auth_headers,
+        files={"image": ("leaf.jpg", make_jpeg(800, 600), "image/jpeg")}
+    )
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Detection timed out during upload"
+
+
+def read_events(response) -> list:
+    """(event, data) pairs of a Server-Sent Events body"""
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_detect(client, auth_headers, model):
+    response = client.post(
+        "/api/v1/detection/detect",
+        headers=auth_headers,
+        files={"image": ("leaf.jpg", make_jpeg(800, 600, seed=1), "image/jpeg")}
+    )
+    assert response.status_code == 200
+    assert response.json()["data"]["disease_id"] == PREDICTION["disease_id"]
+    assert len(model.images) == 1
+
+
+def test_detect_rejects_non_leaf(client, auth_headers, model):
+    response = client.post(
+        "/api/v1/detection/detect",
+        headers=auth_headers,
+        files={"image": ("wall.jpg", make_jpeg(800, 600, leaf=False), "image/jpeg")}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == LEAF_REJECTED_DETAIL
+    assert model.images == []
+
+
+def test_stream_reports_every_stage(client, auth_headers, model):
+    response = client.post(
+        "/api/v1/detection/detect/stream",
+        headers=auth_headers,
+        files={"image": ("leaf.jpg", make_jpeg(800, 600, seed=2), "image/jpeg")}
+    )
+    assert response.status_code == 200
+    events = read_events(response)
+    assert [event for event, _ in events] == [
+        "accepted", "validation", "model_started", "partial", "partial", "result"
+    ]
+    assert events[3][1] == {"field": "disease_name", "value": PREDICTION["disease_name"]}
+    assert events[-1][1]["data"]["disease_id"] == PREDICTION["disease_id"]
+
+
+def test_stream_rejects_non_leaf(client, auth_headers, model):
+    response = client.post(
+        "/api/v1/detection/detect/stream",
+        headers=auth_headers,
+        files={"image": ("wall.jpg", make_jpeg(800, 600, leaf=False), "image/jpeg")}
+    )
+    events = read_events(response)
+    assert [event for event, _ in events] == ["accepted", "validation", "error"]
+    assert events[1][1]["is_valid"] is False
+    assert events[2][1] == {"status_code": 400, "detail": LEAF_REJECTED_DETAIL}
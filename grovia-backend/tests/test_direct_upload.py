@@ -0,0 +1,111 @@
+"""
+Direct uploads against the local Cloudinary stand-in:
+/detection/upload-signature -> signed upload -> /detection/detect-cloud
+"""
+import threading
+
+import httpx
+import pytest
+
+import app.utils.cloudinary_service as cloudinary_service
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.detection_history import DetectionHistory
+from app.scripts.cloudinary_standin import make_server
+from tests.conftest import PREDICTION, make_jpeg
+
+
+@pytest.fixture
+def standin(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "USE_CLOUDINARY", True)
+    monkeypatch.setattr(settings, "CLOUDINARY_OUTBOX_ENABLED", False)
+    monkeypatch.setattr(settings, "CLOUDINARY_CLOUD_NAME", "grovia-test")
+    monkeypatch.setattr(settings, "CLOUDINARY_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "CLOUDINARY_API_SECRET", "test-secret")
+
+    server = make_server("127.0.0.1", 0, str(tmp_path))
+    monkeypatch.setattr(settings, "CLOUDINARY_STANDIN_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    # Configure the SDK for the stand-in
+    monkeypatch.setattr(cloudinary_service, "_cloudinary_service", None)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield settings.CLOUDINARY_STANDIN_URL
+    server.shutdown()
+    server.server_close()
+    cloudinary_service._cloudinary_service = None
+
+
+def signed_upload(client, auth_headers, photo: bytes, **overrides) -> tuple:
+    """Ask the API for a signature and upload `photo` with it, like the frontend does"""
+    response = client.post("/api/v1/detection/upload-signature", headers=auth_headers)
+    assert response.status_code == 200
+    signature = response.json()["data"]
+
+    params = {name: str(value) for name, value in {**signature["params"], **overrides}.items()}
+    upload = httpx.post(signature["upload_url"], data=params, files={"file": ("leaf.jpg", photo, "image/jpeg")})
+    return signature, upload
+
+
+def test_direct_upload_detection(client, auth_headers, user, standin, model):
+    photo = make_jpeg(4032, 3024)
+    signature, upload = signed_upload(client, auth_headers, photo)
+    assert upload.status_code == 200
+    assert upload.json()["public_id"] == signature["public_id"]
+
+    response = client.post(
+        "/api/v1/detection/detect-cloud", headers=auth_headers, json={"public_id": signature["public_id"]}
+    )
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["disease_id"] == PREDICTION["disease_id"]
+    assert data["image_url"].startswith(standin)
+
+    # The model saw Cloudinary's resized derivative, not the 12MP original
+    assert len(model.images) == 1
+    assert len(model.images[0].data) < len(photo)
+    assert max(model.images[0].bgr.shape[:2]) <= settings.GEMINI_IMAGE_MAX_SIDE
+
+    db = SessionLocal()
+    try:
+        history = db.get(DetectionHistory, data["detection_id"])
+        assert history.user_id == user.id
+        assert history.image_url == data["image_url"]
+    finally:
+        db.close()
+    assert httpx.get(data["image_url"]).status_code == 200
+
+
+def test_signature_only_covers_its_public_id(client, auth_headers, user, standin, model):
+    _, upload = signed_upload(client, auth_headers, make_jpeg(800, 600), public_id=f"user_{user.id}_other")
+    assert upload.status_code == 401
+
+
+def test_upload_of_another_user_is_forbidden(client, auth_headers, user, standin, model):
+    response = client.post(
+        "/api/v1/detection/detect-cloud",
+        headers=auth_headers,
+        json={"public_id": f"grovia/detections/user_{user.id + 1000}_20260101_000000_abcd1234"}
+    )
+    assert response.status_code == 403
+    assert model.images == []
+
+
+def test_missing_upload_is_not_found(client, auth_headers, standin, model):
+    signature = client.post("/api/v1/detection/upload-signature", headers=auth_headers).json()["data"]
+    response = client.post(
+        "/api/v1/detection/detect-cloud", headers=auth_headers, json={"public_id": signature["public_id"]}
+    )
+    assert response.status_code == 404
+
+
+def test_rejected_photo_is_deleted_from_cloudinary(client, auth_headers, standin, model):
+    signature, upload = signed_upload(client, auth_headers, make_jpeg(800, 600, leaf=False))
+    assert upload.status_code == 200
+
+    body = {"public_id": signature["public_id"]}
+    response = client.post("/api/v1/detection/detect-cloud", headers=auth_headers, json=body)
+    assert response.status_code == 400
+    assert model.images == []
+
+    response = client.post("/api/v1/detection/detect-cloud", headers=auth_headers, json=body)
+    assert response.status_code == 404
@@ -0,0 +1,59 @@
+"""
+Lease queue (app/crud/lease_queue.py) through the detection job CRUD
+"""
+import pytest
+
+from app.crud import detection_job as job_crud
+from app.database import SessionLocal
+from app.models.detection_history import DetectionHistory
+from app.models.detection_job import JOB_FAILED, JOB_QUEUED, JOB_SUCCEEDED, DetectionJob
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def job(db, user):
+    job_id = job_crud.new_job_id()
+    job_crud.create_job(db, job_id, user.id, b"jpeg", "leaf.jpg", "user_leaf.jpg", max_attempts=2)
+    return job_id
+
+
+def claimable(db, worker_id: str, lease_seconds: int, job_id: str) -> bool:
+    return job_id in job_crud.claim_jobs(db, worker_id, 100, lease_seconds)
+
+
+def test_expired_lease_moves_to_the_next_worker(db, user, job):
+    assert claimable(db, "w1", 0, job)
+    assert claimable(db, "w2", 120, job)
+    assert not claimable(db, "w1", 120, job)
+
+    # The first worker finishing late loses: no second history row
+    history = DetectionHistory(
+        user_id=user.id, disease_id="x", disease_name="x", confidence=0.9, image_url="uploads/x.jpg"
+    )
+    db.add(history)
+    assert not job_crud.complete_job(db, job, "w1", history, {})
+    assert db.query(DetectionHistory).filter(DetectionHistory.image_url == "uploads/x.jpg").count() == 0
+
+    db.add(history)
+    assert job_crud.complete_job(db, job, "w2", history, {})
+    db.expire_all()
+    entry = db.get(DetectionJob, job)
+    assert entry.status == JOB_SUCCEEDED and entry.image_data is None and entry.lease_owner is None
+
+
+def test_failures_retry_until_max_attempts(db, job):
+    assert claimable(db, "w1", 120, job)
+    assert job_crud.fail_job(db, job, "w2", "boom", retry_after=0) is None
+    assert job_crud.fail_job(db, job, "w1", "boom", retry_after=0) == JOB_QUEUED
+
+    assert claimable(db, "w1", 120, job)
+    assert job_crud.fail_job(db, job, "w1", "boom", retry_after=0) == JOB_FAILED
+    db.expire_all()
+    assert db.get(DetectionJob, job).image_data is None
+    assert not claimable(db, "w1", 120, job)
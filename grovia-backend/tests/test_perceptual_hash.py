@@ -0,0 +1,79 @@
+"""
+Near-duplicate index (app/ml/perceptual_hash.py) and its upkeep by the result cache
+"""
+import asyncio
+import random
+import time
+
+from app.core.config import settings
+from app.ml.perceptual_hash import MultiIndexHashTable
+from app.ml.result_cache import DetectionResultCache
+from app.utils import detection_pipeline
+from app.utils.detection_pipeline import lookup_near_duplicate
+
+
+def flip(value: int, *bits: int) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_remove_keeps_other_entries_searchable():
+    rng = random.Random(0)
+    index = MultiIndexHashTable(chunks=3)
+    hashes = {f"key{i}": rng.getrandbits(64) for i in range(50)}
+    for key, value in hashes.items():
+        index.add(key, value)
+
+    for i in range(0, 50, 2):
+        assert index.remove(f"key{i}")
+    assert not index.remove("key0")
+    assert len(index) == 25
+
+    for key, value in hashes.items():
+        keys = [match.key for match in index.search(flip(value, 3), max_distance=2)]
+        assert (key in keys) == (int(key[3:]) % 2 == 1)
+
+
+def test_expired_entries_are_skipped_and_pruned():
+    index = MultiIndexHashTable(chunks=3)
+    index.add("old", 0xFF, expires_at=time.time() - 1)
+    index.add("new", 0xFF, expires_at=time.time() + 60)
+
+    assert [match.key for match in index.search(0xFF, max_distance=0)] == ["new"]
+    assert index.remove_expired() == 1
+    assert len(index) == 1
+
+
+def test_evicted_keys_leave_the_index():
+    index = MultiIndexHashTable(chunks=3)
+    cache = DetectionResultCache(max_entries=1, ttl_seconds=60, persistent=False, on_discard=index.remove)
+    for key in ("a", "b"):
+        index.add(key, 0xFF)
+        cache.put(key, "v1", {"disease_id": "early_blight"})
+
+    assert [match.key for match in index.search(0xFF, max_distance=0)] == ["b"]
+
+
+def test_lookup_skips_matches_no_longer_cached(monkeypatch):
+    index = MultiIndexHashTable(chunks=3)
+    cache = DetectionResultCache(max_entries=16, ttl_seconds=60, persistent=False)
+    monkeypatch.setattr(detection_pipeline, "get_phash_index", lambda: index)
+    monkeypatch.setattr(detection_pipeline, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(detection_pipeline, "dhash", lambda image: 0)
+    monkeypatch.setattr(settings, "DETECTION_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "PHASH_REUSE_ENABLED", True)
+
+    # Closest match is gone from the cache, the one further away is not
+    index.add("gone", flip(0, 1), confidence=0.95)
+    index.add("cached", flip(0, 1, 2, 3), confidence=0.95)
+    cache.put("cached", "v1", {"disease_id": "early_blight", "confidence": 0.95})
+
+    class Upload:
+        def level(self, level):
+            return None
+
+    prediction, phash = asyncio.run(lookup_near_duplicate(Upload(), db=None))
+    assert prediction["disease_id"] == "early_blight"
+    assert phash == 0
+    assert len(index) == 1
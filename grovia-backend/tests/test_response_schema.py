@@ -0,0 +1,36 @@
+"""
+Gemini response parsing (app/ml/response_schema.py)
+"""
+import json
+
+import pytest
+
+from app.ml.response_schema import DETECTION_SCHEMA, ResponseParseError, parse_response
+
+VALID = {
+    "disease_id": "early_blight",
+    "disease_name": "Hawar Daun",
+    "scientific_name": "Alternaria solani",
+    "confidence": 0.91,
+    "category": "fungal",
+    "severity": "Medium",
+    "symptoms": ["bercak coklat"],
+    "recommendations": ["buang daun terinfeksi"],
+    "prevention": ["rotasi tanaman"],
+    "analysis_notes": "—"
+}
+
+
+def test_parses_valid_response():
+    assert parse_response(json.dumps(VALID, ensure_ascii=False), DETECTION_SCHEMA) == VALID
+
+
+def test_rejects_invalid_json():
+    with pytest.raises(ResponseParseError, match="Invalid JSON"):
+        parse_response('```json\n{"disease_id": "x"}\n```', DETECTION_SCHEMA)
+
+
+def test_keeps_off_schema_value():
+    with pytest.raises(ResponseParseError) as error:
+        parse_response('{"disease_id": 1}', DETECTION_SCHEMA)
+    assert error.value.data == {"disease_id": 1}